@@ -8,3 +8,5 @@ VIRUS_SIMULATION_OUTPUT_PATH = os.path.join(
     RESOURCES_PATH, "virus_simulation_output"
 )
 LOGGING_LEVEL = logging.INFO
+BENCHMARK_OUTPUT_PATH = os.path.join(RESOURCES_PATH, "benchmarks")
+GRAPH_CACHE_PATH = os.path.join(RESOURCES_PATH, "graph_cache")
@@ -1,6 +1,8 @@
+import gzip
 import json
+import lzma
 import os
-from typing import Union
+from typing import Union, Optional, TextIO
 
 
 def dump_json_to_file(target_path: str, content: Union[list, dict]) -> None:
@@ -18,3 +20,51 @@ def create_parent_dir(path: str) -> None:
     parent_dir = os.path.dirname(path)
     parent_dir = os.path.abspath(parent_dir)
     os.makedirs(parent_dir, exist_ok=True)
+
+
+def get_path_size(path: str) -> int:
+    """Size in bytes of file or of all files under directory."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(dir_path, file_name))
+        for dir_path, _, file_names in os.walk(path)
+        for file_name in file_names
+    )
+
+
+GZIP_COMPRESSION = "gzip"
+LZMA_COMPRESSION = "lzma"
+COMPRESSIONS = [GZIP_COMPRESSION, LZMA_COMPRESSION]
+COMPRESSION_EXTENSIONS = {GZIP_COMPRESSION: ".gz", LZMA_COMPRESSION: ".xz"}
+_COMPRESSION_MAGIC_BYTES = {
+    GZIP_COMPRESSION: b"\x1f\x8b",
+    LZMA_COMPRESSION: b"\xfd7zXZ\x00"
+}
+
+
+def open_text_file(path: str,
+                   mode: str = "r",
+                   compression: Optional[str] = None
+                   ) -> TextIO:
+    """Opens (optionally gzip or lzma compressed) text file. Compression of
+    file opened for reading is detected from its content, unless given.
+    """
+    if mode == "r" and compression is None:
+        compression = detect_compression(path=path)
+    if mode != "r":
+        create_parent_dir(path=path)
+    if compression == GZIP_COMPRESSION:
+        return gzip.open(path, f"{mode}t")
+    if compression == LZMA_COMPRESSION:
+        return lzma.open(path, f"{mode}t")
+    return open(path, mode)
+
+
+def detect_compression(path: str) -> Optional[str]:
+    with open(path, "rb") as f:
+        header = f.read(max(len(m) for m in _COMPRESSION_MAGIC_BYTES.values()))
+    for compression, magic_bytes in _COMPRESSION_MAGIC_BYTES.items():
+        if header.startswith(magic_bytes):
+            return compression
+    return None
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Grouping:
+    order: np.ndarray
+    group_starts: np.ndarray
+    group_sizes: np.ndarray
+
+    @property
+    def groups_number(self) -> int:
+        return self.group_starts.shape[0]
+
+    def get_group(self, group_index: int) -> np.ndarray:
+        group_start = self.group_starts[group_index]
+        return self.order[group_start:group_start + self.group_sizes[group_index]]
+
+
+def linearize_positions(positions: np.ndarray, max_y: int) -> np.ndarray:
+    return positions[:, 0].astype(np.int64) * (max_y + 1) + positions[:, 1]
+
+
+def group_by_keys(keys: np.ndarray) -> Grouping:
+    """Groups indices of equal keys by sorting them. Within each group
+    indices keep their original (ascending) order.
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    is_group_start = np.empty(sorted_keys.shape[0], dtype=np.bool_)
+    is_group_start[:1] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_group_start[1:])
+    group_starts = np.flatnonzero(is_group_start)
+    group_sizes = np.diff(np.append(group_starts, sorted_keys.shape[0]))
+    return Grouping(
+        order=order,
+        group_starts=group_starts,
+        group_sizes=group_sizes
+    )
+
+
+def count_pairs_within_groups(grouping: Grouping) -> int:
+    sizes = grouping.group_sizes.astype(np.int64)
+    return int((sizes * (sizes - 1) // 2).sum())
+
+
+def generate_pairs_within_groups(grouping: Grouping
+                                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """Emits all unordered pairs of indices sharing a group, in the same order
+    as itertools.combinations applied to each group would produce.
+    """
+    sizes = grouping.group_sizes
+    position_in_group = np.arange(grouping.order.shape[0]) - \
+        np.repeat(grouping.group_starts, sizes)
+    partners_number = np.repeat(sizes, sizes) - position_in_group - 1
+    left = np.repeat(np.arange(grouping.order.shape[0]), partners_number)
+    run_starts = np.cumsum(partners_number) - partners_number
+    offsets = np.arange(left.shape[0]) - np.repeat(run_starts, partners_number)
+    right = left + offsets + 1
+    return grouping.order[left], grouping.order[right]
+
+
+def select_groups(grouping: Grouping, selected: np.ndarray) -> Grouping:
+    """Grouping limited to groups marked in selected mask."""
+    group_sizes = grouping.group_sizes[selected]
+    group_starts = np.cumsum(group_sizes) - group_sizes
+    members = np.arange(int(group_sizes.sum())) + np.repeat(
+        grouping.group_starts[selected] - group_starts, group_sizes
+    )
+    return Grouping(
+        order=grouping.order[members],
+        group_starts=group_starts,
+        group_sizes=group_sizes
+    )
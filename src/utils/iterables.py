@@ -1,14 +1,45 @@
-from functools import reduce
-from typing import TypeVar, Dict, Tuple, List, Iterable
+import queue
+import threading
+from typing import TypeVar, Dict, Tuple, List, Iterable, Iterator, \
+    Optional
 from itertools import islice
 
+import numpy as np
+
+from src.utils.grouping import group_by_keys
+
 K = TypeVar("K")
 V = TypeVar("V")
 
+# how often producer blocked on full buffer checks whether consumer is gone
+_PRODUCER_POLL_INTERVAL = 0.1
+_END_OF_ITEMS = object()
+
 
 def create_dictionary_of_lists(dictionary_specs: List[Tuple[K, V]]
                                ) -> Dict[K, List[V]]:
-    return reduce(append_to_dictionary_of_lists, dictionary_specs, {})
+    """Keys are encoded in order of first occurrence and values are gathered
+    into lists by sorting their codes, so that no per-record Python code runs
+    apart from hashing of keys.
+    """
+    if len(dictionary_specs) == 0:
+        return {}
+    keys, values = zip(*dictionary_specs)
+    keys_ids = {key: key_id for key_id, key in enumerate(dict.fromkeys(keys))}
+    encoded_keys = np.fromiter(
+        map(keys_ids.__getitem__, keys), dtype=np.int64, count=len(keys)
+    )
+    grouping = group_by_keys(keys=encoded_keys)
+    grouped_values = np.fromiter(values, dtype=object, count=len(values))[
+        grouping.order
+    ]
+    return dict(zip(
+        keys_ids,
+        (
+            group.tolist() for group
+            in np.split(grouped_values, grouping.group_starts[1:])
+        )
+    ))
 
 
 def append_to_dictionary_of_lists(dictionary: Dict[K, List[V]],
@@ -42,3 +73,51 @@ def sliding_window(seq: Iterable[V], n: int = 2) -> Iterable[Tuple[V, ...]]:
     for elem in it:
         result = result[1:] + (elem,)
         yield result
+
+
+def iterate_buffered(items: Iterable[V], buffer_size: int) -> Iterator[V]:
+    """Yields items produced by background thread, which runs up to
+    buffer_size items ahead of consumer. Errors of producer are raised in
+    consumer and producer is stopped when consumer abandons iteration.
+    Non-positive buffer_size iterates in the calling thread.
+    """
+    if buffer_size <= 0:
+        yield from items
+        return
+    buffer = queue.Queue(maxsize=buffer_size)
+    consumer_gone = threading.Event()
+
+    def put(item: V, error: Optional[BaseException]) -> bool:
+        while not consumer_gone.is_set():
+            try:
+                buffer.put((item, error), timeout=_PRODUCER_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item=item, error=None):
+                    return
+        except BaseException as error:
+            put(item=_END_OF_ITEMS, error=error)
+            return
+        put(item=_END_OF_ITEMS, error=None)
+
+    producer = threading.Thread(
+        target=produce, name="buffered-producer", daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is _END_OF_ITEMS:
+                return
+            yield item
+    finally:
+        consumer_gone.set()
+        producer.join()
@@ -0,0 +1,343 @@
+import argparse
+import itertools
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Tuple
+
+from src.utils.fs_utils import dump_json_to_file, parse_json
+from src.virus_simulation.conversion import convert_simulation_state_to_json
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+import src.config as global_config
+
+
+logging.getLogger().setLevel(global_config.LOGGING_LEVEL)
+
+BENCHMARK_RESULTS_KEY = "results"
+BENCHMARK_ENGINE_KEY = "engine"
+SIMULATION_ENGINE_NAME = "simulation_engine"
+VECTORIZED_ENGINE_NAME = "vectorized_engine"
+STEPS_PER_SECOND_METRIC = "steps_per_second"
+PEOPLE_STEPS_PER_SECOND_METRIC = "people_steps_per_second"
+PEAK_RSS_METRIC = "peak_rss_kb"
+GET_SIMULATION_STATE_METRIC = "get_simulation_state_seconds"
+CONVERT_TO_JSON_METRIC = "convert_simulation_state_to_json_seconds"
+SNAPSHOT_INITIALIZE_METRIC = "snapshot_initialize_seconds"
+HIGHER_IS_BETTER_METRICS = [
+    STEPS_PER_SECOND_METRIC,
+    PEOPLE_STEPS_PER_SECOND_METRIC
+]
+LOWER_IS_BETTER_METRICS = [
+    PEAK_RSS_METRIC,
+    GET_SIMULATION_STATE_METRIC,
+    CONVERT_TO_JSON_METRIC,
+    SNAPSHOT_INITIALIZE_METRIC
+]
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+
+
+@dataclass(frozen=True)
+class BenchmarkConfiguration:
+    people_number: int
+    map_size: int
+    max_person_step_size: int
+    steps: int
+
+    def to_name(self) -> str:
+        return f"people_{self.people_number}_map_{self.map_size}_" \
+            f"step_{self.max_person_step_size}_steps_{self.steps}"
+
+
+@dataclass(frozen=True)
+class Regression:
+    configuration_name: str
+    metric: str
+    baseline_value: float
+    current_value: float
+
+    @property
+    def relative_change(self) -> float:
+        return (self.current_value - self.baseline_value) / self.baseline_value
+
+
+def prepare_configurations_grid(people_numbers: List[int],
+                                map_sizes: List[int],
+                                max_person_step_sizes: List[int],
+                                steps: List[int]
+                                ) -> List[BenchmarkConfiguration]:
+    return [
+        BenchmarkConfiguration(
+            people_number=people_number,
+            map_size=map_size,
+            max_person_step_size=max_person_step_size,
+            steps=steps_number
+        ) for people_number, map_size, max_person_step_size, steps_number
+        in itertools.product(
+            people_numbers, map_sizes, max_person_step_sizes, steps
+        )
+    ]
+
+
+def run_benchmarks(configurations: List[BenchmarkConfiguration],
+                   target_path: str,
+                   vectorized: bool = False,
+                   repeats: int = 1,
+                   random_seed: int = 0
+                   ) -> List[Dict[str, Any]]:
+    results = []
+    for configuration in configurations:
+        logging.info(f"Benchmarking {configuration.to_name()}")
+        # Fresh process per configuration, so that peak RSS is not inherited
+        # from previously benchmarked (possibly larger) configurations.
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            metrics = executor.submit(
+                _benchmark_configuration,
+                configuration,
+                vectorized,
+                repeats,
+                random_seed
+            ).result()
+        result = asdict(configuration)
+        result[BENCHMARK_ENGINE_KEY] = VECTORIZED_ENGINE_NAME if vectorized \
+            else SIMULATION_ENGINE_NAME
+        result.update(metrics)
+        results.append(result)
+    logging.info(f"Persisting benchmark results under {target_path}")
+    dump_json_to_file(
+        target_path=target_path,
+        content={BENCHMARK_RESULTS_KEY: results}
+    )
+    return results
+
+
+def compare_benchmarks(baseline_path: str,
+                       current_path: str,
+                       threshold: float = DEFAULT_REGRESSION_THRESHOLD
+                       ) -> List[Regression]:
+    """Compares results of configurations present in both files. Metric
+    regresses if it got worse by more than threshold (relative to baseline).
+    """
+    baseline_results = _index_results(
+        results=parse_json(json_path=baseline_path)[BENCHMARK_RESULTS_KEY]
+    )
+    current_results = _index_results(
+        results=parse_json(json_path=current_path)[BENCHMARK_RESULTS_KEY]
+    )
+    regressions = []
+    for key in sorted(baseline_results.keys() & current_results.keys()):
+        baseline_result, current_result = \
+            baseline_results[key], current_results[key]
+        configuration_name = "_".join(str(k) for k in key)
+        for metric in HIGHER_IS_BETTER_METRICS + LOWER_IS_BETTER_METRICS:
+            baseline_value = baseline_result[metric]
+            current_value = current_result[metric]
+            if baseline_value <= 0:
+                continue
+            change = (current_value - baseline_value) / baseline_value
+            if metric in HIGHER_IS_BETTER_METRICS:
+                change = -change
+            if change > threshold:
+                regressions.append(Regression(
+                    configuration_name=configuration_name,
+                    metric=metric,
+                    baseline_value=baseline_value,
+                    current_value=current_value
+                ))
+    return regressions
+
+
+def _index_results(results: List[Dict[str, Any]]
+                   ) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+    return {
+        (
+            result[BENCHMARK_ENGINE_KEY],
+            result["people_number"],
+            result["map_size"],
+            result["max_person_step_size"],
+            result["steps"]
+        ): result
+        for result in results
+    }
+
+
+def _benchmark_configuration(configuration: BenchmarkConfiguration,
+                             vectorized: bool,
+                             repeats: int,
+                             random_seed: int
+                             ) -> Dict[str, float]:
+    engine_class = VectorizedSimulationEngine if vectorized \
+        else SimulationEngine
+    timings: Dict[str, List[float]] = {
+        "simulation": [],
+        GET_SIMULATION_STATE_METRIC: [],
+        CONVERT_TO_JSON_METRIC: [],
+        SNAPSHOT_INITIALIZE_METRIC: []
+    }
+    for _ in range(repeats):
+        simulation_engine = engine_class.initialize(
+            map_size=configuration.map_size,
+            max_person_step_size=configuration.max_person_step_size,
+            people_number=configuration.people_number,
+            initial_seek_people=1,
+            transmission_probability=0.5,
+            random_seed=random_seed
+        )
+        start = time.perf_counter()
+        for _ in range(configuration.steps):
+            simulation_engine.take_simulation_step()
+        timings["simulation"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        simulation_state = simulation_engine.get_simulation_state()
+        timings[GET_SIMULATION_STATE_METRIC].append(time.perf_counter() - start)
+
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            snapshot_path = os.path.join(snapshot_dir, "snapshot.json")
+            start = time.perf_counter()
+            convert_simulation_state_to_json(
+                simulation_state=simulation_state,
+                target_path=snapshot_path
+            )
+            timings[CONVERT_TO_JSON_METRIC].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            Snapshot.initialize(snapshot_path=snapshot_path)
+            timings[SNAPSHOT_INITIALIZE_METRIC].append(
+                time.perf_counter() - start
+            )
+    simulation_seconds = min(timings.pop("simulation"))
+    metrics = {metric: min(values) for metric, values in timings.items()}
+    metrics[STEPS_PER_SECOND_METRIC] = configuration.steps / simulation_seconds
+    metrics[PEOPLE_STEPS_PER_SECOND_METRIC] = \
+        configuration.people_number * configuration.steps / simulation_seconds
+    # ru_maxrss is reported in kilobytes on Linux
+    metrics[PEAK_RSS_METRIC] = resource.getrusage(
+        resource.RUSAGE_SELF
+    ).ru_maxrss
+    return metrics
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        "Scaling benchmarks of virus expansion simulation and snapshot pipeline"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser(
+        "run",
+        help="Run benchmarks over grid of configurations."
+    )
+    run_parser.add_argument(
+        "--benchmark_name",
+        help="Distinguishable name of benchmark results.",
+        type=str,
+        required=True
+    )
+    run_parser.add_argument(
+        "--people_number",
+        help="Numbers of people to place on map.",
+        type=int,
+        nargs="+",
+        default=[100, 1000]
+    )
+    run_parser.add_argument(
+        "--map_size",
+        help="Sizes of map (together with people number define density).",
+        type=int,
+        nargs="+",
+        default=[50, 200]
+    )
+    run_parser.add_argument(
+        "--max_person_step_size",
+        help="Max lengths of step in each direction.",
+        type=int,
+        nargs="+",
+        default=[10]
+    )
+    run_parser.add_argument(
+        "--steps",
+        help="Numbers of simulation steps.",
+        type=int,
+        nargs="+",
+        default=[100]
+    )
+    run_parser.add_argument(
+        "--repeats",
+        help="Number of repetitions per configuration (best time is kept).",
+        type=int,
+        default=1
+    )
+    run_parser.add_argument(
+        "--vectorized",
+        help="Benchmark NumPy-based simulation engine.",
+        action="store_true"
+    )
+    run_parser.add_argument(
+        "--random_seed",
+        help="Seed of benchmarked simulations.",
+        type=int,
+        default=0
+    )
+    compare_parser = subparsers.add_parser(
+        "compare",
+        help="Compare benchmark results against baseline."
+    )
+    compare_parser.add_argument(
+        "--baseline",
+        help="Path to baseline benchmark results.",
+        type=str,
+        required=True
+    )
+    compare_parser.add_argument(
+        "--current",
+        help="Path to current benchmark results.",
+        type=str,
+        required=True
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        help="Relative change of metric treated as regression.",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_benchmarks(
+            configurations=prepare_configurations_grid(
+                people_numbers=args.people_number,
+                map_sizes=args.map_size,
+                max_person_step_sizes=args.max_person_step_size,
+                steps=args.steps
+            ),
+            target_path=os.path.join(
+                global_config.BENCHMARK_OUTPUT_PATH,
+                f"{args.benchmark_name}_benchmark.json"
+            ),
+            vectorized=args.vectorized,
+            repeats=args.repeats,
+            random_seed=args.random_seed
+        )
+    else:
+        found_regressions = compare_benchmarks(
+            baseline_path=args.baseline,
+            current_path=args.current,
+            threshold=args.threshold
+        )
+        for regression in found_regressions:
+            logging.warning(
+                f"[{regression.configuration_name}] {regression.metric}: "
+                f"{regression.baseline_value:.4g} -> "
+                f"{regression.current_value:.4g} "
+                f"({regression.relative_change:+.1%})"
+            )
+        if found_regressions:
+            sys.exit(1)
+        logging.info("No regressions found.")
@@ -0,0 +1,527 @@
+from __future__ import annotations
+
+import argparse
+import os
+from dataclasses import dataclass, field, fields, MISSING
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from src.utils.fs_utils import parse_json
+from src.virus_simulation.contacts_aggregation import AggregatedContacts, \
+    COUNT_DTYPE
+from src.virus_simulation.crowding import GroupContacts
+from src.virus_simulation.errors import SnapshotParsingError
+from src.virus_simulation.primitives import CompactPosition2D, ReplayLog, \
+    NOT_SICK
+from src.virus_simulation.trace_encoding import EncodedTraces, \
+    RUN_OFFSET_DTYPE, RUN_LENGTH_DTYPES, get_delta_dtype, get_run_length_dtype
+import src.virus_simulation.config as simulation_config
+
+PEOPLE_ID_DTYPE = np.int32
+SICKNESS_START_DTYPE = np.int32
+TIME_STAMP_DTYPE = np.int32
+INTENSITY_DTYPE = np.float64
+TRACE_DTYPE = np.uint16
+GROUP_SIZE_DTYPE = np.int32
+# layouts of traces array - (people, steps, 2) was written before traces
+# were kept in TraceStore, without layout marker
+PEOPLE_MAJOR_TRACES_LAYOUT = 1
+STEPS_MAJOR_TRACES_LAYOUT = 2
+TRACES_LAYOUT = STEPS_MAJOR_TRACES_LAYOUT
+DUMP_CHUNK_ELEMENTS = 1 << 20
+
+
+@dataclass(frozen=True)
+class SnapshotArrays:
+    map_dimensions: np.ndarray
+    person_id: np.ndarray
+    sick: np.ndarray
+    sick_start: np.ndarray
+    contact_person_x: np.ndarray
+    contact_person_y: np.ndarray
+    contact_intensity: np.ndarray
+    contact_time_stamp: np.ndarray
+    # positions of people after each step - (steps, people, 2), left empty
+    # when traces are encoded
+    traces: np.ndarray = field(
+        default_factory=lambda: np.empty((0, 0, 2), dtype=TRACE_DTYPE)
+    )
+    traces_layout: np.ndarray = field(
+        default_factory=lambda: np.array(TRACES_LAYOUT, dtype=np.int64)
+    )
+    aggregated_person_x: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=PEOPLE_ID_DTYPE)
+    )
+    aggregated_person_y: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=PEOPLE_ID_DTYPE)
+    )
+    aggregated_intensity: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=INTENSITY_DTYPE)
+    )
+    aggregated_contacts_count: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=COUNT_DTYPE)
+    )
+    aggregated_first_time_stamp: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=TIME_STAMP_DTYPE)
+    )
+    aggregated_last_time_stamp: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=TIME_STAMP_DTYPE)
+    )
+    encoded_trace_steps: np.ndarray = field(
+        default_factory=lambda: np.zeros((), dtype=np.int64)
+    )
+    encoded_trace_start: np.ndarray = field(
+        default_factory=lambda: np.empty((0, 2), dtype=TRACE_DTYPE)
+    )
+    encoded_trace_run_offsets: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=RUN_OFFSET_DTYPE)
+    )
+    encoded_trace_run_deltas: np.ndarray = field(
+        default_factory=lambda: np.empty((0, 2), dtype=np.int8)
+    )
+    encoded_trace_run_lengths: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=RUN_LENGTH_DTYPES[0])
+    )
+    # replay log of snapshots that regenerate traces (and contacts) on demand
+    replay_start: np.ndarray = field(
+        default_factory=lambda: np.empty((0, 2), dtype=TRACE_DTYPE)
+    )
+    replay_random_states: np.ndarray = field(
+        default_factory=lambda: np.empty((0, 0), dtype=np.uint64)
+    )
+    replay_max_person_step_size: np.ndarray = field(
+        default_factory=lambda: np.zeros((), dtype=np.int64)
+    )
+    replay_contacts: np.ndarray = field(
+        default_factory=lambda: np.zeros((), dtype=np.bool_)
+    )
+    # group contacts of hot cells - members of i-th group follow the ones of
+    # preceding groups
+    group_time_stamp: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=TIME_STAMP_DTYPE)
+    )
+    group_size: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=GROUP_SIZE_DTYPE)
+    )
+    group_members: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=PEOPLE_ID_DTYPE)
+    )
+
+    @property
+    def people_number(self) -> int:
+        return self.person_id.shape[0]
+
+    @property
+    def contacts_number(self) -> int:
+        return self.contact_person_x.shape[0]
+
+    @property
+    def aggregated_contacts(self) -> AggregatedContacts:
+        return AggregatedContacts(
+            person_x=self.aggregated_person_x,
+            person_y=self.aggregated_person_y,
+            intensity=self.aggregated_intensity,
+            contacts_count=self.aggregated_contacts_count,
+            first_time_stamp=self.aggregated_first_time_stamp,
+            last_time_stamp=self.aggregated_last_time_stamp
+        )
+
+    @property
+    def group_contacts(self) -> GroupContacts:
+        return GroupContacts(
+            time_stamp=self.group_time_stamp,
+            sizes=self.group_size,
+            members=self.group_members
+        )
+
+    @property
+    def encoded_traces(self) -> Optional[EncodedTraces]:
+        if self.encoded_trace_run_offsets.shape[0] == 0:
+            return None
+        return EncodedTraces(
+            steps_number=int(self.encoded_trace_steps),
+            start=self.encoded_trace_start,
+            run_offsets=self.encoded_trace_run_offsets,
+            run_deltas=self.encoded_trace_run_deltas,
+            run_lengths=self.encoded_trace_run_lengths
+        )
+
+    @property
+    def replay_log(self) -> Optional[ReplayLog]:
+        if self.replay_start.shape[0] == 0:
+            return None
+        return ReplayLog(
+            start=self.replay_start,
+            random_states=self.replay_random_states,
+            max_person_step_size=int(self.replay_max_person_step_size),
+            contacts=bool(self.replay_contacts)
+        )
+
+
+def prepare_aggregated_contacts_arrays(aggregated_contacts: AggregatedContacts
+                                       ) -> Dict[str, np.ndarray]:
+    return {
+        "aggregated_person_x":
+            aggregated_contacts.person_x.astype(PEOPLE_ID_DTYPE),
+        "aggregated_person_y":
+            aggregated_contacts.person_y.astype(PEOPLE_ID_DTYPE),
+        "aggregated_intensity":
+            aggregated_contacts.intensity.astype(INTENSITY_DTYPE),
+        "aggregated_contacts_count":
+            aggregated_contacts.contacts_count.astype(COUNT_DTYPE),
+        "aggregated_first_time_stamp":
+            aggregated_contacts.first_time_stamp.astype(TIME_STAMP_DTYPE),
+        "aggregated_last_time_stamp":
+            aggregated_contacts.last_time_stamp.astype(TIME_STAMP_DTYPE)
+    }
+
+
+def prepare_group_contacts_arrays(group_contacts: GroupContacts
+                                  ) -> Dict[str, np.ndarray]:
+    return {
+        "group_time_stamp": group_contacts.time_stamp.astype(TIME_STAMP_DTYPE),
+        "group_size": group_contacts.sizes.astype(GROUP_SIZE_DTYPE),
+        "group_members": group_contacts.members.astype(PEOPLE_ID_DTYPE)
+    }
+
+
+def prepare_encoded_traces_arrays(encoded_traces: EncodedTraces
+                                  ) -> Dict[str, np.ndarray]:
+    return {
+        "encoded_trace_steps":
+            np.array(encoded_traces.steps_number, dtype=np.int64),
+        "encoded_trace_start": encoded_traces.start.astype(TRACE_DTYPE),
+        "encoded_trace_run_offsets":
+            encoded_traces.run_offsets.astype(RUN_OFFSET_DTYPE),
+        "encoded_trace_run_deltas": encoded_traces.run_deltas,
+        "encoded_trace_run_lengths": encoded_traces.run_lengths
+    }
+
+
+def prepare_replay_log_arrays(replay_log: ReplayLog) -> Dict[str, np.ndarray]:
+    return {
+        "replay_start": replay_log.start.astype(TRACE_DTYPE),
+        "replay_random_states": replay_log.random_states,
+        "replay_max_person_step_size":
+            np.array(replay_log.max_person_step_size, dtype=np.int64),
+        "replay_contacts": np.array(replay_log.contacts, dtype=np.bool_)
+    }
+
+
+def freeze_snapshot_arrays(snapshot_arrays: SnapshotArrays) -> SnapshotArrays:
+    for array_field in fields(SnapshotArrays):
+        getattr(snapshot_arrays, array_field.name).flags.writeable = False
+    return snapshot_arrays
+
+
+def dump_snapshot_arrays(snapshot_arrays: SnapshotArrays,
+                         target_dir: str,
+                         leading_arrays: Optional[Dict[str, np.ndarray]] = None
+                         ) -> None:
+    """leading_arrays (e.g. contacts spilled to disk) are written in front of
+    arrays of fields they are given for, chunk by chunk, so that they are
+    never concatenated in memory.
+    """
+    leading_arrays = leading_arrays or {}
+    os.makedirs(target_dir, exist_ok=True)
+    for array_field in fields(SnapshotArrays):
+        array_path = os.path.join(target_dir, f"{array_field.name}.npy")
+        array = getattr(snapshot_arrays, array_field.name)
+        if array_field.name in leading_arrays:
+            _dump_concatenated_array(
+                target_path=array_path,
+                arrays=[leading_arrays[array_field.name], array]
+            )
+        else:
+            np.save(array_path, array, allow_pickle=False)
+
+
+def _dump_concatenated_array(target_path: str,
+                             arrays: List[np.ndarray]
+                             ) -> None:
+    dtype = arrays[-1].dtype
+    elements_number = sum(array.shape[0] for array in arrays)
+    if elements_number == 0:
+        np.save(target_path, np.empty(0, dtype=dtype), allow_pickle=False)
+        return
+    target = np.lib.format.open_memmap(
+        target_path, mode="w+", dtype=dtype, shape=(elements_number,)
+    )
+    offset = 0
+    for array in arrays:
+        for first in range(0, array.shape[0], DUMP_CHUNK_ELEMENTS):
+            chunk = array[first:first + DUMP_CHUNK_ELEMENTS]
+            target[offset + first:offset + first + chunk.shape[0]] = chunk
+        offset += array.shape[0]
+    target.flush()
+    del target
+
+
+def load_snapshot_arrays(snapshot_dir: str,
+                         memory_map: bool = True
+                         ) -> SnapshotArrays:
+    mmap_mode = "r" if memory_map else None
+    arrays = {}
+    for array_field in fields(SnapshotArrays):
+        array_path = os.path.join(snapshot_dir, f"{array_field.name}.npy")
+        if not os.path.isfile(array_path):
+            if array_field.default_factory is not MISSING:
+                continue
+            raise SnapshotParsingError(
+                f"Binary snapshot {snapshot_dir} misses {array_field.name} array."
+            )
+        arrays[array_field.name] = np.load(
+            array_path, mmap_mode=mmap_mode, allow_pickle=False
+        )
+    traces_layout = _get_traces_layout(
+        snapshot_dir=snapshot_dir,
+        traces_layout=arrays.pop("traces_layout", None),
+        traces=arrays.get("traces"),
+        people_number=arrays["person_id"].shape[0]
+    )
+    if traces_layout == PEOPLE_MAJOR_TRACES_LAYOUT:
+        arrays["traces"] = arrays["traces"].transpose(1, 0, 2)
+    return SnapshotArrays(**arrays)
+
+
+def _get_traces_layout(snapshot_dir: str,
+                       traces_layout: Optional[np.ndarray],
+                       traces: Optional[np.ndarray],
+                       people_number: int
+                       ) -> int:
+    """Layout of traces of snapshot, inferred from shape of traces if
+    snapshot has no layout marker.
+    """
+    if traces_layout is not None:
+        traces_layout = int(traces_layout)
+        if traces_layout not in (
+                PEOPLE_MAJOR_TRACES_LAYOUT, STEPS_MAJOR_TRACES_LAYOUT):
+            raise SnapshotParsingError(
+                f"Binary snapshot {snapshot_dir} has unknown traces layout "
+                f"{traces_layout}."
+            )
+        return traces_layout
+    if traces is None or traces.size == 0:
+        return STEPS_MAJOR_TRACES_LAYOUT
+    people_major = traces.shape[0] == people_number
+    steps_major = traces.shape[1] == people_number
+    if people_major and steps_major:
+        raise SnapshotParsingError(
+            f"Layout of traces of binary snapshot {snapshot_dir} is "
+            f"ambiguous - it has no layout marker and as many steps as "
+            f"people, convert it again from JSON."
+        )
+    if not people_major and not steps_major:
+        raise SnapshotParsingError(
+            f"Traces of binary snapshot {snapshot_dir} do not match people."
+        )
+    return PEOPLE_MAJOR_TRACES_LAYOUT if people_major \
+        else STEPS_MAJOR_TRACES_LAYOUT
+
+
+def convert_snapshot_json_to_arrays(snapshot_json: Dict[str, Any]
+                                    ) -> SnapshotArrays:
+    people = snapshot_json[simulation_config.GRAPH_VERTICES_KEY]
+    contacts = snapshot_json[simulation_config.GRAPH_EDGES_KEY]
+    person_id = np.array(
+        [p[simulation_config.PERSON_ID_KEY] for p in people],
+        dtype=PEOPLE_ID_DTYPE
+    )
+    sick_start = [p[simulation_config.SICKNESS_START_KEY] for p in people]
+    contact_pairs = np.array(
+        [c[simulation_config.CONTACT_PAIR_KEY] for c in contacts],
+        dtype=PEOPLE_ID_DTYPE
+    ).reshape(-1, 2)
+    if simulation_config.ENCODED_PEOPLE_TRACES_KEY in snapshot_json:
+        traces_arrays = prepare_encoded_traces_arrays(
+            encoded_traces=convert_encoded_traces_json(
+                encoded_traces=snapshot_json[
+                    simulation_config.ENCODED_PEOPLE_TRACES_KEY
+                ]
+            )
+        )
+    else:
+        people_traces = snapshot_json[simulation_config.PEOPLE_TRACES_KEY]
+        traces_arrays = {
+            "traces": _stack_traces(
+                traces=[
+                    people_traces.get(str(p), []) for p in person_id.tolist()
+                ]
+            )
+        }
+    aggregated_contacts = _convert_aggregated_contacts_json(
+        aggregated_contacts=snapshot_json.get(
+            simulation_config.AGGREGATED_EDGES_KEY, []
+        )
+    )
+    return SnapshotArrays(
+        map_dimensions=np.array(
+            snapshot_json[simulation_config.MAP_DIMENSIONS_KEY], dtype=np.int64
+        ),
+        person_id=person_id,
+        sick=np.array(
+            [p[simulation_config.SICKNESS_STATUS_KEY] for p in people],
+            dtype=np.bool_
+        ),
+        sick_start=np.array(
+            [NOT_SICK if s is None else s for s in sick_start],
+            dtype=SICKNESS_START_DTYPE
+        ),
+        contact_person_x=contact_pairs[:, 0].copy(),
+        contact_person_y=contact_pairs[:, 1].copy(),
+        contact_intensity=np.array(
+            [c[simulation_config.CONTACT_DURATION_KEY] for c in contacts],
+            dtype=INTENSITY_DTYPE
+        ),
+        contact_time_stamp=np.array(
+            [c[simulation_config.CONTACT_TIME_STAMP_KEY] for c in contacts],
+            dtype=TIME_STAMP_DTYPE
+        ),
+        **traces_arrays,
+        **prepare_aggregated_contacts_arrays(
+            aggregated_contacts=aggregated_contacts
+        ),
+        **prepare_group_contacts_arrays(
+            group_contacts=convert_group_contacts_json(
+                group_contacts=snapshot_json.get(
+                    simulation_config.GROUP_EDGES_KEY, []
+                )
+            )
+        )
+    )
+
+
+def _convert_aggregated_contacts_json(aggregated_contacts: List[Dict[str, Any]]
+                                      ) -> AggregatedContacts:
+    pairs = np.array(
+        [c[simulation_config.CONTACT_PAIR_KEY] for c in aggregated_contacts],
+        dtype=PEOPLE_ID_DTYPE
+    ).reshape(-1, 2)
+    return AggregatedContacts(
+        person_x=pairs[:, 0],
+        person_y=pairs[:, 1],
+        intensity=np.array(
+            [
+                c[simulation_config.CONTACT_DURATION_KEY]
+                for c in aggregated_contacts
+            ],
+            dtype=INTENSITY_DTYPE
+        ),
+        contacts_count=np.array(
+            [c[simulation_config.CONTACTS_COUNT_KEY] for c in aggregated_contacts],
+            dtype=COUNT_DTYPE
+        ),
+        first_time_stamp=np.array(
+            [
+                c[simulation_config.FIRST_CONTACT_TIME_STAMP_KEY]
+                for c in aggregated_contacts
+            ],
+            dtype=TIME_STAMP_DTYPE
+        ),
+        last_time_stamp=np.array(
+            [
+                c[simulation_config.LAST_CONTACT_TIME_STAMP_KEY]
+                for c in aggregated_contacts
+            ],
+            dtype=TIME_STAMP_DTYPE
+        )
+    )
+
+
+def convert_group_contacts_json(group_contacts: List[Dict[str, Any]]
+                                ) -> GroupContacts:
+    return GroupContacts(
+        time_stamp=np.array(
+            [
+                c[simulation_config.CONTACT_TIME_STAMP_KEY]
+                for c in group_contacts
+            ],
+            dtype=TIME_STAMP_DTYPE
+        ),
+        sizes=np.array(
+            [len(c[simulation_config.GROUP_MEMBERS_KEY]) for c in group_contacts],
+            dtype=GROUP_SIZE_DTYPE
+        ),
+        members=np.array(
+            [
+                person_id for c in group_contacts
+                for person_id in c[simulation_config.GROUP_MEMBERS_KEY]
+            ],
+            dtype=PEOPLE_ID_DTYPE
+        )
+    )
+
+
+def convert_encoded_traces_json(encoded_traces: Dict[str, Any]
+                                 ) -> EncodedTraces:
+    run_deltas = np.array(
+        encoded_traces[simulation_config.TRACE_RUN_DELTAS_KEY], dtype=np.int64
+    ).reshape(-1, 2)
+    run_lengths = np.array(
+        encoded_traces[simulation_config.TRACE_RUN_LENGTHS_KEY], dtype=np.int64
+    )
+    return EncodedTraces(
+        steps_number=encoded_traces[simulation_config.TRACE_STEPS_KEY],
+        start=np.array(
+            encoded_traces[simulation_config.TRACE_START_KEY],
+            dtype=TRACE_DTYPE
+        ).reshape(-1, 2),
+        run_offsets=np.array(
+            encoded_traces[simulation_config.TRACE_RUN_OFFSETS_KEY],
+            dtype=RUN_OFFSET_DTYPE
+        ),
+        run_deltas=run_deltas.astype(get_delta_dtype(
+            max_delta=int(np.abs(run_deltas).max(initial=0))
+        )),
+        run_lengths=run_lengths.astype(get_run_length_dtype(
+            max_run_length=int(run_lengths.max(initial=0))
+        ))
+    )
+
+
+def _stack_traces(traces: List[List[CompactPosition2D]]) -> np.ndarray:
+    steps = max((len(trace) for trace in traces), default=0)
+    if any(len(trace) != steps for trace in traces):
+        raise SnapshotParsingError("People traces differ in length.")
+    traces = np.array(traces, dtype=TRACE_DTYPE).reshape(len(traces), steps, 2)
+    return np.ascontiguousarray(traces.transpose(1, 0, 2))
+
+
+def convert_json_snapshot_to_binary(json_snapshot_path: str,
+                                    target_dir: str
+                                    ) -> None:
+    snapshot_json = parse_json(json_path=json_snapshot_path)
+    dump_snapshot_arrays(
+        snapshot_arrays=convert_snapshot_json_to_arrays(
+            snapshot_json=snapshot_json
+        ),
+        target_dir=target_dir
+    )
+
+
+def get_binary_snapshot_path(json_snapshot_path: str) -> str:
+    root, _ = os.path.splitext(json_snapshot_path)
+    return root
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        "Converter of JSON simulation snapshots into binary columnar format"
+    )
+    parser.add_argument(
+        "--json_snapshots",
+        help="Paths to JSON snapshots to be converted.",
+        type=str,
+        nargs="+",
+        required=True
+    )
+    args = parser.parse_args()
+
+    for json_snapshot_path in args.json_snapshots:
+        convert_json_snapshot_to_binary(
+            json_snapshot_path=json_snapshot_path,
+            target_dir=get_binary_snapshot_path(
+                json_snapshot_path=json_snapshot_path
+            )
+        )
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, fields, asdict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from src.utils.fs_utils import create_parent_dir
+from src.virus_simulation.contacts_aggregation import AggregatedContacts
+from src.virus_simulation.crowding import GroupContacts, EXACT_CROWDING, \
+    DEFAULT_MAX_PARTNERS
+from src.virus_simulation.errors import SimulationError
+
+CHECKPOINT_EXTENSION = ".npz"
+NO_PREVIOUS_CHECKPOINT = ""
+RANDOM_STATE_KEY = "random"
+ARRAY_RANDOM_STATE_KEY = "array_random"
+
+
+@dataclass(frozen=True)
+class EngineParameters:
+    engine: str
+    max_x: int
+    max_y: int
+    transmission_probability: float
+    max_person_step_size: int
+    transmission_only: bool
+    aggregate_contacts: bool
+    crowding_mode: str = EXACT_CROWDING
+    max_partners: int = DEFAULT_MAX_PARTNERS
+
+
+@dataclass(frozen=True)
+class EngineCheckpoint:
+    """Current state of simulation engine (with state of its random
+    generators) and history recorded since first_time_stamp. History before
+    that is held by previous checkpoints in chain, so that cost of each
+    checkpoint does not depend on length of whole simulation.
+    """
+    engine_parameters: EngineParameters
+    random_state: Dict[str, Any]
+    time_stamp: int
+    positions: np.ndarray
+    sick: np.ndarray
+    sick_start: np.ndarray
+    initially_sick: np.ndarray
+    first_time_stamp: int
+    meetings_x: np.ndarray
+    meetings_y: np.ndarray
+    meetings_intensity: np.ndarray
+    meetings_time_stamp: np.ndarray
+    traces: np.ndarray
+    aggregated_contacts: Optional[AggregatedContacts] = None
+    group_contacts: Optional[GroupContacts] = None
+    previous_checkpoint: str = NO_PREVIOUS_CHECKPOINT
+
+
+@dataclass(frozen=True)
+class RestoredHistory:
+    """History of simulation gathered from whole chain of checkpoints."""
+    meetings_x: np.ndarray
+    meetings_y: np.ndarray
+    meetings_intensity: np.ndarray
+    meetings_time_stamp: np.ndarray
+    traces: np.ndarray
+    group_contacts: GroupContacts
+
+
+_SCALAR_FIELDS = {"time_stamp", "first_time_stamp", "previous_checkpoint"}
+_JSON_FIELDS = {"random_state"}
+_AGGREGATED_PREFIX = "aggregated_"
+_GROUP_PREFIX = "group_"
+
+
+def dump_checkpoint(checkpoint: EngineCheckpoint, target_path: str) -> None:
+    arrays = {}
+    for checkpoint_field in fields(EngineCheckpoint):
+        name = checkpoint_field.name
+        value = getattr(checkpoint, name)
+        if name == "aggregated_contacts":
+            if value is not None:
+                arrays.update({
+                    f"{_AGGREGATED_PREFIX}{f.name}": getattr(value, f.name)
+                    for f in fields(AggregatedContacts)
+                })
+        elif name == "group_contacts":
+            if value is not None:
+                arrays.update({
+                    f"{_GROUP_PREFIX}{f.name}": getattr(value, f.name)
+                    for f in fields(GroupContacts)
+                })
+        elif name == "engine_parameters":
+            arrays[name] = np.array(json.dumps(asdict(value)))
+        elif name in _JSON_FIELDS:
+            arrays[name] = np.array(json.dumps(value))
+        else:
+            arrays[name] = np.asarray(value)
+    create_parent_dir(path=target_path)
+    # written under temporary name first, so that failure while dumping
+    # never leaves broken checkpoint behind
+    temporary_path = f"{target_path}.tmp{CHECKPOINT_EXTENSION}"
+    np.savez(temporary_path, **arrays)
+    os.replace(temporary_path, target_path)
+
+
+def load_checkpoint(checkpoint_path: str) -> EngineCheckpoint:
+    if not os.path.isfile(checkpoint_path):
+        raise SimulationError(f"Checkpoint {checkpoint_path} does not exist.")
+    with np.load(checkpoint_path, allow_pickle=False) as checkpoint_file:
+        arrays = {name: checkpoint_file[name] for name in checkpoint_file.files}
+    checkpoint = {}
+    for checkpoint_field in fields(EngineCheckpoint):
+        name = checkpoint_field.name
+        if name in ("aggregated_contacts", "group_contacts"):
+            continue
+        if name == "engine_parameters":
+            checkpoint[name] = EngineParameters(**json.loads(str(arrays[name])))
+        elif name in _JSON_FIELDS:
+            checkpoint[name] = json.loads(str(arrays[name]))
+        elif name in _SCALAR_FIELDS:
+            checkpoint[name] = arrays[name].item()
+        else:
+            checkpoint[name] = arrays[name]
+    if f"{_AGGREGATED_PREFIX}person_x" in arrays:
+        checkpoint["aggregated_contacts"] = AggregatedContacts(**{
+            f.name: arrays[f"{_AGGREGATED_PREFIX}{f.name}"]
+            for f in fields(AggregatedContacts)
+        })
+    if f"{_GROUP_PREFIX}members" in arrays:
+        checkpoint["group_contacts"] = GroupContacts(**{
+            f.name: arrays[f"{_GROUP_PREFIX}{f.name}"]
+            for f in fields(GroupContacts)
+        })
+    return EngineCheckpoint(**checkpoint)
+
+
+def load_checkpoints_chain(checkpoint_path: str) -> List[EngineCheckpoint]:
+    """Loads checkpoint with all checkpoints preceding it, oldest first."""
+    checkpoints = [load_checkpoint(checkpoint_path=checkpoint_path)]
+    while checkpoints[-1].previous_checkpoint != NO_PREVIOUS_CHECKPOINT:
+        # previous checkpoint is referred relatively to the following one
+        checkpoint_path = os.path.join(
+            os.path.dirname(checkpoint_path),
+            checkpoints[-1].previous_checkpoint
+        )
+        checkpoints.append(load_checkpoint(checkpoint_path=checkpoint_path))
+    checkpoints.reverse()
+    return checkpoints
+
+
+def restore_history(checkpoints: List[EngineCheckpoint]) -> RestoredHistory:
+    last_checkpoint = checkpoints[-1]
+    return RestoredHistory(
+        meetings_x=np.concatenate([c.meetings_x for c in checkpoints]),
+        meetings_y=np.concatenate([c.meetings_y for c in checkpoints]),
+        meetings_intensity=np.concatenate(
+            [c.meetings_intensity for c in checkpoints]
+        ),
+        meetings_time_stamp=np.concatenate(
+            [c.meetings_time_stamp for c in checkpoints]
+        ),
+        traces=np.concatenate([c.traces for c in checkpoints], axis=0).reshape(
+            -1, last_checkpoint.positions.shape[0], 2
+        ),
+        group_contacts=GroupContacts.concatenate(group_contacts=[
+            c.group_contacts for c in checkpoints
+            if c.group_contacts is not None
+        ])
+    )
+
+
+def check_engine_parameters(engine_parameters: EngineParameters,
+                            engine: str
+                            ) -> None:
+    if engine_parameters.engine != engine:
+        raise SimulationError(
+            f"Checkpoint of {engine_parameters.engine} cannot be restored "
+            f"by {engine}."
+        )
+
+
+def dump_random_generator_state(random_generator: np.random.Generator
+                                ) -> Dict[str, Any]:
+    return random_generator.bit_generator.state
+
+
+def restore_random_generator(state: Dict[str, Any]) -> np.random.Generator:
+    bit_generator = getattr(np.random, state["bit_generator"])()
+    bit_generator.state = state
+    return np.random.Generator(bit_generator)
+
+
+def get_checkpoint_path(checkpoints_dir: str,
+                        simulation_name: str,
+                        step: int
+                        ) -> str:
+    return os.path.join(
+        checkpoints_dir,
+        f"{simulation_name}_checkpoint_{step}{CHECKPOINT_EXTENSION}"
+    )
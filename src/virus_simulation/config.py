@@ -8,3 +8,30 @@ GRAPH_VERTICES_KEY = "people"
 GRAPH_EDGES_KEY = "contacts"
 MAP_DIMENSIONS_KEY = "map_dimensions"
 PEOPLE_TRACES_KEY = "people_traces"
+PEOPLE_NUMBER_KEY = "people_number"
+SEGMENT_STEPS_KEY = "segment_steps"
+SNAPSHOT_SEGMENTS_KEY = "segments"
+SEGMENT_PATH_KEY = "segment_path"
+AGGREGATED_EDGES_KEY = "aggregated_contacts"
+GROUP_EDGES_KEY = "group_contacts"
+GROUP_MEMBERS_KEY = "group_members"
+CONTACTS_COUNT_KEY = "contacts_count"
+FIRST_CONTACT_TIME_STAMP_KEY = "first_contact_time_stamp"
+LAST_CONTACT_TIME_STAMP_KEY = "last_contact_time_stamp"
+ENCODED_PEOPLE_TRACES_KEY = "encoded_people_traces"
+TRACE_STEPS_KEY = "steps"
+TRACE_START_KEY = "start"
+TRACE_RUN_OFFSETS_KEY = "run_offsets"
+TRACE_RUN_DELTAS_KEY = "run_deltas"
+TRACE_RUN_LENGTHS_KEY = "run_lengths"
+SIMULATION_NAME_KEY = "simulation_name"
+INDEXED_SNAPSHOTS_KEY = "snapshots"
+SNAPSHOT_STEP_KEY = "step"
+SNAPSHOT_FORMAT_KEY = "snapshot_format"
+SNAPSHOT_PATH_KEY = "snapshot_path"
+SNAPSHOT_BYTES_KEY = "snapshot_bytes"
+SICK_NUMBER_KEY = "sick_number"
+CONTACTS_NUMBER_KEY = "contacts_number"
+AGGREGATED_CONTACTS_NUMBER_KEY = "aggregated_contacts_number"
+SECTION_OFFSETS_KEY = "section_offsets"
+GROUP_CONTACTS_NUMBER_KEY = "group_contacts_number"
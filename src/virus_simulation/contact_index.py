@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+CONTACT_ID_DTYPE = np.int64
+
+
+@dataclass(frozen=True)
+class ContactsSlice:
+    """Read-only views of contacts - arguments of
+    build_adjacency_matrix_from_contacts().
+    """
+    person_x: np.ndarray
+    person_y: np.ndarray
+    intensity: np.ndarray
+    time_stamp: np.ndarray
+
+    @property
+    def contacts_number(self) -> int:
+        return self.person_x.shape[0]
+
+
+@dataclass(frozen=True)
+class PersonContacts:
+    """Read-only views of contacts of single person in time order, contact_id
+    points into contacts sorted by time stamp.
+    """
+    contact_id: np.ndarray
+    partner: np.ndarray
+    intensity: np.ndarray
+    time_stamp: np.ndarray
+
+    @property
+    def contacts_number(self) -> int:
+        return self.contact_id.shape[0]
+
+
+class ContactIndex:
+    """Contacts sorted by time stamp with offsets of each step, together with
+    CSR-style index of contacts of each person. Time windows are sliced in
+    O(1) and contacts of person in O(log n + result), both as array views.
+    """
+
+    @classmethod
+    def initialize(cls,
+                   person_x: np.ndarray,
+                   person_y: np.ndarray,
+                   intensity: np.ndarray,
+                   time_stamp: np.ndarray,
+                   people_number: int
+                   ) -> ContactIndex:
+        # engines emit contacts in time order already, so sorting is
+        # usually skipped
+        if np.any(time_stamp[1:] < time_stamp[:-1]):
+            order = np.argsort(time_stamp, kind="stable")
+            person_x, person_y = person_x[order], person_y[order]
+            intensity, time_stamp = intensity[order], time_stamp[order]
+        return cls(
+            contacts=ContactsSlice(
+                person_x=_freeze(array=person_x),
+                person_y=_freeze(array=person_y),
+                intensity=_freeze(array=intensity),
+                time_stamp=_freeze(array=time_stamp)
+            ),
+            people_number=people_number
+        )
+
+    def __init__(self, contacts: ContactsSlice, people_number: int):
+        self.__contacts = contacts
+        time_stamp = contacts.time_stamp
+        steps_number = int(time_stamp[-1]) + 1 \
+            if contacts.contacts_number > 0 else 0
+        # contacts of t-th step are [step_offsets[t], step_offsets[t + 1])
+        self.__step_offsets = np.searchsorted(
+            time_stamp, np.arange(steps_number + 1)
+        ).astype(CONTACT_ID_DTYPE)
+        # both endpoints of i-th contact are placed at 2i and 2i + 1, so that
+        # stable sort by person keeps time order within each person
+        endpoint = np.stack(
+            (contacts.person_x, contacts.person_y), axis=1
+        ).reshape(-1)
+        partner = np.stack(
+            (contacts.person_y, contacts.person_x), axis=1
+        ).reshape(-1)
+        order = np.argsort(endpoint, kind="stable")
+        person_contact_id = (order // 2).astype(CONTACT_ID_DTYPE)
+        self.__person_offsets = np.concatenate((
+            [0], np.cumsum(np.bincount(endpoint, minlength=people_number))
+        )).astype(CONTACT_ID_DTYPE)
+        self.__person_contacts = PersonContacts(
+            contact_id=_freeze(array=person_contact_id),
+            partner=_freeze(array=partner[order]),
+            intensity=_freeze(array=contacts.intensity[person_contact_id]),
+            time_stamp=_freeze(array=time_stamp[person_contact_id])
+        )
+
+    @property
+    def contacts(self) -> ContactsSlice:
+        return self.__contacts
+
+    @property
+    def steps_number(self) -> int:
+        return self.__step_offsets.shape[0] - 1
+
+    @property
+    def people_number(self) -> int:
+        return self.__person_offsets.shape[0] - 1
+
+    def get_contacts(self,
+                     first_time_stamp: Optional[int] = None,
+                     last_time_stamp: Optional[int] = None
+                     ) -> ContactsSlice:
+        """Contacts with time stamps in [first_time_stamp, last_time_stamp)."""
+        first_contact, last_contact = self.__get_contacts_range(
+            first_time_stamp=first_time_stamp,
+            last_time_stamp=last_time_stamp
+        )
+        contacts = self.__contacts
+        return ContactsSlice(
+            person_x=contacts.person_x[first_contact:last_contact],
+            person_y=contacts.person_y[first_contact:last_contact],
+            intensity=contacts.intensity[first_contact:last_contact],
+            time_stamp=contacts.time_stamp[first_contact:last_contact]
+        )
+
+    def get_contacts_before(self, time_stamp: int, steps: int) -> ContactsSlice:
+        """Contacts in steps steps preceding given time stamp (e.g. infection
+        of person).
+        """
+        return self.get_contacts(
+            first_time_stamp=time_stamp - steps,
+            last_time_stamp=time_stamp
+        )
+
+    def get_person_contacts(self,
+                            person_id: int,
+                            first_time_stamp: Optional[int] = None,
+                            last_time_stamp: Optional[int] = None
+                            ) -> PersonContacts:
+        """Contacts of person with time stamps in
+        [first_time_stamp, last_time_stamp).
+        """
+        if not 0 <= person_id < self.people_number:
+            return _slice_person_contacts(
+                person_contacts=self.__person_contacts, first=0, last=0
+            )
+        first = int(self.__person_offsets[person_id])
+        last = int(self.__person_offsets[person_id + 1])
+        time_stamp = self.__person_contacts.time_stamp[first:last]
+        if first_time_stamp is not None:
+            first += int(np.searchsorted(time_stamp, first_time_stamp))
+        if last_time_stamp is not None:
+            last -= time_stamp.shape[0] - \
+                int(np.searchsorted(time_stamp, last_time_stamp))
+        return _slice_person_contacts(
+            person_contacts=self.__person_contacts,
+            first=first,
+            last=max(first, last)
+        )
+
+    def __get_contacts_range(self,
+                             first_time_stamp: Optional[int],
+                             last_time_stamp: Optional[int]
+                             ) -> Tuple[int, int]:
+        first_contact = self.__get_step_offset(
+            time_stamp=0 if first_time_stamp is None else first_time_stamp
+        )
+        last_contact = self.__get_step_offset(
+            time_stamp=self.steps_number if last_time_stamp is None
+            else last_time_stamp
+        )
+        return first_contact, max(first_contact, last_contact)
+
+    def __get_step_offset(self, time_stamp: int) -> int:
+        step = min(max(time_stamp, 0), self.steps_number)
+        return int(self.__step_offsets[step])
+
+
+def _slice_person_contacts(person_contacts: PersonContacts,
+                           first: int,
+                           last: int
+                           ) -> PersonContacts:
+    return PersonContacts(
+        contact_id=person_contacts.contact_id[first:last],
+        partner=person_contacts.partner[first:last],
+        intensity=person_contacts.intensity[first:last],
+        time_stamp=person_contacts.time_stamp[first:last]
+    )
+
+
+def _freeze(array: np.ndarray) -> np.ndarray:
+    array = array.view()
+    array.flags.writeable = False
+    return array
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+PAIR_KEY_DTYPE = np.int64
+COUNT_DTYPE = np.int64
+TIME_STAMP_DTYPE = np.int32
+
+
+@dataclass(frozen=True)
+class AggregatedContacts:
+    person_x: np.ndarray
+    person_y: np.ndarray
+    intensity: np.ndarray
+    contacts_count: np.ndarray
+    first_time_stamp: np.ndarray
+    last_time_stamp: np.ndarray
+
+    @property
+    def pairs_number(self) -> int:
+        return self.person_x.shape[0]
+
+    def updated_since(self, time_stamp: int) -> AggregatedContacts:
+        """Records of pairs that met at given step or later."""
+        updated = self.last_time_stamp >= time_stamp
+        return AggregatedContacts(
+            person_x=self.person_x[updated],
+            person_y=self.person_y[updated],
+            intensity=self.intensity[updated],
+            contacts_count=self.contacts_count[updated],
+            first_time_stamp=self.first_time_stamp[updated],
+            last_time_stamp=self.last_time_stamp[updated]
+        )
+
+
+@dataclass(frozen=True)
+class _PairsRun:
+    """Records of pairs sorted by pair key - arrays are updated in place."""
+    pair_keys: np.ndarray
+    intensity: np.ndarray
+    contacts_count: np.ndarray
+    first_time_stamp: np.ndarray
+    last_time_stamp: np.ndarray
+
+    @property
+    def pairs_number(self) -> int:
+        return self.pair_keys.shape[0]
+
+    def merge(self, other: _PairsRun) -> _PairsRun:
+        """Single run of records of both runs, which hold distinct pairs."""
+        pairs_number = self.pairs_number + other.pairs_number
+        other_positions = np.searchsorted(self.pair_keys, other.pair_keys) + \
+            np.arange(other.pairs_number)
+        from_other = np.zeros(pairs_number, dtype=np.bool_)
+        from_other[other_positions] = True
+        columns = {}
+        for name in _RUN_COLUMNS:
+            own_column = getattr(self, name)
+            column = np.empty(pairs_number, dtype=own_column.dtype)
+            column[~from_other] = own_column
+            column[from_other] = getattr(other, name)
+            columns[name] = column
+        return _PairsRun(**columns)
+
+
+_RUN_COLUMNS = (
+    "pair_keys", "intensity", "contacts_count", "first_time_stamp",
+    "last_time_stamp"
+)
+
+
+class ContactsAggregator:
+    """Keeps one record per unordered pair of people that ever met - summed
+    intensity, number of contacts and time stamps of first and last contact -
+    in sorted runs of records. Pairs met for the first time in a step form a
+    new run, which is merged with the preceding ones while they are not
+    larger, so that each record takes part in O(log pairs) merges instead of
+    shifting all records on every step.
+    """
+
+    def __init__(self, people_number: int):
+        self.__people_number = people_number
+        # runs in order of decreasing size
+        self.__runs: List[_PairsRun] = []
+
+    @classmethod
+    def restore(cls,
+                people_number: int,
+                aggregated_contacts: AggregatedContacts
+                ) -> ContactsAggregator:
+        contacts_aggregator = cls(people_number=people_number)
+        contacts_aggregator.__append_run(run=_PairsRun(
+            pair_keys=aggregated_contacts.person_x.astype(PAIR_KEY_DTYPE) *
+            people_number + aggregated_contacts.person_y,
+            intensity=aggregated_contacts.intensity.astype(np.float64),
+            contacts_count=
+            aggregated_contacts.contacts_count.astype(COUNT_DTYPE),
+            first_time_stamp=
+            aggregated_contacts.first_time_stamp.astype(TIME_STAMP_DTYPE),
+            last_time_stamp=
+            aggregated_contacts.last_time_stamp.astype(TIME_STAMP_DTYPE)
+        ))
+        return contacts_aggregator
+
+    @property
+    def pairs_number(self) -> int:
+        return sum(run.pairs_number for run in self.__runs)
+
+    def add_contacts(self,
+                     person_x: np.ndarray,
+                     person_y: np.ndarray,
+                     intensity: np.ndarray,
+                     time_stamp: int
+                     ) -> None:
+        if person_x.shape[0] == 0:
+            return
+        pair_keys = np.minimum(person_x, person_y).astype(PAIR_KEY_DTYPE) * \
+            self.__people_number + np.maximum(person_x, person_y)
+        step_keys, step_index = np.unique(pair_keys, return_inverse=True)
+        step_index = step_index.reshape(-1)
+        step_intensity = np.bincount(
+            step_index, weights=intensity, minlength=step_keys.shape[0]
+        )
+        step_count = np.bincount(step_index, minlength=step_keys.shape[0])
+        for run in self.__runs:
+            positions = np.searchsorted(run.pair_keys, step_keys)
+            known = positions < run.pairs_number
+            known[known] = run.pair_keys[positions[known]] == step_keys[known]
+            known_positions = positions[known]
+            run.intensity[known_positions] += step_intensity[known]
+            run.contacts_count[known_positions] += step_count[known]
+            run.last_time_stamp[known_positions] = time_stamp
+            step_keys = step_keys[~known]
+            step_intensity = step_intensity[~known]
+            step_count = step_count[~known]
+        if step_keys.shape[0] == 0:
+            return
+        self.__append_run(run=_PairsRun(
+            pair_keys=step_keys,
+            intensity=step_intensity.astype(np.float64),
+            contacts_count=step_count.astype(COUNT_DTYPE),
+            first_time_stamp=np.full(
+                step_keys.shape[0], time_stamp, dtype=TIME_STAMP_DTYPE
+            ),
+            last_time_stamp=np.full(
+                step_keys.shape[0], time_stamp, dtype=TIME_STAMP_DTYPE
+            )
+        ))
+
+    def get_aggregated_contacts(self) -> AggregatedContacts:
+        self.__compact()
+        run = self.__runs[0] if len(self.__runs) > 0 else _PairsRun(
+            pair_keys=np.empty(0, dtype=PAIR_KEY_DTYPE),
+            intensity=np.empty(0, dtype=np.float64),
+            contacts_count=np.empty(0, dtype=COUNT_DTYPE),
+            first_time_stamp=np.empty(0, dtype=TIME_STAMP_DTYPE),
+            last_time_stamp=np.empty(0, dtype=TIME_STAMP_DTYPE)
+        )
+        return AggregatedContacts(
+            person_x=run.pair_keys // self.__people_number,
+            person_y=run.pair_keys % self.__people_number,
+            intensity=run.intensity.copy(),
+            contacts_count=run.contacts_count.copy(),
+            first_time_stamp=run.first_time_stamp.copy(),
+            last_time_stamp=run.last_time_stamp.copy()
+        )
+
+    def __append_run(self, run: _PairsRun) -> None:
+        self.__runs.append(run)
+        while len(self.__runs) > 1 and \
+                self.__runs[-2].pairs_number <= 2 * self.__runs[-1].pairs_number:
+            last_run = self.__runs.pop()
+            self.__runs[-1] = self.__runs[-1].merge(other=last_run)
+
+    def __compact(self) -> None:
+        while len(self.__runs) > 1:
+            last_run = self.__runs.pop()
+            self.__runs[-1] = self.__runs[-1].merge(other=last_run)
@@ -1,55 +1,409 @@
-from typing import List, Dict, Any
+from dataclasses import replace
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional
+
+import numpy as np
 
 from src.utils.fs_utils import dump_json_to_file
+from src.virus_simulation.binary_snapshots import SnapshotArrays, \
+    dump_snapshot_arrays, prepare_aggregated_contacts_arrays, \
+    PEOPLE_ID_DTYPE, SICKNESS_START_DTYPE, INTENSITY_DTYPE, TIME_STAMP_DTYPE, \
+    TRACE_DTYPE, prepare_encoded_traces_arrays, prepare_replay_log_arrays, \
+    prepare_group_contacts_arrays
+from src.virus_simulation.contact_index import ContactsSlice
+from src.virus_simulation.contacts_aggregation import AggregatedContacts
+from src.virus_simulation.crowding import GroupContacts
+from src.virus_simulation.errors import SimulationError
 from src.virus_simulation.primitives import SimulationState, Person, Contact, \
-    Position2D, CompactPosition2D
+    CompactPosition2D, SimulationStateDelta, Map, PeopleTraces, NOT_SICK
+from src.virus_simulation.trace_encoding import EncodedTraces, \
+    encode_people_traces
 import src.virus_simulation.config as simulation_config
 
+SPILLED_CHUNK_CONTACTS = 1 << 16
+
 
 def convert_simulation_state_to_json(simulation_state: SimulationState,
-                                     target_path: str
+                                     target_path: str,
+                                     encode_traces: bool = False
                                      ) -> None:
     map_dimensions = simulation_state.map.max_x, simulation_state.map.max_y
     vertices = prepare_vertices(simulated_people=simulation_state.people)
-    edges = prepare_edges(simulated_meetings=simulation_state.meetings)
-    people_traces = prepare_people_traces(
-        people_traces=simulation_state.people_traces
-    )
+    edges = list(iterate_state_edges(
+        simulated_meetings=simulation_state.meetings,
+        spilled_meetings=simulation_state.spilled_meetings
+    ))
     converted_graph = {
         simulation_config.MAP_DIMENSIONS_KEY: map_dimensions,
         simulation_config.GRAPH_VERTICES_KEY: vertices,
+        simulation_config.GRAPH_EDGES_KEY: edges
+    }
+    if encode_traces:
+        converted_graph[simulation_config.ENCODED_PEOPLE_TRACES_KEY] = \
+            prepare_encoded_people_traces(
+                encoded_traces=encode_people_traces(
+                    traces=simulation_state.people_traces
+                )
+            )
+    else:
+        converted_graph[simulation_config.PEOPLE_TRACES_KEY] = \
+            prepare_people_traces(people_traces=simulation_state.people_traces)
+    if simulation_state.aggregated_contacts is not None:
+        converted_graph[simulation_config.AGGREGATED_EDGES_KEY] = \
+            prepare_aggregated_edges(
+                aggregated_contacts=simulation_state.aggregated_contacts
+            )
+    if simulation_state.group_contacts is not None:
+        converted_graph[simulation_config.GROUP_EDGES_KEY] = \
+            prepare_group_edges(group_contacts=simulation_state.group_contacts)
+    dump_json_to_file(
+        target_path=target_path,
+        content=converted_graph
+    )
+
+
+def convert_simulation_state_to_binary(simulation_state: SimulationState,
+                                       target_path: str,
+                                       encode_traces: bool = False
+                                       ) -> None:
+    if encode_traces:
+        traces_arrays = prepare_encoded_traces_arrays(
+            encoded_traces=encode_people_traces(
+                traces=simulation_state.people_traces
+            )
+        )
+    else:
+        traces_arrays = {
+            "traces":
+                simulation_state.people_traces.astype(TRACE_DTYPE, copy=False)
+        }
+    _dump_simulation_state_arrays(
+        simulation_state=simulation_state,
+        target_path=target_path,
+        traces_arrays=traces_arrays
+    )
+
+
+def convert_simulation_state_to_replay(simulation_state: SimulationState,
+                                       target_path: str,
+                                       encode_traces: bool = False
+                                       ) -> None:
+    """Binary snapshot holding replay log in place of traces (and in place of
+    contacts, if they can be replayed). encode_traces is ignored, as traces
+    are not stored at all.
+    """
+    replay_log = simulation_state.replay_log
+    if replay_log is None:
+        raise SimulationError("Simulation state misses replay log.")
+    if replay_log.contacts:
+        simulation_state = replace(
+            simulation_state, meetings=[], spilled_meetings=None
+        )
+    _dump_simulation_state_arrays(
+        simulation_state=simulation_state,
+        target_path=target_path,
+        traces_arrays=prepare_replay_log_arrays(replay_log=replay_log)
+    )
+
+
+def _dump_simulation_state_arrays(simulation_state: SimulationState,
+                                  target_path: str,
+                                  traces_arrays: Dict[str, np.ndarray]
+                                  ) -> None:
+    people = simulation_state.people
+    meetings = simulation_state.meetings
+    contact_pairs = np.array(
+        [meeting.get_pair_ids() for meeting in meetings],
+        dtype=PEOPLE_ID_DTYPE
+    ).reshape(-1, 2)
+    spilled_meetings = simulation_state.spilled_meetings
+    spilled_contacts_arrays = None
+    if spilled_meetings is not None:
+        spilled_contacts_arrays = {
+            "contact_person_x": spilled_meetings.person_x,
+            "contact_person_y": spilled_meetings.person_y,
+            "contact_intensity": spilled_meetings.intensity,
+            "contact_time_stamp": spilled_meetings.time_stamp
+        }
+    aggregated_contacts_arrays = {}
+    if simulation_state.aggregated_contacts is not None:
+        aggregated_contacts_arrays = prepare_aggregated_contacts_arrays(
+            aggregated_contacts=simulation_state.aggregated_contacts
+        )
+    group_contacts_arrays = {}
+    if simulation_state.group_contacts is not None:
+        group_contacts_arrays = prepare_group_contacts_arrays(
+            group_contacts=simulation_state.group_contacts
+        )
+    snapshot_arrays = SnapshotArrays(
+        map_dimensions=np.array(
+            [simulation_state.map.max_x, simulation_state.map.max_y],
+            dtype=np.int64
+        ),
+        person_id=np.array(
+            [person.person_id for person in people], dtype=PEOPLE_ID_DTYPE
+        ),
+        sick=np.array([person.sick for person in people], dtype=np.bool_),
+        sick_start=np.array(
+            [
+                NOT_SICK if person.sick_start is None else person.sick_start
+                for person in people
+            ],
+            dtype=SICKNESS_START_DTYPE
+        ),
+        contact_person_x=contact_pairs[:, 0].copy(),
+        contact_person_y=contact_pairs[:, 1].copy(),
+        contact_intensity=np.array(
+            [meeting.intensity for meeting in meetings], dtype=INTENSITY_DTYPE
+        ),
+        contact_time_stamp=np.array(
+            [meeting.time_stamp for meeting in meetings], dtype=TIME_STAMP_DTYPE
+        ),
+        **traces_arrays,
+        **aggregated_contacts_arrays,
+        **group_contacts_arrays
+    )
+    dump_snapshot_arrays(
+        snapshot_arrays=snapshot_arrays,
+        target_dir=target_path,
+        leading_arrays=spilled_contacts_arrays
+    )
+
+
+def convert_simulation_state_delta_to_json(
+        simulation_state_delta: SimulationStateDelta,
+        target_path: str
+        ) -> None:
+    segment_steps = \
+        simulation_state_delta.first_time_stamp, \
+        simulation_state_delta.last_time_stamp
+    vertices = prepare_vertices(
+        simulated_people=simulation_state_delta.infected_people
+    )
+    edges = list(iterate_state_edges(
+        simulated_meetings=simulation_state_delta.meetings,
+        spilled_meetings=simulation_state_delta.spilled_meetings
+    ))
+    people_traces = prepare_people_traces(
+        people_traces=simulation_state_delta.people_traces
+    )
+    converted_segment = {
+        simulation_config.SEGMENT_STEPS_KEY: segment_steps,
+        simulation_config.GRAPH_VERTICES_KEY: vertices,
         simulation_config.GRAPH_EDGES_KEY: edges,
         simulation_config.PEOPLE_TRACES_KEY: people_traces
     }
+    if simulation_state_delta.aggregated_contacts is not None:
+        converted_segment[simulation_config.AGGREGATED_EDGES_KEY] = \
+            prepare_aggregated_edges(
+                aggregated_contacts=simulation_state_delta.aggregated_contacts
+            )
     dump_json_to_file(
         target_path=target_path,
-        content=converted_graph
+        content=converted_segment
+    )
+
+
+def dump_snapshot_manifest(simulation_map: Map,
+                           people_number: int,
+                           segments: List[Dict[str, Any]],
+                           target_path: str
+                           ) -> None:
+    manifest = {
+        simulation_config.MAP_DIMENSIONS_KEY: (
+            simulation_map.max_x, simulation_map.max_y
+        ),
+        simulation_config.PEOPLE_NUMBER_KEY: people_number,
+        simulation_config.SNAPSHOT_SEGMENTS_KEY: segments
+    }
+    dump_json_to_file(
+        target_path=target_path,
+        content=manifest
+    )
+
+
+def prepare_snapshot_index_entry(simulation_state: SimulationState,
+                                 step: int,
+                                 snapshot_format: str,
+                                 snapshot_path: str,
+                                 snapshot_bytes: int,
+                                 section_offsets: Optional[Dict[str, int]]
+                                 = None
+                                 ) -> Dict[str, Any]:
+    """Entry of snapshot index - counts known without reading snapshot and
+    byte offsets of its sections (if they can be sought).
+    """
+    contacts_number = len(simulation_state.meetings)
+    if simulation_state.spilled_meetings is not None:
+        contacts_number += simulation_state.spilled_meetings.contacts_number
+    aggregated_contacts_number = 0
+    if simulation_state.aggregated_contacts is not None:
+        aggregated_contacts_number = \
+            simulation_state.aggregated_contacts.pairs_number
+    group_contacts_number = 0
+    if simulation_state.group_contacts is not None:
+        group_contacts_number = simulation_state.group_contacts.groups_number
+    return {
+        simulation_config.SNAPSHOT_STEP_KEY: step,
+        simulation_config.SNAPSHOT_FORMAT_KEY: snapshot_format,
+        simulation_config.SNAPSHOT_PATH_KEY: snapshot_path,
+        simulation_config.SNAPSHOT_BYTES_KEY: snapshot_bytes,
+        simulation_config.SICK_NUMBER_KEY:
+            sum(person.sick for person in simulation_state.people),
+        simulation_config.CONTACTS_NUMBER_KEY: contacts_number,
+        simulation_config.AGGREGATED_CONTACTS_NUMBER_KEY:
+            aggregated_contacts_number,
+        simulation_config.GROUP_CONTACTS_NUMBER_KEY: group_contacts_number,
+        simulation_config.SECTION_OFFSETS_KEY: section_offsets
+    }
+
+
+def dump_snapshot_index(simulation_name: str,
+                        simulation_map: Map,
+                        people_number: int,
+                        snapshots: List[Dict[str, Any]],
+                        target_path: str
+                        ) -> None:
+    """Manifest of full snapshots of simulation, with paths relative to
+    directory of index.
+    """
+    index = {
+        simulation_config.SIMULATION_NAME_KEY: simulation_name,
+        simulation_config.MAP_DIMENSIONS_KEY: (
+            simulation_map.max_x, simulation_map.max_y
+        ),
+        simulation_config.PEOPLE_NUMBER_KEY: people_number,
+        simulation_config.INDEXED_SNAPSHOTS_KEY: snapshots
+    }
+    dump_json_to_file(
+        target_path=target_path,
+        content=index
     )
 
 
 def prepare_vertices(simulated_people: List[Person]) -> List[Dict[str, Any]]:
-    return [
-        {
+    return list(iterate_vertices(simulated_people=simulated_people))
+
+
+def iterate_vertices(simulated_people: Iterable[Person]
+                     ) -> Iterator[Dict[str, Any]]:
+    for person in simulated_people:
+        yield {
             simulation_config.PERSON_ID_KEY: person.person_id,
             simulation_config.SICKNESS_STATUS_KEY: person.sick,
             simulation_config.SICKNESS_START_KEY: person.sick_start
-        } for person in simulated_people
-    ]
+        }
 
 
 def prepare_edges(simulated_meetings: List[Contact]) -> List[Dict[str, Any]]:
-    return [
-        {
+    return list(iterate_edges(simulated_meetings=simulated_meetings))
+
+
+def iterate_edges(simulated_meetings: Iterable[Contact]
+                  ) -> Iterator[Dict[str, Any]]:
+    for meeting in simulated_meetings:
+        yield {
             simulation_config.CONTACT_PAIR_KEY: meeting.get_pair_ids(),
             simulation_config.CONTACT_DURATION_KEY: meeting.intensity,
             simulation_config.CONTACT_TIME_STAMP_KEY: meeting.time_stamp
-        } for meeting in simulated_meetings
+        }
+
+
+def iterate_spilled_edges(spilled_meetings: ContactsSlice
+                          ) -> Iterator[Dict[str, Any]]:
+    for first in range(
+            0, spilled_meetings.contacts_number, SPILLED_CHUNK_CONTACTS):
+        last = first + SPILLED_CHUNK_CONTACTS
+        for person_x, person_y, intensity, time_stamp in zip(
+                spilled_meetings.person_x[first:last].tolist(),
+                spilled_meetings.person_y[first:last].tolist(),
+                spilled_meetings.intensity[first:last].tolist(),
+                spilled_meetings.time_stamp[first:last].tolist()):
+            yield {
+                simulation_config.CONTACT_PAIR_KEY: (person_x, person_y),
+                simulation_config.CONTACT_DURATION_KEY: intensity,
+                simulation_config.CONTACT_TIME_STAMP_KEY: time_stamp
+            }
+
+
+def iterate_state_edges(simulated_meetings: Iterable[Contact],
+                        spilled_meetings: Optional[ContactsSlice]
+                        ) -> Iterator[Dict[str, Any]]:
+    """Edges of spilled contacts followed by the ones kept in memory."""
+    if spilled_meetings is not None:
+        yield from iterate_spilled_edges(spilled_meetings=spilled_meetings)
+    yield from iterate_edges(simulated_meetings=simulated_meetings)
+
+
+def prepare_aggregated_edges(aggregated_contacts: AggregatedContacts
+                             ) -> List[Dict[str, Any]]:
+    return [
+        {
+            simulation_config.CONTACT_PAIR_KEY: (person_x, person_y),
+            simulation_config.CONTACT_DURATION_KEY: intensity,
+            simulation_config.CONTACTS_COUNT_KEY: contacts_count,
+            simulation_config.FIRST_CONTACT_TIME_STAMP_KEY: first_time_stamp,
+            simulation_config.LAST_CONTACT_TIME_STAMP_KEY: last_time_stamp
+        } for person_x, person_y, intensity, contacts_count, first_time_stamp,
+        last_time_stamp in zip(
+            aggregated_contacts.person_x.tolist(),
+            aggregated_contacts.person_y.tolist(),
+            aggregated_contacts.intensity.tolist(),
+            aggregated_contacts.contacts_count.tolist(),
+            aggregated_contacts.first_time_stamp.tolist(),
+            aggregated_contacts.last_time_stamp.tolist()
+        )
     ]
 
 
-def prepare_people_traces(people_traces: Dict[Person, List[Position2D]]
+def prepare_group_edges(group_contacts: GroupContacts
+                        ) -> List[Dict[str, Any]]:
+    return list(iterate_group_edges(group_contacts=group_contacts))
+
+
+def iterate_group_edges(group_contacts: GroupContacts
+                        ) -> Iterator[Dict[str, Any]]:
+    """Single record per group contact in place of all pairs of its
+    members.
+    """
+    members = group_contacts.members.tolist()
+    offset = 0
+    for time_stamp, size in zip(
+            group_contacts.time_stamp.tolist(), group_contacts.sizes.tolist()):
+        yield {
+            simulation_config.CONTACT_TIME_STAMP_KEY: time_stamp,
+            simulation_config.GROUP_MEMBERS_KEY:
+                tuple(members[offset:offset + size])
+        }
+        offset += size
+
+
+def prepare_people_traces(people_traces: PeopleTraces
                           ) -> Dict[int, List[CompactPosition2D]]:
     return {
-        person.person_id: [position.tu_tuple() for position in person_trace]
-        for person, person_trace in people_traces.items()
+        person_id: person_trace for person_id, person_trace
+        in enumerate(people_traces.transpose(1, 0, 2).tolist())
+    }
+
+
+def iterate_people_traces(people_traces: PeopleTraces
+                          ) -> Iterator[Tuple[int, List[CompactPosition2D]]]:
+    for person_id in range(people_traces.shape[1]):
+        yield person_id, people_traces[:, person_id].tolist()
+
+
+def prepare_encoded_people_traces(encoded_traces: EncodedTraces
+                                  ) -> Dict[str, Any]:
+    """Columns are flattened, as pairs nested in JSON take more space than
+    encoded values themselves.
+    """
+    return {
+        simulation_config.TRACE_STEPS_KEY: encoded_traces.steps_number,
+        simulation_config.TRACE_START_KEY:
+            encoded_traces.start.reshape(-1).tolist(),
+        simulation_config.TRACE_RUN_OFFSETS_KEY:
+            encoded_traces.run_offsets.tolist(),
+        simulation_config.TRACE_RUN_DELTAS_KEY:
+            encoded_traces.run_deltas.reshape(-1).tolist(),
+        simulation_config.TRACE_RUN_LENGTHS_KEY:
+            encoded_traces.run_lengths.tolist()
     }
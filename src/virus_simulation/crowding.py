@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from src.utils.grouping import Grouping, select_groups, \
+    generate_pairs_within_groups
+from src.virus_simulation.contact_index import ContactsSlice
+from src.virus_simulation.transmission import MEAN_CONTACT_INTENSITY
+
+EXACT_CROWDING = "exact"
+SAMPLED_CROWDING = "sampled"
+GROUP_CROWDING = "group"
+CROWDING_MODES = [EXACT_CROWDING, SAMPLED_CROWDING, GROUP_CROWDING]
+DEFAULT_MAX_PARTNERS = 16
+
+
+@dataclass(frozen=True)
+class CrowdingPolicy:
+    """Handling of hot cells - cells where people would meet more than
+    max_partners others. Exact mode records all pairs anyway, sampled mode
+    caps partners of each person at max_partners and group mode records
+    single group contact per hot cell.
+    """
+    mode: str = EXACT_CROWDING
+    max_partners: int = DEFAULT_MAX_PARTNERS
+
+    def get_hot_cells(self, occupancy: Grouping) -> np.ndarray:
+        return occupancy.group_sizes > self.max_partners + 1
+
+
+EXACT_CROWDING_POLICY = CrowdingPolicy()
+
+
+@dataclass(frozen=True)
+class GroupContacts:
+    """Members of i-th group (all meeting each other at time_stamp[i]) are
+    members[offsets[i]:offsets[i] + sizes[i]].
+    """
+    time_stamp: np.ndarray
+    sizes: np.ndarray
+    members: np.ndarray
+
+    @classmethod
+    def from_grouping(cls, grouping: Grouping, time_stamp: int) -> GroupContacts:
+        return cls(
+            time_stamp=np.full(grouping.groups_number, time_stamp, dtype=np.int64),
+            sizes=grouping.group_sizes.astype(np.int64),
+            members=grouping.order.astype(np.int64)
+        )
+
+    @classmethod
+    def concatenate(cls, group_contacts: List[GroupContacts]) -> GroupContacts:
+        return cls(
+            time_stamp=np.concatenate(
+                [np.empty(0, dtype=np.int64)] +
+                [g.time_stamp for g in group_contacts]
+            ).astype(np.int64),
+            sizes=np.concatenate(
+                [np.empty(0, dtype=np.int64)] + [g.sizes for g in group_contacts]
+            ).astype(np.int64),
+            members=np.concatenate(
+                [np.empty(0, dtype=np.int64)] +
+                [g.members for g in group_contacts]
+            ).astype(np.int64)
+        )
+
+    @property
+    def groups_number(self) -> int:
+        return self.sizes.shape[0]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return np.cumsum(self.sizes) - self.sizes
+
+    @property
+    def pairs_number(self) -> int:
+        sizes = self.sizes.astype(np.int64)
+        return int((sizes * (sizes - 1) // 2).sum())
+
+    def since(self, time_stamp: int) -> GroupContacts:
+        """Group contacts of steps not earlier than given one."""
+        first_group = int(np.searchsorted(self.time_stamp, time_stamp))
+        first_member = int(self.sizes[:first_group].sum())
+        return GroupContacts(
+            time_stamp=self.time_stamp[first_group:],
+            sizes=self.sizes[first_group:],
+            members=self.members[first_member:]
+        )
+
+    def get_pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(person_x, person_y, time_stamp) of all pairs meeting in groups."""
+        person_x, person_y = generate_pairs_within_groups(
+            grouping=Grouping(
+                order=self.members,
+                group_starts=self.offsets,
+                group_sizes=self.sizes
+            )
+        )
+        sizes = self.sizes.astype(np.int64)
+        return person_x, person_y, np.repeat(
+            self.time_stamp, sizes * (sizes - 1) // 2
+        )
+
+
+def merge_group_contacts(contacts: ContactsSlice,
+                         group_contacts: GroupContacts
+                         ) -> ContactsSlice:
+    """Contacts together with pairs of people meeting in groups (with mean
+    contact intensity, as assumed by transmission), in time order.
+    """
+    if group_contacts.groups_number == 0:
+        return contacts
+    group_x, group_y, group_time_stamp = group_contacts.get_pairs()
+    group_intensity = np.full(group_x.shape[0], MEAN_CONTACT_INTENSITY)
+    time_stamp = _concatenate(array=contacts.time_stamp, other=group_time_stamp)
+    order = np.argsort(time_stamp, kind="stable")
+    return ContactsSlice(
+        person_x=_concatenate(array=contacts.person_x, other=group_x)[order],
+        person_y=_concatenate(array=contacts.person_y, other=group_y)[order],
+        intensity=_concatenate(
+            array=contacts.intensity, other=group_intensity
+        )[order],
+        time_stamp=time_stamp[order]
+    )
+
+
+@dataclass(frozen=True)
+class CellContacts:
+    """Contacts of a single step - pairs of people and cells recorded as
+    group contacts.
+    """
+    person_x: np.ndarray
+    person_y: np.ndarray
+    group_cells: Grouping
+
+
+def generate_cell_contacts(occupancy: Grouping,
+                           crowding_policy: CrowdingPolicy,
+                           random_generator: np.random.Generator
+                           ) -> CellContacts:
+    if crowding_policy.mode == EXACT_CROWDING:
+        person_x, person_y = generate_pairs_within_groups(grouping=occupancy)
+        return CellContacts(
+            person_x=person_x,
+            person_y=person_y,
+            group_cells=_select_no_groups(grouping=occupancy)
+        )
+    hot_cells = crowding_policy.get_hot_cells(occupancy=occupancy)
+    hot_grouping = select_groups(grouping=occupancy, selected=hot_cells)
+    person_x, person_y = generate_pairs_within_groups(
+        grouping=select_groups(grouping=occupancy, selected=~hot_cells)
+    )
+    if crowding_policy.mode == GROUP_CROWDING:
+        return CellContacts(
+            person_x=person_x,
+            person_y=person_y,
+            group_cells=hot_grouping
+        )
+    sampled_x, sampled_y = sample_partners_within_groups(
+        grouping=hot_grouping,
+        max_partners=crowding_policy.max_partners,
+        random_generator=random_generator
+    )
+    return CellContacts(
+        person_x=np.concatenate((person_x, sampled_x)),
+        person_y=np.concatenate((person_y, sampled_y)),
+        group_cells=_select_no_groups(grouping=occupancy)
+    )
+
+
+def sample_partners_within_groups(grouping: Grouping,
+                                  max_partners: int,
+                                  random_generator: np.random.Generator
+                                  ) -> Tuple[np.ndarray, np.ndarray]:
+    """Places members of each group in random order on a circle and pairs
+    each one with max_partners // 2 following ones and (for odd
+    max_partners) with the opposite one, so that everybody meets
+    max_partners (one less in odd groups) partners drawn uniformly from the
+    group. Groups must be larger than max_partners + 1.
+    """
+    sizes = grouping.group_sizes.astype(np.int64)
+    members_number = grouping.order.shape[0]
+    shuffled = grouping.order[np.lexsort((
+        random_generator.random(members_number),
+        np.repeat(np.arange(sizes.shape[0]), sizes)
+    ))]
+    starts = np.repeat(grouping.group_starts, sizes)
+    size = np.repeat(sizes, sizes)
+    rank = np.arange(members_number) - starts
+    person_x = [shuffled] * (max_partners // 2)
+    person_y = [
+        shuffled[starts + (rank + offset) % size]
+        for offset in range(1, max_partners // 2 + 1)
+    ]
+    if max_partners % 2 == 1:
+        half = size // 2
+        opposite = rank < half
+        person_x.append(shuffled[opposite])
+        person_y.append(shuffled[(starts + rank + size - half)[opposite]])
+    return np.concatenate([np.empty(0, dtype=np.int64)] + person_x), \
+        np.concatenate([np.empty(0, dtype=np.int64)] + person_y)
+
+
+def _select_no_groups(grouping: Grouping) -> Grouping:
+    return select_groups(
+        grouping=grouping,
+        selected=np.zeros(grouping.groups_number, dtype=np.bool_)
+    )
+
+
+def _concatenate(array: np.ndarray, other: np.ndarray) -> np.ndarray:
+    return np.concatenate((array, other.astype(array.dtype)))
@@ -1,22 +1,36 @@
-import itertools
 import logging
 import random
-from copy import deepcopy
-from typing import List, Dict
+from typing import List, Optional, Iterator, Tuple
 
-from src.utils.iterables import create_dictionary_of_lists, flatten
+import numpy as np
+
+from src.utils.grouping import Grouping, group_by_keys, linearize_positions
+from src.utils.iterables import flatten, iterate_buffered
+from src.virus_simulation.checkpointing import EngineCheckpoint, \
+    EngineParameters, RestoredHistory, load_checkpoints_chain, \
+    restore_history, check_engine_parameters, dump_random_generator_state, \
+    restore_random_generator, RANDOM_STATE_KEY, ARRAY_RANDOM_STATE_KEY
+from src.virus_simulation.contact_index import ContactsSlice
+from src.virus_simulation.contacts_aggregation import ContactsAggregator
+from src.virus_simulation.crowding import CrowdingPolicy, GroupContacts, \
+    EXACT_CROWDING_POLICY, GROUP_CROWDING, generate_cell_contacts
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.history_spilling import MemoryBudget, \
+    CONTACT_OBJECT_BYTES
+from src.virus_simulation.metrics import MetricsRecorder, \
+    DISABLED_METRICS_RECORDER, MOVEMENT_PHASE, OCCUPANCY_PHASE, MEETINGS_PHASE, \
+    HEALTH_UPDATE_PHASE, CONTACTS_GENERATED_METRIC, NEW_INFECTIONS_METRIC, \
+    GROUP_CONTACTS_METRIC, record_occupancy_metrics
+from src.virus_simulation.trace_store import TraceStore
+from src.virus_simulation.transmission import calculate_infection_risk
 from src.virus_simulation.primitives import Map, Person, Position2D, Contact, \
-    SimulationState
+    SimulationState, SimulationStateDelta, SimulationStep, NOT_SICK
 import src.config as global_config
 
 
 logging.getLogger().setLevel(global_config.LOGGING_LEVEL)
 
 
-PeopleGroup = List[Person]
-OccupancyMap = Dict[Position2D, PeopleGroup]
-
-
 class SimulationEngine:
 
     @classmethod
@@ -25,55 +39,548 @@ class SimulationEngine:
                    max_person_step_size: int,
                    people_number: int,
                    initial_seek_people: int,
-                   transmission_probability: float):
+                   transmission_probability: float,
+                   transmission_only: bool = False,
+                   aggregate_contacts: bool = False,
+                   random_seed: Optional[int] = None,
+                   metrics_recorder: Optional[MetricsRecorder] = None,
+                   trace_steps_capacity: Optional[int] = None,
+                   traces_path: Optional[str] = None,
+                   memory_budget: Optional[MemoryBudget] = None,
+                   crowding_policy: Optional[CrowdingPolicy] = None):
         simulation_map = Map(
             max_x=map_size,
             max_y=map_size
         )
+        random_generator = random.Random(random_seed)
         people = PeopleInitializer.initialize_people(
             simulation_map=simulation_map,
             people_number=people_number,
-            initial_seek_people=initial_seek_people
+            initial_seek_people=initial_seek_people,
+            random_generator=random_generator
         )
         return cls(
             simulation_map=simulation_map,
             people=people,
             transmission_probability=transmission_probability,
-            max_person_step_size=max_person_step_size
+            max_person_step_size=max_person_step_size,
+            transmission_only=transmission_only,
+            aggregate_contacts=aggregate_contacts,
+            random_generator=random_generator,
+            array_random_generator=np.random.default_rng(random_seed),
+            metrics_recorder=metrics_recorder,
+            trace_store=TraceStore.initialize(
+                people_number=people_number,
+                max_coordinate=map_size,
+                steps_capacity=trace_steps_capacity,
+                backing_path=traces_path
+            ),
+            memory_budget=memory_budget,
+            crowding_policy=crowding_policy
+        )
+
+    @classmethod
+    def restore(cls,
+                checkpoint_path: str,
+                metrics_recorder: Optional[MetricsRecorder] = None,
+                trace_steps_capacity: Optional[int] = None,
+                traces_path: Optional[str] = None,
+                memory_budget: Optional[MemoryBudget] = None):
+        checkpoints = load_checkpoints_chain(checkpoint_path=checkpoint_path)
+        checkpoint = checkpoints[-1]
+        parameters = checkpoint.engine_parameters
+        check_engine_parameters(
+            engine_parameters=parameters,
+            engine=cls.__name__
+        )
+        history = restore_history(checkpoints=checkpoints)
+        simulation_map = Map(max_x=parameters.max_x, max_y=parameters.max_y)
+        people = [
+            Person(
+                person_id=person_id,
+                sick=sick,
+                position=Position2D(x=x, y=y),
+                sick_start=None if sick_start == NOT_SICK else sick_start
+            ) for person_id, ((x, y), sick, sick_start) in enumerate(zip(
+                checkpoint.positions.tolist(),
+                checkpoint.sick.tolist(),
+                checkpoint.sick_start.tolist()
+            ))
+        ]
+        version, internal_state, gauss_next = \
+            checkpoint.random_state[RANDOM_STATE_KEY]
+        random_generator = random.Random()
+        random_generator.setstate((version, tuple(internal_state), gauss_next))
+        trace_store = TraceStore.initialize(
+            people_number=len(people),
+            max_coordinate=max(parameters.max_x, parameters.max_y),
+            steps_capacity=trace_steps_capacity,
+            backing_path=traces_path
+        )
+        trace_store.extend(traces=history.traces)
+        simulation_engine = cls(
+            simulation_map=simulation_map,
+            people=people,
+            transmission_probability=parameters.transmission_probability,
+            max_person_step_size=parameters.max_person_step_size,
+            transmission_only=parameters.transmission_only,
+            aggregate_contacts=parameters.aggregate_contacts,
+            random_generator=random_generator,
+            array_random_generator=restore_random_generator(
+                state=checkpoint.random_state[ARRAY_RANDOM_STATE_KEY]
+            ),
+            metrics_recorder=metrics_recorder,
+            trace_store=trace_store,
+            memory_budget=memory_budget,
+            crowding_policy=CrowdingPolicy(
+                mode=parameters.crowding_mode,
+                max_partners=parameters.max_partners
+            )
         )
+        simulation_engine.__restore_history(
+            checkpoint=checkpoint,
+            history=history
+        )
+        return simulation_engine
 
     def __init__(self,
                  simulation_map: Map,
                  people: List[Person],
                  transmission_probability: float,
-                 max_person_step_size: int
+                 max_person_step_size: int,
+                 transmission_only: bool = False,
+                 aggregate_contacts: bool = False,
+                 random_generator: Optional[random.Random] = None,
+                 array_random_generator: Optional[np.random.Generator] = None,
+                 metrics_recorder: Optional[MetricsRecorder] = None,
+                 trace_store: Optional[TraceStore] = None,
+                 memory_budget: Optional[MemoryBudget] = None,
+                 crowding_policy: Optional[CrowdingPolicy] = None
                  ):
         self.__simulation_map = simulation_map
         self.__people = people
+        # kept up to date on infections instead of counting sick people
+        self.__sick_people_number = sum(person.sick for person in people)
         self.__transmission_probability = transmission_probability
         self.__max_person_step_size = max_person_step_size
+        self.__transmission_only = transmission_only
+        self.__contacts_aggregator = ContactsAggregator(
+            people_number=len(people)
+        ) if aggregate_contacts else None
+        if random_generator is None:
+            random_generator = random.Random()
+        if array_random_generator is None:
+            array_random_generator = np.random.default_rng()
+        self.__random_generator = random_generator
+        self.__array_random_generator = array_random_generator
+        self.__metrics_recorder = metrics_recorder or DISABLED_METRICS_RECORDER
+        self.__crowding_policy = crowding_policy or EXACT_CROWDING_POLICY
         self.__time_stamp: int = -1
+        self.__initially_sick = np.array(
+            [person.sick for person in people], dtype=np.bool_
+        )
         self.__meetings: List[Contact] = []
-        self.__people_traces = {p: [] for p in people}
+        # offsets count spilled meetings as well, only the following ones
+        # are kept in meetings list
+        self.__meetings_offsets: List[int] = []
+        self.__spilled_meetings_number = 0
+        self.__memory_budget = memory_budget
+        # group contacts of hot cells (never spilled, as they are compact)
+        self.__group_contacts: List[GroupContacts] = []
+        self.__history_dropped = False
+        self.__last_step_contacts = (
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float64)
+        )
+        self.__last_step_infected = np.empty(0, dtype=np.int64)
+        if trace_store is None:
+            trace_store = TraceStore.initialize(
+                people_number=len(people),
+                max_coordinate=max(simulation_map.max_x, simulation_map.max_y)
+            )
+        self.__trace_store = trace_store
+
+    @property
+    def time_stamp(self) -> int:
+        return self.__time_stamp
+
+    @property
+    def sick_people_number(self) -> int:
+        return self.__sick_people_number
 
     def take_simulation_step(self) -> None:
         self.__time_stamp += 1
-        self.__update_people_positions()
-        occupancy_map = self.__calculate_occupancy_map()
-        current_step_meetings = self.__generate_meetings_in_current_step(
-            occupancy_map=occupancy_map
+        if not self.__history_dropped:
+            self.__meetings_offsets.append(self.__meetings_number)
+        self.__last_step_contacts = (
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float64)
+        )
+        metrics_recorder = self.__metrics_recorder
+        metrics_recorder.start_step(time_stamp=self.__time_stamp)
+        with metrics_recorder.measure(phase=MOVEMENT_PHASE):
+            self.__update_people_positions()
+        with metrics_recorder.measure(phase=OCCUPANCY_PHASE):
+            occupancy_map = self.__calculate_occupancy_map()
+        if metrics_recorder.enabled:
+            record_occupancy_metrics(
+                metrics_recorder=metrics_recorder,
+                occupancy=occupancy_map,
+                crowding_policy=self.__crowding_policy
+            )
+        if self.__transmission_only:
+            with metrics_recorder.measure(phase=HEALTH_UPDATE_PHASE):
+                self.__update_people_health_status_per_cell(
+                    occupancy_map=occupancy_map
+                )
+            if self.__memory_budget is not None:
+                self.__enforce_memory_budget()
+            return
+        with metrics_recorder.measure(phase=MEETINGS_PHASE):
+            current_step_meetings, group_cells = \
+                self.__generate_meetings_in_current_step(
+                    occupancy_map=occupancy_map
+                )
+        metrics_recorder.record(
+            metric=CONTACTS_GENERATED_METRIC,
+            value=len(current_step_meetings)
         )
-        self.__update_people_health_status(
-            current_step_meetings=current_step_meetings
+        metrics_recorder.record(
+            metric=GROUP_CONTACTS_METRIC,
+            value=group_cells.groups_number
         )
-        self.__meetings.extend(current_step_meetings)
+        with metrics_recorder.measure(phase=HEALTH_UPDATE_PHASE):
+            self.__update_people_health_status(
+                current_step_meetings=current_step_meetings,
+                group_cells=group_cells
+            )
+        if group_cells.groups_number > 0 and not self.__history_dropped:
+            self.__group_contacts.append(GroupContacts.from_grouping(
+                grouping=group_cells,
+                time_stamp=self.__time_stamp
+            ))
+        if self.__contacts_aggregator is not None:
+            with metrics_recorder.measure(phase=MEETINGS_PHASE):
+                self.__aggregate_meetings()
+        elif not self.__history_dropped:
+            self.__meetings.extend(current_step_meetings)
+        if self.__memory_budget is not None:
+            self.__enforce_memory_budget()
+
+    def iter_steps(self,
+                   steps: int,
+                   drop_history: bool = False,
+                   buffer_steps: int = 0
+                   ) -> Iterator[SimulationStep]:
+        """Takes given number of steps yielding delta of each one. With
+        buffer_steps > 0 steps are taken by background thread up to
+        buffer_steps ahead of consumer, so engine must not be used otherwise
+        until iteration ends. With drop_history history is dropped when
+        iteration starts (not when iter_steps() is called) and cannot be
+        restored afterwards, see drop_history().
+        """
+        return iterate_buffered(
+            items=self.__generate_steps(
+                steps=steps,
+                drop_history=drop_history
+            ),
+            buffer_size=buffer_steps
+        )
+
+    def drop_history(self) -> None:
+        """Stops keeping contacts and traces of past steps, so that memory
+        does not grow with length of simulation (contacts are still
+        aggregated if requested). It cannot be undone - snapshots and
+        checkpoints cannot be taken afterwards.
+        """
+        self.__history_dropped = True
+        self.__meetings = []
+        self.__meetings_offsets = []
+        self.__group_contacts = []
+        self.__trace_store.drop_steps_before(time_stamp=self.__time_stamp)
 
     def get_simulation_state(self) -> SimulationState:
+        self.__check_history()
+        aggregated_contacts = None
+        if self.__contacts_aggregator is not None:
+            aggregated_contacts = \
+                self.__contacts_aggregator.get_aggregated_contacts()
+        # people and contacts are immutable, so shallow copies of lists are
+        # not affected by following steps
         return SimulationState(
-            map=deepcopy(self.__simulation_map),
-            people=deepcopy(self.__people),
-            meetings=deepcopy(self.__meetings),
-            people_traces=deepcopy(self.__people_traces)
+            map=self.__simulation_map,
+            people=list(self.__people),
+            meetings=list(self.__meetings),
+            people_traces=self.__trace_store.get_traces(),
+            aggregated_contacts=aggregated_contacts,
+            spilled_meetings=self.__get_spilled_meetings(first_time_stamp=0),
+            group_contacts=self.__get_group_contacts(first_time_stamp=0)
+        )
+
+    def get_simulation_state_delta(self,
+                                   since_time_stamp: int
+                                   ) -> SimulationStateDelta:
+        self.__check_history()
+        first_meeting = self.__get_first_meeting(time_stamp=since_time_stamp)
+        aggregated_contacts = None
+        if self.__contacts_aggregator is not None:
+            aggregated_contacts = self.__contacts_aggregator \
+                .get_aggregated_contacts() \
+                .updated_since(time_stamp=since_time_stamp)
+        return SimulationStateDelta(
+            map=self.__simulation_map,
+            people_number=len(self.__people),
+            first_time_stamp=since_time_stamp,
+            last_time_stamp=self.__time_stamp,
+            infected_people=[
+                person for person in self.__people
+                if person.sick and person.sick_start >= since_time_stamp
+            ],
+            meetings=self.__meetings[first_meeting:],
+            people_traces=self.__trace_store.get_traces(
+                first_time_stamp=since_time_stamp
+            ),
+            spilled_meetings=self.__get_spilled_meetings(
+                first_time_stamp=since_time_stamp
+            ),
+            aggregated_contacts=aggregated_contacts
+        )
+
+    def get_checkpoint(self, since_time_stamp: int) -> EngineCheckpoint:
+        self.__check_history()
+        meetings = self.__meetings[
+            self.__get_first_meeting(time_stamp=since_time_stamp):
+        ]
+        meetings_x, meetings_y, meetings_intensity, meetings_time_stamp = \
+            self.__convert_meetings_to_arrays(meetings=meetings)
+        spilled_meetings = self.__get_spilled_meetings(
+            first_time_stamp=since_time_stamp
+        )
+        if spilled_meetings is not None:
+            meetings_x = np.concatenate(
+                (spilled_meetings.person_x, meetings_x)
+            ).astype(np.int64)
+            meetings_y = np.concatenate(
+                (spilled_meetings.person_y, meetings_y)
+            ).astype(np.int64)
+            meetings_intensity = np.concatenate(
+                (spilled_meetings.intensity, meetings_intensity)
+            ).astype(np.float64)
+            meetings_time_stamp = np.concatenate(
+                (spilled_meetings.time_stamp, meetings_time_stamp)
+            ).astype(np.int64)
+        version, internal_state, gauss_next = self.__random_generator.getstate()
+        aggregated_contacts = None
+        if self.__contacts_aggregator is not None:
+            aggregated_contacts = \
+                self.__contacts_aggregator.get_aggregated_contacts()
+        return EngineCheckpoint(
+            engine_parameters=EngineParameters(
+                engine=type(self).__name__,
+                max_x=self.__simulation_map.max_x,
+                max_y=self.__simulation_map.max_y,
+                transmission_probability=self.__transmission_probability,
+                max_person_step_size=self.__max_person_step_size,
+                transmission_only=self.__transmission_only,
+                aggregate_contacts=self.__contacts_aggregator is not None,
+                crowding_mode=self.__crowding_policy.mode,
+                max_partners=self.__crowding_policy.max_partners
+            ),
+            random_state={
+                RANDOM_STATE_KEY: [version, list(internal_state), gauss_next],
+                ARRAY_RANDOM_STATE_KEY: dump_random_generator_state(
+                    random_generator=self.__array_random_generator
+                )
+            },
+            time_stamp=self.__time_stamp,
+            positions=self.__get_positions(),
+            sick=np.array(
+                [person.sick for person in self.__people], dtype=np.bool_
+            ),
+            sick_start=np.array(
+                [
+                    NOT_SICK if person.sick_start is None else person.sick_start
+                    for person in self.__people
+                ],
+                dtype=np.int64
+            ),
+            initially_sick=self.__initially_sick,
+            first_time_stamp=since_time_stamp,
+            meetings_x=meetings_x,
+            meetings_y=meetings_y,
+            meetings_intensity=meetings_intensity,
+            meetings_time_stamp=meetings_time_stamp,
+            traces=np.array(
+                self.__trace_store.get_traces(first_time_stamp=since_time_stamp)
+            ),
+            aggregated_contacts=aggregated_contacts,
+            group_contacts=self.__get_group_contacts(
+                first_time_stamp=since_time_stamp
+            )
+        )
+
+    def __generate_steps(self,
+                         steps: int,
+                         drop_history: bool
+                         ) -> Iterator[SimulationStep]:
+        if drop_history:
+            self.drop_history()
+        positions = self.__get_positions()
+        for _ in range(steps):
+            previous_positions = positions
+            self.take_simulation_step()
+            positions = self.__get_positions()
+            people_x, people_y, intensity = self.__last_step_contacts
+            yield SimulationStep(
+                time_stamp=self.__time_stamp,
+                positions=positions,
+                moves=positions - previous_positions,
+                contacts_person_x=people_x,
+                contacts_person_y=people_y,
+                contacts_intensity=intensity,
+                infected_people=self.__last_step_infected
+            )
+
+    @property
+    def __meetings_number(self) -> int:
+        return self.__spilled_meetings_number + len(self.__meetings)
+
+    def __get_meetings_offset(self, time_stamp: int) -> int:
+        """Number of meetings (spilled ones included) before given step."""
+        if time_stamp < len(self.__meetings_offsets):
+            return self.__meetings_offsets[time_stamp]
+        return self.__meetings_number
+
+    def __get_first_meeting(self, time_stamp: int) -> int:
+        """Index (in meetings list) of first meeting since given step."""
+        return max(
+            self.__get_meetings_offset(time_stamp=time_stamp) -
+            self.__spilled_meetings_number,
+            0
+        )
+
+    def __get_spilled_meetings(self,
+                               first_time_stamp: int
+                               ) -> Optional[ContactsSlice]:
+        meetings_offset = self.__get_meetings_offset(
+            time_stamp=first_time_stamp
+        )
+        if meetings_offset >= self.__spilled_meetings_number:
+            return None
+        return self.__memory_budget.contacts_spill.get_contacts(
+            first_time_stamp=first_time_stamp
+        )
+
+    def __get_group_contacts(self,
+                             first_time_stamp: int
+                             ) -> Optional[GroupContacts]:
+        if self.__crowding_policy.mode != GROUP_CROWDING:
+            return None
+        return GroupContacts.concatenate(
+            group_contacts=self.__group_contacts
+        ).since(time_stamp=first_time_stamp)
+
+    def __enforce_memory_budget(self) -> None:
+        spill_meetings = self.__memory_budget.enforce(
+            trace_store=self.__trace_store,
+            contacts_bytes=len(self.__meetings) * CONTACT_OBJECT_BYTES
+        )
+        if not spill_meetings:
+            return
+        meetings_x, meetings_y, meetings_intensity, meetings_time_stamp = \
+            self.__convert_meetings_to_arrays(meetings=self.__meetings)
+        self.__memory_budget.contacts_spill.append(
+            person_x=meetings_x,
+            person_y=meetings_y,
+            intensity=meetings_intensity,
+            time_stamp=meetings_time_stamp
+        )
+        self.__spilled_meetings_number += len(self.__meetings)
+        self.__meetings = []
+
+    @staticmethod
+    def __convert_meetings_to_arrays(meetings: List[Contact]
+                                     ) -> Tuple[np.ndarray, ...]:
+        pairs = np.array(
+            [meeting.get_pair_ids() for meeting in meetings], dtype=np.int64
+        ).reshape(-1, 2)
+        return (
+            pairs[:, 0],
+            pairs[:, 1],
+            np.array(
+                [meeting.intensity for meeting in meetings], dtype=np.float64
+            ),
+            np.array(
+                [meeting.time_stamp for meeting in meetings], dtype=np.int64
+            )
+        )
+
+    def __check_history(self) -> None:
+        if self.__history_dropped:
+            raise SimulationError("History of simulation was dropped.")
+
+    def __get_positions(self) -> np.ndarray:
+        return np.array(
+            [person.position.tu_tuple() for person in self.__people],
+            dtype=np.int64
+        ).reshape(-1, 2)
+
+    def __restore_history(self,
+                          checkpoint: EngineCheckpoint,
+                          history: RestoredHistory
+                          ) -> None:
+        self.__time_stamp = checkpoint.time_stamp
+        self.__initially_sick = checkpoint.initially_sick
+        self.__meetings_offsets = np.searchsorted(
+            history.meetings_time_stamp, np.arange(self.__time_stamp + 1)
+        ).tolist()
+        sick_start = checkpoint.sick_start.tolist()
+        self.__meetings = [
+            Contact(
+                person_x=self.__restore_person_at(
+                    person_id=person_x,
+                    time_stamp=time_stamp,
+                    sick_start=sick_start[person_x],
+                    traces=history.traces
+                ),
+                person_y=self.__restore_person_at(
+                    person_id=person_y,
+                    time_stamp=time_stamp,
+                    sick_start=sick_start[person_y],
+                    traces=history.traces
+                ),
+                intensity=intensity,
+                time_stamp=time_stamp
+            ) for person_x, person_y, intensity, time_stamp in zip(
+                history.meetings_x.tolist(),
+                history.meetings_y.tolist(),
+                history.meetings_intensity.tolist(),
+                history.meetings_time_stamp.tolist()
+            )
+        ]
+        self.__group_contacts = [history.group_contacts]
+        if checkpoint.aggregated_contacts is not None:
+            self.__contacts_aggregator = ContactsAggregator.restore(
+                people_number=len(self.__people),
+                aggregated_contacts=checkpoint.aggregated_contacts
+            )
+
+    def __restore_person_at(self,
+                            person_id: int,
+                            time_stamp: int,
+                            sick_start: int,
+                            traces: np.ndarray
+                            ) -> Person:
+        sick = bool(self.__initially_sick[person_id]) or \
+            NOT_SICK < sick_start < time_stamp
+        x, y = traces[time_stamp, person_id].tolist()
+        return Person(
+            person_id=person_id,
+            sick=sick,
+            position=Position2D(x=x, y=y),
+            sick_start=sick_start if sick else None
         )
 
     def __update_people_positions(self) -> None:
@@ -82,71 +589,135 @@ class SimulationEngine:
             new_position = self.__generate_new_person_position(person=person)
             updated_person = person.update_position(new_position=new_position)
             people_after_move.append(updated_person)
-            self.__people_traces[person].append(updated_person.position)
         self.__people = people_after_move
+        self.__trace_store.append(positions=self.__get_positions())
+        if self.__history_dropped:
+            self.__trace_store.drop_steps_before(time_stamp=self.__time_stamp)
 
     def __generate_new_person_position(self, person: Person) -> Position2D:
         move_vector = person.get_move_vector(
-            max_step_size=self.__max_person_step_size
+            max_step_size=self.__max_person_step_size,
+            random_generator=self.__random_generator
         )
         return self.__simulation_map.get_next_position(
             source_position=person.position,
             move_vector=move_vector
         )
 
-    def __calculate_occupancy_map(self) -> OccupancyMap:
-        occupancy_map_specs = [
-            (person.position, person) for person in self.__people
-        ]
-        return create_dictionary_of_lists(dictionary_specs=occupancy_map_specs)
+    def __calculate_occupancy_map(self) -> Grouping:
+        positions = self.__trace_store.get_positions(
+            time_stamp=self.__time_stamp
+        )
+        cell_ids = linearize_positions(
+            positions=positions.astype(np.int64),
+            max_y=self.__simulation_map.max_y
+        )
+        return group_by_keys(keys=cell_ids)
 
     def __generate_meetings_in_current_step(self,
-                                            occupancy_map: OccupancyMap
-                                            ) -> List[Contact]:
-        return flatten([
-            self.__generate_meetings_inside_group(people_group)
-            for people_group in occupancy_map.values()
-        ])
-
-    def __generate_meetings_inside_group(self,
-                                         people_group: PeopleGroup
-                                         ) -> List[Contact]:
+                                            occupancy_map: Grouping
+                                            ) -> Tuple[List[Contact], Grouping]:
+        """Meetings of pairs of people and cells recorded as group contacts."""
+        cell_contacts = generate_cell_contacts(
+            occupancy=occupancy_map,
+            crowding_policy=self.__crowding_policy,
+            random_generator=self.__array_random_generator
+        )
+        people_x, people_y = cell_contacts.person_x, cell_contacts.person_y
+        intensities = self.__array_random_generator.random(people_x.shape[0])
+        self.__last_step_contacts = (people_x, people_y, intensities)
         return [
             Contact(
-                person_x=person_x,
-                person_y=person_y,
-                intensity=random.random(),
+                person_x=self.__people[person_x],
+                person_y=self.__people[person_y],
+                intensity=intensity,
                 time_stamp=self.__time_stamp
-            ) for person_x, person_y in itertools.combinations(people_group, 2)
-        ]
+            ) for person_x, person_y, intensity in zip(
+                people_x.tolist(), people_y.tolist(), intensities.tolist()
+            )
+        ], cell_contacts.group_cells
+
+    def __aggregate_meetings(self) -> None:
+        people_x, people_y, intensity = self.__last_step_contacts
+        self.__contacts_aggregator.add_contacts(
+            person_x=people_x,
+            person_y=people_y,
+            intensity=intensity,
+            time_stamp=self.__time_stamp
+        )
 
     def __update_people_health_status(self,
-                                      current_step_meetings: List[Contact]
-                                      ):
-        people_before_transmission = {
-            person.person_id: person for person in self.__people
-        }
+                                      current_step_meetings: List[Contact],
+                                      group_cells: Grouping
+                                      ) -> None:
         transmission_endangered_meetings = [
             meeting for meeting in current_step_meetings
             if meeting.virus_transmission_can_occur()
         ]
         meetings_with_actual_transmission = [
             meeting for meeting in transmission_endangered_meetings
-            if random.random() < meeting.intensity * self.__transmission_probability
+            if self.__random_generator.random() < meeting.intensity *
+            self.__transmission_probability
         ]
         people_recently_infected = flatten(
             meeting.get_pair() for meeting in meetings_with_actual_transmission
         )
+        if group_cells.groups_number > 0:
+            # members of group contact meet each other with mean intensity
+            people_recently_infected = list(people_recently_infected) + \
+                self.__infect_within_cells(occupancy=group_cells)
+        self.__mark_people_sick(people_recently_infected=people_recently_infected)
+
+    def __update_people_health_status_per_cell(self,
+                                               occupancy_map: Grouping
+                                               ) -> None:
+        self.__mark_people_sick(
+            people_recently_infected=self.__infect_within_cells(
+                occupancy=occupancy_map
+            )
+        )
+
+    def __infect_within_cells(self, occupancy: Grouping) -> List[Person]:
+        sick = np.fromiter(
+            (person.sick for person in self.__people),
+            dtype=np.bool_,
+            count=len(self.__people)
+        )
+        endangered_people, infection_probability = calculate_infection_risk(
+            occupancy=occupancy,
+            sick=sick,
+            transmission_probability=self.__transmission_probability
+        )
+        coins = self.__array_random_generator.random(endangered_people.shape[0])
+        return [
+            self.__people[person_index] for person_index
+            in endangered_people[coins < infection_probability].tolist()
+        ]
+
+    def __mark_people_sick(self, people_recently_infected: List[Person]) -> None:
+        people_before_transmission = {
+            person.person_id: person for person in self.__people
+        }
         people_recently_infected = {
             person.person_id: person.make_sick(time_stamp=self.__time_stamp)
             for person in people_recently_infected
             if person.sick is False
         }
+        self.__metrics_recorder.record(
+            metric=NEW_INFECTIONS_METRIC,
+            value=len(people_recently_infected)
+        )
         if len(people_recently_infected) > 0:
             logging.info(
                 f"People recently infected: {len(people_recently_infected)}"
             )
         people_before_transmission.update(people_recently_infected)
+        self.__sick_people_number += len(people_recently_infected)
+        self.__last_step_infected = np.sort(np.fromiter(
+            people_recently_infected.keys(),
+            dtype=np.int64,
+            count=len(people_recently_infected)
+        ))
         self.__people = list(people_before_transmission.values())
 
 
@@ -155,12 +726,18 @@ class PeopleInitializer:
     @staticmethod
     def initialize_people(simulation_map: Map,
                           people_number: int,
-                          initial_seek_people: int
+                          initial_seek_people: int,
+                          random_generator: Optional[random.Random] = None
                           ) -> List[Person]:
+        random_generator = random_generator or random
         people_indices = [i for i in range(people_number)]
-        sick_people = random.sample(people_indices, k=initial_seek_people)
+        sick_people = random_generator.sample(
+            people_indices, k=initial_seek_people
+        )
         people_positions = [
-            PeopleInitializer.__get_random_position(simulation_map)
+            PeopleInitializer.__get_random_position(
+                simulation_map, random_generator
+            )
             for _ in range(people_number)
         ]
         return [
@@ -174,7 +751,9 @@ class PeopleInitializer:
 
 
     @staticmethod
-    def __get_random_position(simulation_map: Map) -> Position2D:
-        x = random.randint(0, simulation_map.max_x-1)
-        y = random.randint(0, simulation_map.max_y-1)
+    def __get_random_position(simulation_map: Map,
+                              random_generator: random.Random
+                              ) -> Position2D:
+        x = random_generator.randint(0, simulation_map.max_x-1)
+        y = random_generator.randint(0, simulation_map.max_y-1)
         return Position2D(x=x, y=y)
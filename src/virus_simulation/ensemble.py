@@ -0,0 +1,271 @@
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Set, Optional
+
+from tqdm import tqdm
+
+from src.utils.fs_utils import dump_json_to_file
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.execute import execute_simulation, JSON_FORMAT, \
+    SNAPSHOT_FORMATS
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+import src.config as global_config
+
+
+logging.getLogger().setLevel(global_config.LOGGING_LEVEL)
+
+ENSEMBLE_RUNS_KEY = "runs"
+INFECTED_PER_STEP_KEY = "infected_per_step"
+
+
+@dataclass(frozen=True)
+class SimulationParameters:
+    map_size: int
+    people_number: int
+    transmission_probability: float
+    max_person_step_size: int
+    initial_seek_people: int
+
+    def to_name(self) -> str:
+        return f"map_{self.map_size}_people_{self.people_number}_" \
+            f"tp_{self.transmission_probability}_" \
+            f"step_{self.max_person_step_size}_" \
+            f"seek_{self.initial_seek_people}"
+
+
+@dataclass(frozen=True)
+class EnsembleRunSpecs:
+    simulation_name: str
+    parameters: SimulationParameters
+    random_seed: int
+    steps: int
+    snapshot_steps: Set[int]
+    vectorized: bool
+    transmission_only: bool
+    aggregate_contacts: bool
+    snapshot_format: str
+
+
+def prepare_parameters_grid(map_sizes: List[int],
+                            people_numbers: List[int],
+                            transmission_probabilities: List[float],
+                            max_person_step_sizes: List[int],
+                            initial_seek_people: List[int]
+                            ) -> List[SimulationParameters]:
+    return [
+        SimulationParameters(
+            map_size=map_size,
+            people_number=people_number,
+            transmission_probability=transmission_probability,
+            max_person_step_size=max_person_step_size,
+            initial_seek_people=seek_people
+        ) for map_size, people_number, transmission_probability,
+        max_person_step_size, seek_people in itertools.product(
+            map_sizes,
+            people_numbers,
+            transmission_probabilities,
+            max_person_step_sizes,
+            initial_seek_people
+        )
+    ]
+
+
+def execute_ensemble(ensemble_name: str,
+                     parameters_grid: List[SimulationParameters],
+                     seeds_number: int,
+                     steps: int,
+                     snapshot_steps: Set[int],
+                     base_seed: int = 0,
+                     workers: Optional[int] = None,
+                     vectorized: bool = False,
+                     transmission_only: bool = False,
+                     aggregate_contacts: bool = False,
+                     snapshot_format: str = JSON_FORMAT
+                     ) -> None:
+    runs_specs = [
+        EnsembleRunSpecs(
+            simulation_name=f"{ensemble_name}_{parameters.to_name()}_"
+                            f"seed_{base_seed + seed_index}",
+            parameters=parameters,
+            random_seed=base_seed + seed_index,
+            steps=steps,
+            snapshot_steps=snapshot_steps,
+            vectorized=vectorized,
+            transmission_only=transmission_only,
+            aggregate_contacts=aggregate_contacts,
+            snapshot_format=snapshot_format
+        )
+        for parameters in parameters_grid
+        for seed_index in range(seeds_number)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        runs_summaries = list(tqdm(
+            executor.map(_execute_ensemble_run, runs_specs),
+            total=len(runs_specs)
+        ))
+    target_path = os.path.join(
+        global_config.VIRUS_SIMULATION_OUTPUT_PATH,
+        f"{ensemble_name}_ensemble_summary.json"
+    )
+    logging.info(f"Persisting ensemble summary under {target_path}")
+    dump_json_to_file(
+        target_path=target_path,
+        content={ENSEMBLE_RUNS_KEY: runs_summaries}
+    )
+
+
+def _execute_ensemble_run(run_specs: EnsembleRunSpecs) -> Dict[str, Any]:
+    engine_class = VectorizedSimulationEngine if run_specs.vectorized \
+        else SimulationEngine
+    simulation_engine = engine_class.initialize(
+        map_size=run_specs.parameters.map_size,
+        max_person_step_size=run_specs.parameters.max_person_step_size,
+        people_number=run_specs.parameters.people_number,
+        initial_seek_people=run_specs.parameters.initial_seek_people,
+        transmission_probability=run_specs.parameters.transmission_probability,
+        transmission_only=run_specs.transmission_only,
+        aggregate_contacts=run_specs.aggregate_contacts,
+        random_seed=run_specs.random_seed
+    )
+    infected_per_step = execute_simulation(
+        simulation_engine=simulation_engine,
+        simulation_name=run_specs.simulation_name,
+        steps=run_specs.steps,
+        snapshot_steps=run_specs.snapshot_steps,
+        snapshot_format=run_specs.snapshot_format,
+        show_progress=False
+    )
+    run_summary = asdict(run_specs.parameters)
+    run_summary.update({
+        "simulation_name": run_specs.simulation_name,
+        "random_seed": run_specs.random_seed,
+        INFECTED_PER_STEP_KEY: infected_per_step
+    })
+    return run_summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        "Monte Carlo ensemble of virus expansion simulations over parameters grid"
+    )
+    parser.add_argument(
+        "--ensemble_name",
+        help="Distinguishable name of ensemble.",
+        type=str,
+        required=True
+    )
+    parser.add_argument(
+        "--map_size",
+        help="Sizes of map to place people.",
+        type=int,
+        nargs="+",
+        required=True
+    )
+    parser.add_argument(
+        "--people_number",
+        help="Numbers of people to place on map.",
+        type=int,
+        nargs="+",
+        required=True
+    )
+    parser.add_argument(
+        "--transmission_probability",
+        help="Probabilities of virus transmission.",
+        type=float,
+        nargs="+",
+        default=[0.5]
+    )
+    parser.add_argument(
+        "--max_person_step_size",
+        help="Max lengths of step in each direction.",
+        type=int,
+        nargs="+",
+        default=[10]
+    )
+    parser.add_argument(
+        "--initial_seek_people",
+        help="Numbers of people sick at zero-day.",
+        type=int,
+        nargs="+",
+        default=[1]
+    )
+    parser.add_argument(
+        "--seeds",
+        help="Number of realisations (random seeds) per parameters combination.",
+        type=int,
+        default=10
+    )
+    parser.add_argument(
+        "--base_seed",
+        help="Seed of the first realisation, following ones are consecutive.",
+        type=int,
+        default=0
+    )
+    parser.add_argument(
+        "--steps",
+        help="Number of steps to carry on each simulation.",
+        type=int,
+        default=100
+    )
+    parser.add_argument(
+        "--snapshot_steps",
+        help="Intermediate steps to take snapshots of simulation state.",
+        type=int,
+        nargs="*",
+        default=[]
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of worker processes (default: number of CPUs).",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--vectorized",
+        help="Use NumPy-based simulation engine.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--no_contacts",
+        help="Only simulate virus transmission without recording contacts.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--aggregate_contacts",
+        help="Keep single aggregated record per pair of people instead of "
+             "every contact.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--snapshot_format",
+        help="Format of persisted snapshots.",
+        type=str,
+        choices=SNAPSHOT_FORMATS,
+        default=JSON_FORMAT
+    )
+
+    args = parser.parse_args()
+
+    execute_ensemble(
+        ensemble_name=args.ensemble_name,
+        parameters_grid=prepare_parameters_grid(
+            map_sizes=args.map_size,
+            people_numbers=args.people_number,
+            transmission_probabilities=args.transmission_probability,
+            max_person_step_sizes=args.max_person_step_size,
+            initial_seek_people=args.initial_seek_people
+        ),
+        seeds_number=args.seeds,
+        steps=args.steps,
+        snapshot_steps=set(args.snapshot_steps),
+        base_seed=args.base_seed,
+        workers=args.workers,
+        vectorized=args.vectorized,
+        transmission_only=args.no_contacts,
+        aggregate_contacts=args.aggregate_contacts,
+        snapshot_format=args.snapshot_format
+    )
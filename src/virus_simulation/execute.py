@@ -1,51 +1,414 @@
 import argparse
 import os
-from typing import Set
+import queue
+import threading
+from dataclasses import replace
+from typing import Set, Union, List, Dict, Any, Optional
 
 from tqdm import tqdm
 import logging
 
-from src.virus_simulation.conversion import convert_simulation_state_to_json
+from src.utils.fs_utils import COMPRESSIONS, COMPRESSION_EXTENSIONS, \
+    get_path_size
+from src.virus_simulation.checkpointing import dump_checkpoint, \
+    get_checkpoint_path, load_checkpoint
+from src.virus_simulation.conversion import convert_simulation_state_to_json, \
+    convert_simulation_state_delta_to_json, dump_snapshot_manifest, \
+    convert_simulation_state_to_binary, convert_simulation_state_to_replay, \
+    prepare_snapshot_index_entry, dump_snapshot_index
+from src.virus_simulation.crowding import CrowdingPolicy, CROWDING_MODES, \
+    EXACT_CROWDING, GROUP_CROWDING, DEFAULT_MAX_PARTNERS
 from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.history_spilling import MemoryBudget
+from src.virus_simulation.json_streaming import \
+    stream_simulation_state_to_json
+from src.virus_simulation.metrics import MetricsRecorder, \
+    StreamMetricsRecorder, DISABLED_METRICS_RECORDER, SNAPSHOT_PHASE, \
+    CHECKPOINT_PHASE
+from src.virus_simulation.partitioned_engine import \
+    PartitionedSimulationEngine
+from src.virus_simulation.primitives import SimulationState, \
+    SimulationStateDelta
+from src.virus_simulation.vectorized_engine import SimulationStateViews, \
+    VectorizedSimulationEngine
 import src.config as global_config
+import src.virus_simulation.config as simulation_config
 
 
 logging.getLogger().setLevel(global_config.LOGGING_LEVEL)
 
+Engine = Union[
+    SimulationEngine, VectorizedSimulationEngine, PartitionedSimulationEngine
+]
 
-def execute_simulation(simulation_engine: SimulationEngine,
+JSON_FORMAT = "json"
+BINARY_FORMAT = "binary"
+STREAMED_JSON_FORMAT = "streamed_json"
+REPLAY_FORMAT = "replay"
+SNAPSHOT_FORMATS = [
+    JSON_FORMAT, BINARY_FORMAT, STREAMED_JSON_FORMAT, REPLAY_FORMAT
+]
+DIRECTORY_FORMATS = {BINARY_FORMAT, REPLAY_FORMAT}
+SNAPSHOT_INDEX_SUFFIX = "_snapshot_index.json"
+MEGABYTE = 1 << 20
+ENGINE_CLASSES = {
+    engine_class.__name__: engine_class
+    for engine_class in [SimulationEngine, VectorizedSimulationEngine]
+}
+
+
+class FullSnapshotWriter:
+
+    def __init__(self,
+                 simulation_name: str,
+                 snapshot_format: str = JSON_FORMAT,
+                 encode_traces: bool = False,
+                 compression: Optional[str] = None):
+        self.__simulation_name = simulation_name
+        self.__snapshot_format = snapshot_format
+        self.__encode_traces = encode_traces
+        self.__compression = compression
+        self.__indexed_snapshots: List[Dict[str, Any]] = []
+
+    def persist(self, simulation_engine: Engine, step: int) -> None:
+        self.write(
+            snapshot=self.capture(simulation_engine=simulation_engine, step=step),
+            step=step
+        )
+
+    def capture(self,
+                simulation_engine: Engine,
+                step: int
+                ) -> Union[SimulationState, SimulationStateViews]:
+        # vectorized engine hands over array views only, so that Person and
+        # Contact records are built by write() (in writer thread if async)
+        if isinstance(simulation_engine, VectorizedSimulationEngine):
+            snapshot = simulation_engine.capture_simulation_state()
+        else:
+            snapshot = simulation_engine.get_simulation_state()
+        if self.__snapshot_format == REPLAY_FORMAT:
+            snapshot = replace(
+                snapshot, replay_log=simulation_engine.get_replay_log()
+            )
+        return snapshot
+
+    def write(self,
+              snapshot: Union[SimulationState, SimulationStateViews],
+              step: int
+              ) -> None:
+        if isinstance(snapshot, SimulationStateViews):
+            snapshot = snapshot.materialize()
+        target_path = get_snapshot_path(
+            simulation_name=self.__simulation_name,
+            step=step,
+            snapshot_format=self.__snapshot_format,
+            compression=self.__compression
+        )
+        section_offsets = _persist_simulation_state(
+            simulation_state=snapshot,
+            target_path=target_path,
+            step=step,
+            snapshot_format=self.__snapshot_format,
+            encode_traces=self.__encode_traces,
+            compression=self.__compression
+        )
+        self.__indexed_snapshots.append(prepare_snapshot_index_entry(
+            simulation_state=snapshot,
+            step=step,
+            snapshot_format=self.__snapshot_format,
+            snapshot_path=os.path.basename(target_path),
+            snapshot_bytes=get_path_size(path=target_path),
+            section_offsets=section_offsets
+        ))
+        dump_snapshot_index(
+            simulation_name=self.__simulation_name,
+            simulation_map=snapshot.map,
+            people_number=len(snapshot.people),
+            snapshots=self.__indexed_snapshots,
+            target_path=get_snapshot_index_path(
+                simulation_name=self.__simulation_name
+            )
+        )
+
+
+class IncrementalSnapshotWriter:
+
+    def __init__(self, simulation_name: str):
+        self.__simulation_name = simulation_name
+        self.__next_time_stamp = 0
+        self.__segments: List[Dict[str, Any]] = []
+
+    def persist(self, simulation_engine: Engine, step: int) -> None:
+        snapshot = self.capture(simulation_engine=simulation_engine, step=step)
+        if snapshot is not None:
+            self.write(snapshot=snapshot, step=step)
+
+    def capture(self,
+                simulation_engine: Engine,
+                step: int
+                ) -> Optional[SimulationStateDelta]:
+        if step < self.__next_time_stamp:
+            return None
+        simulation_state_delta = simulation_engine.get_simulation_state_delta(
+            since_time_stamp=self.__next_time_stamp
+        )
+        self.__next_time_stamp = step + 1
+        return simulation_state_delta
+
+    def write(self, snapshot: SimulationStateDelta, step: int) -> None:
+        segment_name = f"{self.__simulation_name}_segment_{step}.json"
+        target_path = os.path.join(
+            global_config.VIRUS_SIMULATION_OUTPUT_PATH, segment_name
+        )
+        logging.info(f"[Step #{step}]Persisting segment under {target_path}")
+        convert_simulation_state_delta_to_json(
+            simulation_state_delta=snapshot,
+            target_path=target_path
+        )
+        self.__segments.append({
+            simulation_config.SEGMENT_STEPS_KEY: (snapshot.first_time_stamp, step),
+            simulation_config.SEGMENT_PATH_KEY: segment_name
+        })
+        dump_snapshot_manifest(
+            simulation_map=snapshot.map,
+            people_number=snapshot.people_number,
+            segments=self.__segments,
+            target_path=os.path.join(
+                global_config.VIRUS_SIMULATION_OUTPUT_PATH,
+                f"{self.__simulation_name}_manifest.json"
+            )
+        )
+
+
+SnapshotWriter = Union[FullSnapshotWriter, IncrementalSnapshotWriter]
+
+
+class BackgroundSnapshotWriter:
+    """Captures snapshots in the simulation thread and leaves conversion and
+    I/O to a writer thread, so that they overlap with following steps.
+    persist() blocks while max_pending_snapshots are waiting to be written.
+
+    Only VectorizedSimulationEngine is captured as array views - other
+    engines still build whole SimulationState (get_simulation_state()) in
+    the simulation thread, so for them only conversion and I/O overlap.
+    """
+
+    __STOP = object()
+
+    def __init__(self,
+                 snapshot_writer: SnapshotWriter,
+                 max_pending_snapshots: int = 2):
+        self.__snapshot_writer = snapshot_writer
+        self.__pending_snapshots = queue.Queue(maxsize=max_pending_snapshots)
+        self.__writer_error: Optional[BaseException] = None
+        self.__writer_thread = threading.Thread(
+            target=self.__write_pending_snapshots,
+            name="snapshot-writer",
+            daemon=True
+        )
+        self.__writer_thread.start()
+
+    def persist(self, simulation_engine: Engine, step: int) -> None:
+        self.__raise_writer_error()
+        snapshot = self.__snapshot_writer.capture(
+            simulation_engine=simulation_engine,
+            step=step
+        )
+        if snapshot is not None:
+            self.__pending_snapshots.put((snapshot, step))
+
+    def close(self) -> None:
+        self.__pending_snapshots.put(self.__STOP)
+        self.__writer_thread.join()
+        self.__raise_writer_error()
+
+    def __write_pending_snapshots(self) -> None:
+        while True:
+            pending_snapshot = self.__pending_snapshots.get()
+            if pending_snapshot is self.__STOP:
+                return
+            if self.__writer_error is not None:
+                continue
+            snapshot, step = pending_snapshot
+            try:
+                self.__snapshot_writer.write(snapshot=snapshot, step=step)
+            except BaseException as error:
+                self.__writer_error = error
+
+    def __raise_writer_error(self) -> None:
+        if self.__writer_error is not None:
+            raise SimulationError(
+                "Background snapshot writer failed."
+            ) from self.__writer_error
+
+
+class CheckpointWriter:
+    """Dumps checkpoints holding only history since the previous one (which
+    they refer to), so that cost of checkpoint does not grow with length of
+    simulation.
+    """
+
+    def __init__(self,
+                 simulation_name: str,
+                 previous_checkpoint: Optional[str] = None,
+                 next_time_stamp: int = 0):
+        self.__simulation_name = simulation_name
+        self.__previous_checkpoint = previous_checkpoint
+        self.__next_time_stamp = next_time_stamp
+
+    def persist(self, simulation_engine: Engine, step: int) -> None:
+        target_path = get_checkpoint_path(
+            checkpoints_dir=global_config.VIRUS_SIMULATION_OUTPUT_PATH,
+            simulation_name=self.__simulation_name,
+            step=step
+        )
+        logging.info(f"[Step #{step}]Persisting checkpoint under {target_path}")
+        checkpoint = simulation_engine.get_checkpoint(
+            since_time_stamp=self.__next_time_stamp
+        )
+        if self.__previous_checkpoint is not None:
+            checkpoint = replace(
+                checkpoint,
+                previous_checkpoint=os.path.relpath(
+                    self.__previous_checkpoint,
+                    os.path.dirname(target_path)
+                )
+            )
+        dump_checkpoint(checkpoint=checkpoint, target_path=target_path)
+        self.__previous_checkpoint = target_path
+        self.__next_time_stamp = step + 1
+
+
+def execute_simulation(simulation_engine: Engine,
                        simulation_name: str,
                        steps: int,
-                       snapshot_steps: Set[int]) -> None:
-    for step in tqdm(range(steps)):
-        simulation_engine.take_simulation_step()
-        if step in snapshot_steps:
-            _persist_simulation_state(
-                simulation_engine=simulation_engine,
-                simulation_name=simulation_name,
-                step=step
-            )
-    _persist_simulation_state(
-        simulation_engine=simulation_engine,
+                       snapshot_steps: Set[int],
+                       incremental_snapshots: bool = False,
+                       snapshot_format: str = JSON_FORMAT,
+                       show_progress: bool = True,
+                       metrics_recorder: Optional[MetricsRecorder] = None,
+                       encode_traces: bool = False,
+                       async_snapshots: bool = False,
+                       max_pending_snapshots: int = 2,
+                       compression: Optional[str] = None,
+                       checkpoint_every: Optional[int] = None,
+                       resumed_from: Optional[str] = None
+                       ) -> List[int]:
+    """Carries simulation on until given number of steps is taken, starting
+    after the last step already taken by engine (e.g. restored from
+    checkpoint resumed_from).
+    """
+    metrics_recorder = metrics_recorder or DISABLED_METRICS_RECORDER
+    if incremental_snapshots:
+        snapshot_writer = IncrementalSnapshotWriter(
+            simulation_name=simulation_name
+        )
+    else:
+        snapshot_writer = FullSnapshotWriter(
+            simulation_name=simulation_name,
+            snapshot_format=snapshot_format,
+            encode_traces=encode_traces,
+            compression=compression
+        )
+    if async_snapshots:
+        snapshot_writer = BackgroundSnapshotWriter(
+            snapshot_writer=snapshot_writer,
+            max_pending_snapshots=max_pending_snapshots
+        )
+    first_step = simulation_engine.time_stamp + 1
+    checkpoint_writer = CheckpointWriter(
         simulation_name=simulation_name,
-        step=steps-1
+        previous_checkpoint=resumed_from,
+        next_time_stamp=first_step
     )
+    sick_people_numbers = []
+    try:
+        for step in tqdm(range(first_step, steps), disable=not show_progress):
+            simulation_engine.take_simulation_step()
+            sick_people_numbers.append(simulation_engine.sick_people_number)
+            if step in snapshot_steps:
+                with metrics_recorder.measure(phase=SNAPSHOT_PHASE):
+                    snapshot_writer.persist(
+                        simulation_engine=simulation_engine,
+                        step=step
+                    )
+            if checkpoint_every is not None and \
+                    (step + 1) % checkpoint_every == 0:
+                with metrics_recorder.measure(phase=CHECKPOINT_PHASE):
+                    checkpoint_writer.persist(
+                        simulation_engine=simulation_engine,
+                        step=step
+                    )
+        # the last taken step is already persisted if it is a snapshot step
+        if steps - 1 not in snapshot_steps or steps <= first_step:
+            with metrics_recorder.measure(phase=SNAPSHOT_PHASE):
+                snapshot_writer.persist(
+                    simulation_engine=simulation_engine,
+                    step=steps-1
+                )
+    except BaseException:
+        if async_snapshots:
+            # error of writer must not replace the one of simulation
+            try:
+                snapshot_writer.close()
+            except SimulationError:
+                logging.exception("Background snapshot writer failed.")
+        raise
+    if async_snapshots:
+        snapshot_writer.close()
+    return sick_people_numbers
 
 
-def _persist_simulation_state(simulation_engine: SimulationEngine,
-                              simulation_name: str,
-                              step: int
-                              ) -> None:
-    simulation_state = simulation_engine.get_simulation_state()
+def get_snapshot_path(simulation_name: str,
+                      step: int,
+                      snapshot_format: str = JSON_FORMAT,
+                      compression: Optional[str] = None
+                      ) -> str:
     target_path = os.path.join(
         global_config.VIRUS_SIMULATION_OUTPUT_PATH,
-        f"{simulation_name}_snapshot_{step}.json"
+        f"{simulation_name}_snapshot_{step}"
+    )
+    if snapshot_format not in DIRECTORY_FORMATS:
+        target_path = f"{target_path}.json"
+    if snapshot_format == STREAMED_JSON_FORMAT and compression is not None:
+        target_path = f"{target_path}{COMPRESSION_EXTENSIONS[compression]}"
+    return target_path
+
+
+def get_snapshot_index_path(simulation_name: str) -> str:
+    return os.path.join(
+        global_config.VIRUS_SIMULATION_OUTPUT_PATH,
+        f"{simulation_name}{SNAPSHOT_INDEX_SUFFIX}"
     )
+
+
+def _persist_simulation_state(simulation_state: SimulationState,
+                              target_path: str,
+                              step: int,
+                              snapshot_format: str = JSON_FORMAT,
+                              encode_traces: bool = False,
+                              compression: Optional[str] = None
+                              ) -> Optional[Dict[str, int]]:
+    """Returns byte offsets of sections of snapshot, if they are known."""
     logging.info(f"[Step #{step}]Persisting snapshot under {target_path}")
-    convert_simulation_state_to_json(
+    if snapshot_format == STREAMED_JSON_FORMAT:
+        return stream_simulation_state_to_json(
+            simulation_state=simulation_state,
+            target_path=target_path,
+            compression=compression,
+            encode_traces=encode_traces
+        )
+    convert = {
+        BINARY_FORMAT: convert_simulation_state_to_binary,
+        REPLAY_FORMAT: convert_simulation_state_to_replay
+    }.get(snapshot_format, convert_simulation_state_to_json)
+    convert(
         simulation_state=simulation_state,
-        target_path=target_path
+        target_path=target_path,
+        encode_traces=encode_traces
     )
+    return None
 
 
 if __name__ == '__main__':
@@ -54,15 +417,15 @@ if __name__ == '__main__':
     )
     parser.add_argument(
         "--map_size",
-        help="Size of map to place people.",
+        help="Size of map to place people (required unless resuming).",
         type=int,
-        required=True
+        default=None
     )
     parser.add_argument(
         "--people_number",
-        help="Number of people to place on map.",
+        help="Number of people to place on map (required unless resuming).",
         type=int,
-        required=True
+        default=None
     )
     parser.add_argument(
         "--simulation_name",
@@ -101,19 +464,258 @@ if __name__ == '__main__':
         type=int,
         default=1
     )
+    parser.add_argument(
+        "--vectorized",
+        help="Use NumPy-based simulation engine.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--workers_number",
+        help="Split map into tiles simulated by given number of worker "
+             "processes.",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--no_contacts",
+        help="Only simulate virus transmission without recording contacts.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--incremental_snapshots",
+        help="Persist only changes since previous snapshot along with manifest.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--snapshot_format",
+        help="Format of persisted snapshots.",
+        type=str,
+        choices=SNAPSHOT_FORMATS,
+        default=JSON_FORMAT
+    )
+    parser.add_argument(
+        "--aggregate_contacts",
+        help="Keep single aggregated record per pair of people instead of "
+             "every contact.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--random_seed",
+        help="Seed of simulation random generators.",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--compression",
+        help=f"Compression of {STREAMED_JSON_FORMAT} snapshots.",
+        type=str,
+        choices=COMPRESSIONS,
+        default=None
+    )
+    parser.add_argument(
+        "--async_snapshots",
+        help="Persist snapshots in background thread while simulation goes on.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--max_pending_snapshots",
+        help="Number of captured snapshots waiting for background writer "
+             "before simulation is paused.",
+        type=int,
+        default=2
+    )
+    parser.add_argument(
+        "--encode_traces",
+        help="Persist traces as run-length encoded moves instead of "
+             "positions in each step.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--traces_path",
+        help="Path to raw file backing people traces (memory-mapped), "
+             "by default traces are kept in RAM.",
+        type=str,
+        default=None
+    )
+    parser.add_argument(
+        "--checkpoint_every",
+        help="Number of steps between checkpoints simulation can be resumed "
+             "from.",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--resume_from",
+        help="Path to checkpoint to resume simulation from (its parameters "
+             "take precedence over command line).",
+        type=str,
+        default=None
+    )
+    parser.add_argument(
+        "--memory_budget",
+        help="Megabytes of history (contacts and traces) kept in RAM, older "
+             "history is spilled to disk once exceeded.",
+        type=float,
+        default=None
+    )
+    parser.add_argument(
+        "--metrics_path",
+        help="Path to JSONL (or .csv) file to stream per-step metrics into.",
+        type=str,
+        default=None
+    )
+    parser.add_argument(
+        "--trace_memory",
+        help="Record memory allocated in each step phase (with tracemalloc).",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--crowding_policy",
+        help="Handling of hot cells where people would meet more than "
+             "--max_partners others: record all pairs, sample partners or "
+             "record single group contact.",
+        type=str,
+        choices=CROWDING_MODES,
+        default=EXACT_CROWDING
+    )
+    parser.add_argument(
+        "--max_partners",
+        help="Max number of people met by each person in a cell before it "
+             "is handled by crowding policy.",
+        type=int,
+        default=DEFAULT_MAX_PARTNERS
+    )
 
     args = parser.parse_args()
+    if args.incremental_snapshots and args.snapshot_format != JSON_FORMAT:
+        parser.error("Incremental snapshots are only available in JSON format.")
+    if args.compression is not None and \
+            args.snapshot_format != STREAMED_JSON_FORMAT:
+        parser.error(
+            f"Compression is only available in {STREAMED_JSON_FORMAT} format."
+        )
+    if args.incremental_snapshots and args.encode_traces:
+        parser.error("Incremental snapshots do not support encoded traces.")
+    if args.resume_from is None and \
+            (args.map_size is None or args.people_number is None):
+        parser.error("--map_size and --people_number are required.")
+    if args.checkpoint_every is not None and args.checkpoint_every < 1:
+        parser.error("--checkpoint_every must be positive.")
+    if args.workers_number is not None and (
+            args.checkpoint_every is not None or args.resume_from is not None):
+        parser.error("Partitioned simulation does not support checkpoints.")
+    if args.workers_number is not None and args.workers_number < 1:
+        parser.error("--workers_number must be positive.")
+    if args.workers_number is not None and args.vectorized:
+        parser.error(
+            "--vectorized and --workers_number select different engines."
+        )
+    if args.workers_number is not None and args.memory_budget is not None:
+        parser.error("Partitioned simulation does not support memory budget.")
+    if args.memory_budget is not None and args.memory_budget < 0:
+        parser.error("--memory_budget must not be negative.")
+    if args.snapshot_format == REPLAY_FORMAT and (
+            not args.vectorized or args.workers_number is not None or
+            args.resume_from is not None):
+        parser.error(
+            f"{REPLAY_FORMAT} snapshots are only available for vectorized "
+            f"simulation that is not partitioned or resumed."
+        )
+    if args.snapshot_format == REPLAY_FORMAT and args.encode_traces:
+        parser.error(f"{REPLAY_FORMAT} snapshots do not store traces.")
+    if args.max_partners < 1:
+        parser.error("--max_partners must be positive.")
+    if args.crowding_policy != EXACT_CROWDING and \
+            args.workers_number is not None:
+        parser.error("Partitioned simulation only supports exact crowding.")
+    if args.crowding_policy == GROUP_CROWDING and args.incremental_snapshots:
+        parser.error("Incremental snapshots do not support group contacts.")
 
-    simulation_engine = SimulationEngine.initialize(
-        map_size=args.map_size,
-        max_person_step_size=args.max_person_step_size,
-        people_number=args.people_number,
-        initial_seek_people=args.initial_seek_people,
-        transmission_probability=args.transmission_probability
-    )
-    execute_simulation(
-        simulation_engine=simulation_engine,
-        simulation_name=args.simulation_name,
-        steps=args.steps,
-        snapshot_steps=set(args.snapshot_steps)
-    )
+    metrics_recorder = DISABLED_METRICS_RECORDER
+    if args.metrics_path is not None:
+        metrics_recorder = StreamMetricsRecorder(
+            target_path=args.metrics_path,
+            trace_memory=args.trace_memory
+        )
+    memory_budget = None
+    if args.memory_budget is not None:
+        memory_budget = MemoryBudget(
+            max_bytes=int(args.memory_budget * MEGABYTE),
+            spill_dir=os.path.join(
+                global_config.VIRUS_SIMULATION_OUTPUT_PATH,
+                f"{args.simulation_name}_spill"
+            )
+        )
+    if args.resume_from is not None:
+        resumed_checkpoint = load_checkpoint(checkpoint_path=args.resume_from)
+        if args.steps <= resumed_checkpoint.time_stamp:
+            parser.error(
+                f"Checkpoint already holds {resumed_checkpoint.time_stamp + 1} "
+                f"steps."
+            )
+        engine_class = ENGINE_CLASSES[
+            resumed_checkpoint.engine_parameters.engine
+        ]
+        simulation_engine = engine_class.restore(
+            checkpoint_path=args.resume_from,
+            metrics_recorder=metrics_recorder,
+            trace_steps_capacity=args.steps,
+            traces_path=args.traces_path,
+            memory_budget=memory_budget
+        )
+    elif args.workers_number is not None:
+        simulation_engine = PartitionedSimulationEngine.initialize(
+            map_size=args.map_size,
+            max_person_step_size=args.max_person_step_size,
+            people_number=args.people_number,
+            initial_seek_people=args.initial_seek_people,
+            transmission_probability=args.transmission_probability,
+            transmission_only=args.no_contacts,
+            aggregate_contacts=args.aggregate_contacts,
+            random_seed=args.random_seed,
+            metrics_recorder=metrics_recorder,
+            trace_steps_capacity=args.steps,
+            traces_path=args.traces_path,
+            workers_number=args.workers_number
+        )
+    else:
+        engine_class = VectorizedSimulationEngine if args.vectorized \
+            else SimulationEngine
+        simulation_engine = engine_class.initialize(
+            map_size=args.map_size,
+            max_person_step_size=args.max_person_step_size,
+            people_number=args.people_number,
+            initial_seek_people=args.initial_seek_people,
+            transmission_probability=args.transmission_probability,
+            transmission_only=args.no_contacts,
+            aggregate_contacts=args.aggregate_contacts,
+            random_seed=args.random_seed,
+            metrics_recorder=metrics_recorder,
+            trace_steps_capacity=args.steps,
+            traces_path=args.traces_path,
+            memory_budget=memory_budget,
+            crowding_policy=CrowdingPolicy(
+                mode=args.crowding_policy,
+                max_partners=args.max_partners
+            )
+        )
+    try:
+        execute_simulation(
+            simulation_engine=simulation_engine,
+            simulation_name=args.simulation_name,
+            steps=args.steps,
+            snapshot_steps=set(args.snapshot_steps),
+            incremental_snapshots=args.incremental_snapshots,
+            snapshot_format=args.snapshot_format,
+            metrics_recorder=metrics_recorder,
+            encode_traces=args.encode_traces,
+            async_snapshots=args.async_snapshots,
+            max_pending_snapshots=args.max_pending_snapshots,
+            compression=args.compression,
+            checkpoint_every=args.checkpoint_every,
+            resumed_from=args.resume_from
+        )
+    finally:
+        if isinstance(simulation_engine, PartitionedSimulationEngine):
+            simulation_engine.close()
+        metrics_recorder.close()
@@ -0,0 +1,263 @@
+from typing import Tuple, Optional
+
+import numpy as np
+import scipy.sparse as spp
+
+from src.virus_simulation.contact_index import ContactsSlice
+from src.virus_simulation.contacts_aggregation import AggregatedContacts
+from src.virus_simulation.crowding import GroupContacts
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.transmission import MEAN_CONTACT_INTENSITY
+import src.virus_simulation.config as simulation_config
+
+CLIPPED_SUM_AGGREGATION = "clipped_sum"
+COUNT_AGGREGATION = "count"
+MAX_AGGREGATION = "max"
+LAST_TIME_STAMP_AGGREGATION = "last_time_stamp"
+AGGREGATIONS = [
+    CLIPPED_SUM_AGGREGATION,
+    COUNT_AGGREGATION,
+    MAX_AGGREGATION,
+    LAST_TIME_STAMP_AGGREGATION
+]
+MAX_CLIPPED_WEIGHT = 1.0
+EDGE_WEIGHT_KEY = "weight"
+
+
+def build_adjacency_matrix(snapshot: Snapshot,
+                           aggregation: str = CLIPPED_SUM_AGGREGATION
+                           ) -> spp.csr_matrix:
+    """Group contacts count as contacts of each pair of group members."""
+    return build_adjacency_matrix_from_contacts_slice(
+        contacts=snapshot.pairwise_contacts,
+        people_number=snapshot.arrays.people_number,
+        aggregation=aggregation
+    )
+
+
+def build_time_window_adjacency_matrix(snapshot: Snapshot,
+                                      first_time_stamp: Optional[int] = None,
+                                      last_time_stamp: Optional[int] = None,
+                                      aggregation: str = CLIPPED_SUM_AGGREGATION
+                                      ) -> spp.csr_matrix:
+    """Builds adjacency matrix of contacts in
+    [first_time_stamp, last_time_stamp).
+    """
+    return build_adjacency_matrix_from_contacts_slice(
+        contacts=snapshot.contact_index.get_contacts(
+            first_time_stamp=first_time_stamp,
+            last_time_stamp=last_time_stamp
+        ),
+        people_number=snapshot.arrays.people_number,
+        aggregation=aggregation
+    )
+
+
+def build_adjacency_matrix_from_contacts_slice(
+        contacts: ContactsSlice,
+        people_number: int,
+        aggregation: str = CLIPPED_SUM_AGGREGATION
+        ) -> spp.csr_matrix:
+    return build_adjacency_matrix_from_contacts(
+        person_x=contacts.person_x,
+        person_y=contacts.person_y,
+        intensity=contacts.intensity,
+        time_stamp=contacts.time_stamp,
+        people_number=people_number,
+        aggregation=aggregation
+    )
+
+
+def build_adjacency_matrix_from_contacts(person_x: np.ndarray,
+                                         person_y: np.ndarray,
+                                         intensity: np.ndarray,
+                                         time_stamp: np.ndarray,
+                                         people_number: int,
+                                         aggregation: str = CLIPPED_SUM_AGGREGATION
+                                         ) -> spp.csr_matrix:
+    """Builds symmetric matrix with single weight per pair of people that
+    met, aggregated over all their contacts.
+    """
+    pair_u, pair_v, pair_index = _index_undirected_pairs(
+        person_x=person_x,
+        person_y=person_y,
+        people_number=people_number
+    )
+    weights = _aggregate_pair_weights(
+        pair_index=pair_index,
+        pairs_number=pair_u.shape[0],
+        intensity=intensity,
+        time_stamp=time_stamp,
+        aggregation=aggregation
+    )
+    return _build_symmetric_matrix(
+        pair_u=pair_u,
+        pair_v=pair_v,
+        weights=weights,
+        people_number=people_number
+    )
+
+
+def build_adjacency_matrix_from_aggregated_contacts(
+        snapshot: Snapshot,
+        aggregation: str = CLIPPED_SUM_AGGREGATION
+        ) -> spp.csr_matrix:
+    snapshot_arrays = snapshot.arrays
+    aggregated_contacts = snapshot_arrays.aggregated_contacts
+    group_contacts = snapshot_arrays.group_contacts
+    if group_contacts.groups_number > 0:
+        return _build_adjacency_matrix_with_group_contacts(
+            aggregated_contacts=aggregated_contacts,
+            group_contacts=group_contacts,
+            people_number=snapshot_arrays.people_number,
+            aggregation=aggregation
+        )
+    if aggregation == CLIPPED_SUM_AGGREGATION:
+        weights = np.minimum(aggregated_contacts.intensity, MAX_CLIPPED_WEIGHT)
+    elif aggregation == COUNT_AGGREGATION:
+        weights = aggregated_contacts.contacts_count
+    elif aggregation == LAST_TIME_STAMP_AGGREGATION:
+        weights = aggregated_contacts.last_time_stamp
+    else:
+        raise SimulationError(
+            f"Aggregation {aggregation} cannot be derived from aggregated "
+            f"contacts."
+        )
+    return _build_symmetric_matrix(
+        pair_u=aggregated_contacts.person_x.astype(np.int64),
+        pair_v=aggregated_contacts.person_y.astype(np.int64),
+        weights=weights.astype(np.float64),
+        people_number=snapshot_arrays.people_number
+    )
+
+
+def build_dgl_graph(snapshot: Snapshot,
+                    aggregation: str = CLIPPED_SUM_AGGREGATION
+                    ) -> "dgl.DGLGraph":
+    import dgl
+    import torch
+
+    adjacency_matrix = build_adjacency_matrix(
+        snapshot=snapshot,
+        aggregation=aggregation
+    ).tocoo()
+    snapshot_arrays = snapshot.arrays
+    labels = np.zeros(snapshot_arrays.people_number, dtype=np.int64)
+    labels[snapshot_arrays.person_id] = snapshot_arrays.sick
+    graph = dgl.DGLGraph()
+    graph.add_nodes(snapshot_arrays.people_number)
+    graph.add_edges(
+        torch.from_numpy(adjacency_matrix.row.astype(np.int64)),
+        torch.from_numpy(adjacency_matrix.col.astype(np.int64))
+    )
+    graph.edata[EDGE_WEIGHT_KEY] = torch.from_numpy(
+        adjacency_matrix.data.astype(np.float32)
+    )
+    graph.ndata[simulation_config.SICKNESS_STATUS_KEY] = torch.from_numpy(labels)
+    return graph
+
+
+def _build_adjacency_matrix_with_group_contacts(
+        aggregated_contacts: AggregatedContacts,
+        group_contacts: GroupContacts,
+        people_number: int,
+        aggregation: str
+        ) -> spp.csr_matrix:
+    """Aggregated contacts do not include group contacts, so pairs of group
+    members are aggregated together with them.
+    """
+    if aggregation not in (CLIPPED_SUM_AGGREGATION, COUNT_AGGREGATION,
+                           LAST_TIME_STAMP_AGGREGATION):
+        raise SimulationError(
+            f"Aggregation {aggregation} cannot be derived from aggregated "
+            f"contacts."
+        )
+    group_x, group_y, group_time_stamp = group_contacts.get_pairs()
+    pair_u, pair_v, pair_index = _index_undirected_pairs(
+        person_x=np.concatenate((aggregated_contacts.person_x, group_x)),
+        person_y=np.concatenate((aggregated_contacts.person_y, group_y)),
+        people_number=people_number
+    )
+    weights = _aggregate_pair_weights(
+        pair_index=pair_index,
+        pairs_number=pair_u.shape[0],
+        intensity=np.concatenate((
+            aggregated_contacts.intensity,
+            np.full(group_x.shape[0], MEAN_CONTACT_INTENSITY)
+        )),
+        time_stamp=np.concatenate(
+            (aggregated_contacts.last_time_stamp, group_time_stamp)
+        ),
+        aggregation=aggregation,
+        contacts_count=np.concatenate((
+            aggregated_contacts.contacts_count,
+            np.ones(group_x.shape[0], dtype=np.int64)
+        ))
+    )
+    return _build_symmetric_matrix(
+        pair_u=pair_u,
+        pair_v=pair_v,
+        weights=weights,
+        people_number=people_number
+    )
+
+
+def _build_symmetric_matrix(pair_u: np.ndarray,
+                            pair_v: np.ndarray,
+                            weights: np.ndarray,
+                            people_number: int
+                            ) -> spp.csr_matrix:
+    not_loop = pair_u != pair_v
+    rows = np.concatenate((pair_u, pair_v[not_loop]))
+    columns = np.concatenate((pair_v, pair_u[not_loop]))
+    data = np.concatenate((weights, weights[not_loop]))
+    return spp.csr_matrix(
+        (data, (rows, columns)),
+        shape=(people_number, people_number)
+    )
+
+
+def _index_undirected_pairs(person_x: np.ndarray,
+                            person_y: np.ndarray,
+                            people_number: int
+                            ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    pair_u = np.minimum(person_x, person_y).astype(np.int64)
+    pair_v = np.maximum(person_x, person_y).astype(np.int64)
+    pair_keys, pair_index = np.unique(
+        pair_u * people_number + pair_v, return_inverse=True
+    )
+    return pair_keys // people_number, pair_keys % people_number, \
+        pair_index.reshape(-1)
+
+
+def _aggregate_pair_weights(pair_index: np.ndarray,
+                            pairs_number: int,
+                            intensity: np.ndarray,
+                            time_stamp: np.ndarray,
+                            aggregation: str,
+                            contacts_count: Optional[np.ndarray] = None
+                            ) -> np.ndarray:
+    """contacts_count gives number of contacts represented by each record,
+    one if not given.
+    """
+    if aggregation == CLIPPED_SUM_AGGREGATION:
+        weights = np.bincount(
+            pair_index, weights=intensity, minlength=pairs_number
+        )
+        return np.minimum(weights, MAX_CLIPPED_WEIGHT)
+    if aggregation == COUNT_AGGREGATION:
+        return np.bincount(
+            pair_index, weights=contacts_count, minlength=pairs_number
+        ).astype(np.float64)
+    if aggregation == MAX_AGGREGATION:
+        weights = np.zeros(pairs_number, dtype=np.float64)
+        np.maximum.at(weights, pair_index, intensity)
+        return weights
+    if aggregation == LAST_TIME_STAMP_AGGREGATION:
+        weights = np.full(pairs_number, -1, dtype=np.int64)
+        np.maximum.at(weights, pair_index, time_stamp)
+        return weights.astype(np.float64)
+    raise SimulationError(
+        f"Unknown aggregation {aggregation}, choose one of {AGGREGATIONS}."
+    )
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import collections
+import hashlib
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, Future, Executor
+from dataclasses import dataclass, asdict, fields
+from typing import List, Optional, Iterator, Deque, Callable, Any, \
+    Iterable, Tuple
+
+import numpy as np
+
+from src.utils.fs_utils import detect_compression
+from src.virus_simulation.graph_building import CLIPPED_SUM_AGGREGATION, \
+    EDGE_WEIGHT_KEY, build_time_window_adjacency_matrix
+from src.virus_simulation.primitives import NOT_SICK
+from src.virus_simulation.snapshot_parsing import Snapshot
+import src.config as global_config
+import src.virus_simulation.config as simulation_config
+
+# bumped whenever content of cached graphs changes
+GRAPH_CACHE_VERSION = 2
+GRAPH_CACHE_EXTENSION = ".npz"
+HASH_CHUNK_SIZE = 1 << 20
+DEFAULT_MAX_CACHE_BYTES = 1 << 30
+SICKNESS_START_KEY = "sick_start"
+
+
+@dataclass(frozen=True)
+class GraphBuildParameters:
+    aggregation: str = CLIPPED_SUM_AGGREGATION
+    first_time_stamp: Optional[int] = None
+    last_time_stamp: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class GraphArrays:
+    """Symmetric weighted graph of contacts with sickness of each person
+    (indexed by person_id) - everything needed to train on a snapshot.
+    """
+    edge_u: np.ndarray
+    edge_v: np.ndarray
+    weights: np.ndarray
+    labels: np.ndarray
+    sick_start: np.ndarray
+
+    @property
+    def people_number(self) -> int:
+        return self.labels.shape[0]
+
+    @property
+    def edges_number(self) -> int:
+        return self.edge_u.shape[0]
+
+
+def load_snapshot(snapshot_path: str) -> Snapshot:
+    """Loads snapshot in any of formats written by simulation."""
+    if os.path.isdir(snapshot_path):
+        return Snapshot.initialize_binary(snapshot_path=snapshot_path)
+    if detect_compression(path=snapshot_path) is not None:
+        return Snapshot.initialize_streamed(snapshot_path=snapshot_path)
+    return Snapshot.initialize(snapshot_path=snapshot_path)
+
+
+def prepare_graph_arrays(snapshot: Snapshot,
+                         build_parameters: GraphBuildParameters
+                         ) -> GraphArrays:
+    adjacency_matrix = build_time_window_adjacency_matrix(
+        snapshot=snapshot,
+        first_time_stamp=build_parameters.first_time_stamp,
+        last_time_stamp=build_parameters.last_time_stamp,
+        aggregation=build_parameters.aggregation
+    ).tocoo()
+    snapshot_arrays = snapshot.arrays
+    labels = np.zeros(snapshot_arrays.people_number, dtype=np.int64)
+    labels[snapshot_arrays.person_id] = snapshot_arrays.sick
+    sick_start = np.full(snapshot_arrays.people_number, NOT_SICK, dtype=np.int64)
+    sick_start[snapshot_arrays.person_id] = snapshot_arrays.sick_start
+    return GraphArrays(
+        edge_u=adjacency_matrix.row.astype(np.int64),
+        edge_v=adjacency_matrix.col.astype(np.int64),
+        weights=adjacency_matrix.data.astype(np.float32),
+        labels=labels,
+        sick_start=sick_start
+    )
+
+
+def convert_graph_arrays_to_dgl(graph_arrays: GraphArrays) -> "dgl.DGLGraph":
+    import dgl
+    import torch
+
+    graph = dgl.DGLGraph()
+    graph.add_nodes(graph_arrays.people_number)
+    graph.add_edges(
+        torch.from_numpy(graph_arrays.edge_u),
+        torch.from_numpy(graph_arrays.edge_v)
+    )
+    graph.edata[EDGE_WEIGHT_KEY] = torch.from_numpy(graph_arrays.weights)
+    graph.ndata[simulation_config.SICKNESS_STATUS_KEY] = \
+        torch.from_numpy(graph_arrays.labels)
+    graph.ndata[SICKNESS_START_KEY] = torch.from_numpy(graph_arrays.sick_start)
+    return graph
+
+
+def calculate_snapshot_hash(snapshot_path: str) -> str:
+    """Hashes content of snapshot file (or of all files of binary snapshot)."""
+    content_hash = hashlib.sha256()
+    if os.path.isdir(snapshot_path):
+        paths = [
+            os.path.join(snapshot_path, file_name)
+            for file_name in sorted(os.listdir(snapshot_path))
+        ]
+    else:
+        paths = [snapshot_path]
+    for path in paths:
+        content_hash.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+class GraphCache:
+    """On-disk cache of graph arrays keyed by content hash of snapshot and
+    build parameters. Least recently used entries are evicted once cache
+    exceeds max_bytes. Entries are written under temporary names and
+    renamed, so cache can be shared by concurrent loaders.
+    """
+
+    def __init__(self,
+                 cache_dir: str = global_config.GRAPH_CACHE_PATH,
+                 max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        self.__cache_dir = cache_dir
+        self.__max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def cache_dir(self) -> str:
+        return self.__cache_dir
+
+    @staticmethod
+    def get_key(snapshot_hash: str,
+                build_parameters: GraphBuildParameters
+                ) -> str:
+        key_content = json.dumps(
+            [GRAPH_CACHE_VERSION, snapshot_hash, asdict(build_parameters)],
+            sort_keys=True
+        )
+        return hashlib.sha256(key_content.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[GraphArrays]:
+        entry_path = self.__get_entry_path(key=key)
+        try:
+            with np.load(entry_path, allow_pickle=False) as entry:
+                graph_arrays = GraphArrays(**{
+                    f.name: entry[f.name] for f in fields(GraphArrays)
+                })
+            # access time is not reliable (noatime mounts), so entries are
+            # touched to keep LRU order
+            os.utime(entry_path)
+        except (KeyError, ValueError, OSError):
+            return None
+        return graph_arrays
+
+    def put(self, key: str, graph_arrays: GraphArrays) -> None:
+        entry_path = self.__get_entry_path(key=key)
+        temporary_path = f"{entry_path}.{os.getpid()}.tmp{GRAPH_CACHE_EXTENSION}"
+        np.savez(temporary_path, **asdict(graph_arrays))
+        os.replace(temporary_path, entry_path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for file_name in os.listdir(self.__cache_dir):
+            if not file_name.endswith(GRAPH_CACHE_EXTENSION) or \
+                    ".tmp" in file_name:
+                continue
+            try:
+                entry_stat = os.stat(os.path.join(self.__cache_dir, file_name))
+            except FileNotFoundError:
+                continue
+            entries.append(
+                (entry_stat.st_mtime, entry_stat.st_size, file_name)
+            )
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, file_name in sorted(entries):
+            if total_bytes <= self.__max_bytes:
+                return
+            try:
+                os.remove(os.path.join(self.__cache_dir, file_name))
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def __get_entry_path(self, key: str) -> str:
+        return os.path.join(self.__cache_dir, f"{key}{GRAPH_CACHE_EXTENSION}")
+
+
+class SnapshotGraphDataset:
+    """Graphs of many snapshots, each preprocessed once and then served from
+    cache (if given).
+    """
+
+    def __init__(self,
+                 snapshot_paths: List[str],
+                 build_parameters: Optional[GraphBuildParameters] = None,
+                 cache: Optional[GraphCache] = None):
+        self.__snapshot_paths = list(snapshot_paths)
+        self.__build_parameters = build_parameters or GraphBuildParameters()
+        self.__cache = cache
+
+    def __len__(self) -> int:
+        return len(self.__snapshot_paths)
+
+    def __getitem__(self, index: int) -> GraphArrays:
+        snapshot_path = self.__snapshot_paths[index]
+        if self.__cache is None:
+            return self.__prepare(snapshot_path=snapshot_path)
+        key = GraphCache.get_key(
+            snapshot_hash=calculate_snapshot_hash(snapshot_path=snapshot_path),
+            build_parameters=self.__build_parameters
+        )
+        graph_arrays = self.__cache.get(key=key)
+        if graph_arrays is None:
+            graph_arrays = self.__prepare(snapshot_path=snapshot_path)
+            self.__cache.put(key=key, graph_arrays=graph_arrays)
+        return graph_arrays
+
+    def __prepare(self, snapshot_path: str) -> GraphArrays:
+        return prepare_graph_arrays(
+            snapshot=load_snapshot(snapshot_path=snapshot_path),
+            build_parameters=self.__build_parameters
+        )
+
+
+class PrefetchingGraphLoader:
+    """Iterates over batches of dataset graphs loaded by worker processes,
+    keeping up to prefetch_batches (by default twice number of workers)
+    batches in flight ahead of consumer.
+    """
+
+    def __init__(self,
+                 dataset: SnapshotGraphDataset,
+                 batch_size: int = 1,
+                 workers_number: int = 2,
+                 prefetch_batches: Optional[int] = None,
+                 shuffle: bool = False,
+                 random_seed: Optional[int] = None):
+        self.__dataset = dataset
+        self.__batch_size = batch_size
+        self.__workers_number = workers_number
+        self.__prefetch_batches = max(prefetch_batches or 2 * workers_number, 1)
+        self.__shuffle = shuffle
+        self.__random_generator = random.Random(random_seed)
+
+    def __len__(self) -> int:
+        return -(-len(self.__dataset) // self.__batch_size)
+
+    def __iter__(self) -> Iterator[List[GraphArrays]]:
+        indices = list(range(len(self.__dataset)))
+        if self.__shuffle:
+            self.__random_generator.shuffle(indices)
+        batches = [
+            indices[start:start + self.__batch_size]
+            for start in range(0, len(indices), self.__batch_size)
+        ]
+        with ProcessPoolExecutor(max_workers=self.__workers_number) as executor:
+            yield from iterate_prefetched(
+                executor=executor,
+                function=_load_batch,
+                tasks_arguments=((self.__dataset, b) for b in batches),
+                prefetch_tasks=self.__prefetch_batches
+            )
+
+
+def iterate_prefetched(executor: Executor,
+                       function: Callable[..., Any],
+                       tasks_arguments: Iterable[Tuple[Any, ...]],
+                       prefetch_tasks: int
+                       ) -> Iterator[Any]:
+    """Yields results of tasks in submission order, keeping up to
+    prefetch_tasks of them submitted to executor ahead of consumer.
+    """
+    tasks_arguments = iter(tasks_arguments)
+    pending_tasks: Deque[Future] = collections.deque()
+    try:
+        while True:
+            while len(pending_tasks) < prefetch_tasks:
+                arguments = next(tasks_arguments, None)
+                if arguments is None:
+                    break
+                pending_tasks.append(executor.submit(function, *arguments))
+            if len(pending_tasks) == 0:
+                return
+            yield pending_tasks.popleft().result()
+    finally:
+        # consumer may stop early, tasks it will not take are not run
+        for pending_task in pending_tasks:
+            pending_task.cancel()
+
+
+def _load_batch(dataset: SnapshotGraphDataset,
+                batch_indices: List[int]
+                ) -> List[GraphArrays]:
+    return [dataset[index] for index in batch_indices]
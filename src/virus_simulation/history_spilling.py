@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+from typing import Dict
+
+import numpy as np
+
+from src.virus_simulation.binary_snapshots import PEOPLE_ID_DTYPE, \
+    INTENSITY_DTYPE, TIME_STAMP_DTYPE
+from src.virus_simulation.contact_index import ContactsSlice
+from src.virus_simulation.trace_store import TraceStore
+
+SPILLED_COLUMNS_DTYPES = {
+    "person_x": PEOPLE_ID_DTYPE,
+    "person_y": PEOPLE_ID_DTYPE,
+    "intensity": INTENSITY_DTYPE,
+    "time_stamp": TIME_STAMP_DTYPE
+}
+SPILLED_COLUMN_EXTENSION = ".bin"
+SPILLED_TRACES_FILE_NAME = "traces.bin"
+# rough size of Contact object together with its share of people snapshots
+# it keeps alive
+CONTACT_OBJECT_BYTES = 320
+
+
+class ContactsSpill:
+    """Contacts of past steps (in time order) appended to raw column files,
+    read back as memory-mapped views, so that they do not take RAM.
+    """
+
+    @classmethod
+    def initialize(cls, spill_dir: str) -> ContactsSpill:
+        os.makedirs(spill_dir, exist_ok=True)
+        column_paths = {
+            name: os.path.join(spill_dir, f"{name}{SPILLED_COLUMN_EXTENSION}")
+            for name in SPILLED_COLUMNS_DTYPES
+        }
+        for column_path in column_paths.values():
+            open(column_path, "wb").close()
+        return cls(column_paths=column_paths)
+
+    def __init__(self, column_paths: Dict[str, str]):
+        self.__column_paths = column_paths
+        self.__contacts_number = 0
+
+    @property
+    def contacts_number(self) -> int:
+        return self.__contacts_number
+
+    def append(self,
+               person_x: np.ndarray,
+               person_y: np.ndarray,
+               intensity: np.ndarray,
+               time_stamp: np.ndarray
+               ) -> None:
+        columns = {
+            "person_x": person_x,
+            "person_y": person_y,
+            "intensity": intensity,
+            "time_stamp": time_stamp
+        }
+        for name, column in columns.items():
+            with open(self.__column_paths[name], "ab") as column_file:
+                column.astype(SPILLED_COLUMNS_DTYPES[name], copy=False).tofile(
+                    column_file
+                )
+        self.__contacts_number += person_x.shape[0]
+
+    def get_contacts(self, first_time_stamp: int = 0) -> ContactsSlice:
+        """Read-only views of spilled contacts with time stamps not lower
+        than given one.
+        """
+        columns = {
+            name: self.__load_column(name=name)
+            for name in SPILLED_COLUMNS_DTYPES
+        }
+        first_contact = int(
+            np.searchsorted(columns["time_stamp"], first_time_stamp)
+        )
+        return ContactsSlice(**{
+            name: column[first_contact:] for name, column in columns.items()
+        })
+
+    def __load_column(self, name: str) -> np.ndarray:
+        dtype = SPILLED_COLUMNS_DTYPES[name]
+        # empty files cannot be memory-mapped
+        if self.__contacts_number == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(
+            self.__column_paths[name],
+            dtype=dtype,
+            mode="r",
+            shape=(self.__contacts_number,)
+        )
+
+
+class MemoryBudget:
+    """Bounds RAM taken by history of simulation (contacts and traces). Once
+    exceeded, traces are moved to memory-mapped file and then contacts
+    recorded so far are appended to ContactsSpill.
+    """
+
+    def __init__(self, max_bytes: int, spill_dir: str):
+        self.__max_bytes = max_bytes
+        self.__spill_dir = spill_dir
+        self.__contacts_spill = ContactsSpill.initialize(spill_dir=spill_dir)
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def contacts_spill(self) -> ContactsSpill:
+        return self.__contacts_spill
+
+    def enforce(self, trace_store: TraceStore, contacts_bytes: int) -> bool:
+        """Spills traces if history exceeds budget and tells whether contacts
+        have to be spilled as well.
+        """
+        if trace_store.memory_bytes + contacts_bytes <= self.__max_bytes:
+            return False
+        trace_store.spill(
+            backing_path=os.path.join(
+                self.__spill_dir, SPILLED_TRACES_FILE_NAME
+            )
+        )
+        return trace_store.memory_bytes + contacts_bytes > self.__max_bytes
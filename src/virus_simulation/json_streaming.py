@@ -0,0 +1,380 @@
+import json
+from typing import Iterable, Iterator, Dict, Any, Optional, TextIO, Tuple, \
+    Collection
+
+import numpy as np
+
+from src.utils.fs_utils import open_text_file
+from src.virus_simulation.binary_snapshots import SnapshotArrays, \
+    PEOPLE_ID_DTYPE, SICKNESS_START_DTYPE, INTENSITY_DTYPE, TIME_STAMP_DTYPE, \
+    TRACE_DTYPE, prepare_aggregated_contacts_arrays, \
+    prepare_encoded_traces_arrays, convert_encoded_traces_json, \
+    prepare_group_contacts_arrays, convert_group_contacts_json
+from src.virus_simulation.contacts_aggregation import AggregatedContacts, \
+    COUNT_DTYPE
+from src.virus_simulation.conversion import iterate_vertices, \
+    iterate_state_edges, iterate_people_traces, prepare_aggregated_edges, \
+    prepare_encoded_people_traces, iterate_group_edges
+from src.virus_simulation.errors import SnapshotParsingError
+from src.virus_simulation.primitives import SimulationState, NOT_SICK
+from src.virus_simulation.trace_encoding import encode_people_traces
+import src.virus_simulation.config as simulation_config
+
+CHUNK_RECORDS = 1024
+COMPACT_SEPARATORS = (",", ":")
+
+VALUE_SECTION = "value"
+ARRAY_SECTION = "array"
+OBJECT_SECTION = "object"
+SECTION_BRACKETS = {ARRAY_SECTION: ("[", "]"), OBJECT_SECTION: ("{", "}")}
+
+StreamedSection = Tuple[str, Any]
+
+
+def stream_simulation_state_to_json(simulation_state: SimulationState,
+                                    target_path: str,
+                                    compression: Optional[str] = None,
+                                    encode_traces: bool = False
+                                    ) -> Optional[Dict[str, int]]:
+    """Writes regular JSON document laid out one record per line:
+    {
+    "map_dimensions":[100,100],
+    "people":[
+    {"person_id":0,"person_sick":false,"sickness_start":null},
+    ...
+    ],
+    "people_traces":{
+    "0":[[1,2],[2,3]],
+    ...
+    }
+    }
+    so that it can be parsed with json.load() as well as record by record.
+    Records are generated and written in chunks, never as a whole document.
+    Returns byte offsets of sections of uncompressed document (compressed
+    ones cannot be sought).
+    """
+    sections = [
+        (
+            simulation_config.MAP_DIMENSIONS_KEY,
+            VALUE_SECTION,
+            (simulation_state.map.max_x, simulation_state.map.max_y)
+        ),
+        (
+            simulation_config.GRAPH_VERTICES_KEY,
+            ARRAY_SECTION,
+            iterate_vertices(simulated_people=simulation_state.people)
+        ),
+        (
+            simulation_config.GRAPH_EDGES_KEY,
+            ARRAY_SECTION,
+            iterate_state_edges(
+                simulated_meetings=simulation_state.meetings,
+                spilled_meetings=simulation_state.spilled_meetings
+            )
+        )
+    ]
+    if encode_traces:
+        sections.append((
+            simulation_config.ENCODED_PEOPLE_TRACES_KEY,
+            VALUE_SECTION,
+            prepare_encoded_people_traces(
+                encoded_traces=encode_people_traces(
+                    traces=simulation_state.people_traces
+                )
+            )
+        ))
+    else:
+        sections.append((
+            simulation_config.PEOPLE_TRACES_KEY,
+            OBJECT_SECTION,
+            iterate_people_traces(people_traces=simulation_state.people_traces)
+        ))
+    if simulation_state.aggregated_contacts is not None:
+        sections.append((
+            simulation_config.AGGREGATED_EDGES_KEY,
+            ARRAY_SECTION,
+            prepare_aggregated_edges(
+                aggregated_contacts=simulation_state.aggregated_contacts
+            )
+        ))
+    if simulation_state.group_contacts is not None:
+        sections.append((
+            simulation_config.GROUP_EDGES_KEY,
+            ARRAY_SECTION,
+            iterate_group_edges(group_contacts=simulation_state.group_contacts)
+        ))
+    section_offsets = {}
+    with open_text_file(target_path, "w", compression=compression) as f:
+        f.write("{\n")
+        for index, (key, section_type, value) in enumerate(sections):
+            if compression is None:
+                section_offsets[key] = f.tell()
+            _write_section(
+                target_file=f,
+                key=key,
+                section_type=section_type,
+                value=value,
+                last=index == len(sections) - 1
+            )
+        f.write("}\n")
+    return section_offsets if compression is None else None
+
+
+def iterate_streamed_sections(snapshot_path: str) -> Iterator[StreamedSection]:
+    """Yields (key, value) of top-level entries of streamed snapshot. Values
+    of people, contacts and traces are iterators over records, which must
+    be consumed before advancing to next section.
+    """
+    with open_text_file(snapshot_path) as f:
+        if f.readline().strip() != "{":
+            raise SnapshotParsingError(
+                f"{snapshot_path} is not a streamed JSON snapshot."
+            )
+        yield from _iterate_sections(
+            source_file=f,
+            snapshot_path=snapshot_path
+        )
+
+
+def iterate_streamed_contacts(snapshot_path: str
+                              ) -> Iterator[Dict[str, Any]]:
+    for key, value in iterate_streamed_sections(snapshot_path=snapshot_path):
+        if key == simulation_config.GRAPH_EDGES_KEY:
+            yield from value
+            return
+
+
+def load_streamed_snapshot_arrays(snapshot_path: str) -> SnapshotArrays:
+    arrays: Dict[str, np.ndarray] = {}
+    for key, value in iterate_streamed_sections(snapshot_path=snapshot_path):
+        _collect_section_arrays(key=key, value=value, arrays=arrays)
+    return SnapshotArrays(**arrays)
+
+
+def load_streamed_sections_arrays(snapshot_path: str,
+                                  keys: Collection[str],
+                                  section_offsets: Optional[Dict[str, int]]
+                                  = None
+                                  ) -> Dict[str, np.ndarray]:
+    """Arrays (named as fields of SnapshotArrays) of given sections only.
+    Sections are sought directly when their offsets are known, otherwise
+    document is read until all of them are found. Traces can only be read
+    together with people.
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    if section_offsets is None or any(k not in section_offsets for k in keys):
+        missing_keys = set(keys)
+        for key, value in iterate_streamed_sections(snapshot_path=snapshot_path):
+            if key in missing_keys:
+                _collect_section_arrays(key=key, value=value, arrays=arrays)
+                missing_keys.remove(key)
+            if len(missing_keys) == 0:
+                break
+        return arrays
+    for key in keys:
+        with open_text_file(snapshot_path) as f:
+            f.seek(section_offsets[key])
+            section_key, value = next(_iterate_sections(
+                source_file=f,
+                snapshot_path=snapshot_path
+            ))
+            if section_key != key:
+                raise SnapshotParsingError(
+                    f"{snapshot_path} has no {key} section at given offset."
+                )
+            _collect_section_arrays(key=key, value=value, arrays=arrays)
+    return arrays
+
+
+def _iterate_sections(source_file: TextIO,
+                      snapshot_path: str
+                      ) -> Iterator[StreamedSection]:
+    for line in source_file:
+        line = line.rstrip("\n")
+        if line == "}":
+            return
+        key, value = line.split(":", 1)
+        key = json.loads(key)
+        if value in ("[", "{"):
+            records = _iterate_section_records(
+                source_file=source_file,
+                object_members=value == "{"
+            )
+            yield key, records
+            _exhaust(iterator=records)
+        else:
+            yield key, json.loads(value.rstrip(","))
+    raise SnapshotParsingError(f"{snapshot_path} is truncated.")
+
+
+def _collect_section_arrays(key: str,
+                            value: Any,
+                            arrays: Dict[str, np.ndarray]
+                            ) -> None:
+    if key == simulation_config.MAP_DIMENSIONS_KEY:
+        arrays["map_dimensions"] = np.array(value, dtype=np.int64)
+    elif key == simulation_config.GRAPH_VERTICES_KEY:
+        arrays.update(_collect_people_arrays(people=value))
+    elif key == simulation_config.GRAPH_EDGES_KEY:
+        arrays.update(_collect_contacts_arrays(contacts=value))
+    elif key == simulation_config.PEOPLE_TRACES_KEY:
+        arrays["traces"] = _collect_traces(
+            traces=value,
+            person_id=arrays["person_id"]
+        )
+    elif key == simulation_config.ENCODED_PEOPLE_TRACES_KEY:
+        arrays.update(prepare_encoded_traces_arrays(
+            encoded_traces=convert_encoded_traces_json(
+                encoded_traces=value
+            )
+        ))
+    elif key == simulation_config.AGGREGATED_EDGES_KEY:
+        arrays.update(prepare_aggregated_contacts_arrays(
+            aggregated_contacts=_collect_aggregated_contacts(
+                aggregated_contacts=value
+            )
+        ))
+    elif key == simulation_config.GROUP_EDGES_KEY:
+        arrays.update(prepare_group_contacts_arrays(
+            group_contacts=convert_group_contacts_json(
+                group_contacts=list(value)
+            )
+        ))
+
+
+def _write_section(target_file: TextIO,
+                   key: str,
+                   section_type: str,
+                   value: Any,
+                   last: bool
+                   ) -> None:
+    section_end = "" if last else ","
+    target_file.write(f"{_dump_compact(key)}:")
+    if section_type == VALUE_SECTION:
+        target_file.write(f"{_dump_compact(value)}{section_end}\n")
+        return
+    opening, closing = SECTION_BRACKETS[section_type]
+    target_file.write(f"{opening}\n")
+    if section_type == OBJECT_SECTION:
+        value = (
+            f"{_dump_compact(str(member_key))}:{_dump_compact(member_value)}"
+            for member_key, member_value in value
+        )
+    else:
+        value = (_dump_compact(record) for record in value)
+    _write_records(target_file=target_file, records=value)
+    target_file.write(f"{closing}{section_end}\n")
+
+
+def _write_records(target_file: TextIO, records: Iterable[str]) -> None:
+    chunk = []
+    for record in records:
+        if len(chunk) == CHUNK_RECORDS:
+            target_file.write(",\n".join(chunk))
+            target_file.write(",\n")
+            chunk = []
+        chunk.append(record)
+    if len(chunk) > 0:
+        target_file.write(",\n".join(chunk))
+        target_file.write("\n")
+
+
+def _iterate_section_records(source_file: TextIO,
+                             object_members: bool
+                             ) -> Iterator[Any]:
+    closing = "}" if object_members else "]"
+    for line in source_file:
+        line = line.rstrip("\n").rstrip(",")
+        if line == closing:
+            return
+        if object_members:
+            yield next(iter(json.loads(f"{{{line}}}").items()))
+        else:
+            yield json.loads(line)
+    raise SnapshotParsingError("Streamed snapshot section is not closed.")
+
+
+def _exhaust(iterator: Iterator[Any]) -> None:
+    for _ in iterator:
+        pass
+
+
+def _dump_compact(value: Any) -> str:
+    return json.dumps(value, separators=COMPACT_SEPARATORS)
+
+
+def _collect_people_arrays(people: Iterator[Dict[str, Any]]
+                           ) -> Dict[str, np.ndarray]:
+    person_id, sick, sick_start = [], [], []
+    for person in people:
+        person_id.append(person[simulation_config.PERSON_ID_KEY])
+        sick.append(person[simulation_config.SICKNESS_STATUS_KEY])
+        person_sick_start = person[simulation_config.SICKNESS_START_KEY]
+        sick_start.append(
+            NOT_SICK if person_sick_start is None else person_sick_start
+        )
+    return {
+        "person_id": np.array(person_id, dtype=PEOPLE_ID_DTYPE),
+        "sick": np.array(sick, dtype=np.bool_),
+        "sick_start": np.array(sick_start, dtype=SICKNESS_START_DTYPE)
+    }
+
+
+def _collect_contacts_arrays(contacts: Iterator[Dict[str, Any]]
+                             ) -> Dict[str, np.ndarray]:
+    person_x, person_y, intensity, time_stamp = [], [], [], []
+    for contact in contacts:
+        contact_x, contact_y = contact[simulation_config.CONTACT_PAIR_KEY]
+        person_x.append(contact_x)
+        person_y.append(contact_y)
+        intensity.append(contact[simulation_config.CONTACT_DURATION_KEY])
+        time_stamp.append(contact[simulation_config.CONTACT_TIME_STAMP_KEY])
+    return {
+        "contact_person_x": np.array(person_x, dtype=PEOPLE_ID_DTYPE),
+        "contact_person_y": np.array(person_y, dtype=PEOPLE_ID_DTYPE),
+        "contact_intensity": np.array(intensity, dtype=INTENSITY_DTYPE),
+        "contact_time_stamp": np.array(time_stamp, dtype=TIME_STAMP_DTYPE)
+    }
+
+
+def _collect_traces(traces: Iterator[Tuple[str, list]],
+                    person_id: np.ndarray
+                    ) -> np.ndarray:
+    people_traces = {
+        int(trace_person_id): np.array(trace, dtype=TRACE_DTYPE).reshape(-1, 2)
+        for trace_person_id, trace in traces
+    }
+    if len(people_traces) == 0:
+        return np.empty((0, person_id.shape[0], 2), dtype=TRACE_DTYPE)
+    steps = {trace.shape[0] for trace in people_traces.values()}
+    if len(steps) != 1:
+        raise SnapshotParsingError("People traces differ in length.")
+    return np.stack(
+        [people_traces[p] for p in person_id.tolist()], axis=1
+    )
+
+
+def _collect_aggregated_contacts(aggregated_contacts: Iterator[Dict[str, Any]]
+                                 ) -> AggregatedContacts:
+    person_x, person_y, intensity, contacts_count = [], [], [], []
+    first_time_stamp, last_time_stamp = [], []
+    for contact in aggregated_contacts:
+        contact_x, contact_y = contact[simulation_config.CONTACT_PAIR_KEY]
+        person_x.append(contact_x)
+        person_y.append(contact_y)
+        intensity.append(contact[simulation_config.CONTACT_DURATION_KEY])
+        contacts_count.append(contact[simulation_config.CONTACTS_COUNT_KEY])
+        first_time_stamp.append(
+            contact[simulation_config.FIRST_CONTACT_TIME_STAMP_KEY]
+        )
+        last_time_stamp.append(
+            contact[simulation_config.LAST_CONTACT_TIME_STAMP_KEY]
+        )
+    return AggregatedContacts(
+        person_x=np.array(person_x, dtype=PEOPLE_ID_DTYPE),
+        person_y=np.array(person_y, dtype=PEOPLE_ID_DTYPE),
+        intensity=np.array(intensity, dtype=INTENSITY_DTYPE),
+        contacts_count=np.array(contacts_count, dtype=COUNT_DTYPE),
+        first_time_stamp=np.array(first_time_stamp, dtype=TIME_STAMP_DTYPE),
+        last_time_stamp=np.array(last_time_stamp, dtype=TIME_STAMP_DTYPE)
+    )
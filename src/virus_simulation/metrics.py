@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Union, ContextManager, List
+
+from src.utils.fs_utils import create_parent_dir
+from src.utils.grouping import Grouping
+from src.virus_simulation.crowding import CrowdingPolicy, \
+    EXACT_CROWDING_POLICY
+
+TIME_STAMP_METRIC = "time_stamp"
+MOVEMENT_PHASE = "movement"
+OCCUPANCY_PHASE = "occupancy"
+MEETINGS_PHASE = "meetings"
+HEALTH_UPDATE_PHASE = "health_update"
+SNAPSHOT_PHASE = "snapshot"
+CHECKPOINT_PHASE = "checkpoint"
+PHASES = [
+    MOVEMENT_PHASE,
+    OCCUPANCY_PHASE,
+    MEETINGS_PHASE,
+    HEALTH_UPDATE_PHASE,
+    SNAPSHOT_PHASE,
+    CHECKPOINT_PHASE
+]
+CONTACTS_GENERATED_METRIC = "contacts_generated"
+OCCUPIED_CELLS_METRIC = "occupied_cells"
+LARGEST_GROUP_SIZE_METRIC = "largest_group_size"
+NEW_INFECTIONS_METRIC = "new_infections"
+MEAN_GROUP_SIZE_METRIC = "mean_group_size"
+HOT_CELLS_METRIC = "hot_cells"
+HOT_CELL_PEOPLE_METRIC = "hot_cell_people"
+GROUP_CONTACTS_METRIC = "group_contacts"
+COUNT_METRICS = [
+    CONTACTS_GENERATED_METRIC,
+    OCCUPIED_CELLS_METRIC,
+    LARGEST_GROUP_SIZE_METRIC,
+    NEW_INFECTIONS_METRIC,
+    MEAN_GROUP_SIZE_METRIC,
+    HOT_CELLS_METRIC,
+    HOT_CELL_PEOPLE_METRIC,
+    GROUP_CONTACTS_METRIC
+]
+CSV_EXTENSION = ".csv"
+
+MetricValue = Union[int, float]
+
+
+def get_phase_time_metric(phase: str) -> str:
+    return f"{phase}_seconds"
+
+
+def get_phase_memory_metric(phase: str) -> str:
+    return f"{phase}_memory_delta_bytes"
+
+
+class MetricsRecorder:
+    """No-op recorder used when instrumentation is disabled. Subclasses
+    collect metrics of a simulation step between consecutive start_step()
+    calls.
+    """
+
+    enabled = False
+
+    def start_step(self, time_stamp: int) -> None:
+        pass
+
+    def measure(self, phase: str) -> ContextManager[None]:
+        return _NO_OP_MEASUREMENT
+
+    def record(self, metric: str, value: MetricValue) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _NoOpMeasurement:
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *args) -> None:
+        return None
+
+
+_NO_OP_MEASUREMENT = _NoOpMeasurement()
+DISABLED_METRICS_RECORDER = MetricsRecorder()
+
+
+class StreamMetricsRecorder(MetricsRecorder):
+    """Writes one record per simulation step into JSONL file (or CSV file
+    if target path ends with .csv).
+    """
+
+    enabled = True
+
+    def __init__(self, target_path: str, trace_memory: bool = False):
+        create_parent_dir(path=target_path)
+        self.__target_file = open(target_path, "w", newline="")
+        self.__csv_writer: Optional[csv.DictWriter] = None
+        if os.path.splitext(target_path)[1] == CSV_EXTENSION:
+            self.__csv_writer = csv.DictWriter(
+                self.__target_file,
+                fieldnames=self.__get_csv_columns(trace_memory=trace_memory),
+                restval=""
+            )
+            self.__csv_writer.writeheader()
+        self.__trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.__current_step: Optional[Dict[str, MetricValue]] = None
+
+    def start_step(self, time_stamp: int) -> None:
+        self.__flush_step()
+        self.__current_step = {TIME_STAMP_METRIC: time_stamp}
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        memory_before = self.__get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield None
+        finally:
+            self.record(
+                metric=get_phase_time_metric(phase=phase),
+                value=time.perf_counter() - start
+            )
+            if self.__trace_memory:
+                self.record(
+                    metric=get_phase_memory_metric(phase=phase),
+                    value=self.__get_traced_memory() - memory_before
+                )
+
+    def record(self, metric: str, value: MetricValue) -> None:
+        if self.__current_step is None:
+            return
+        self.__current_step[metric] = \
+            self.__current_step.get(metric, 0) + value
+
+    def close(self) -> None:
+        self.__flush_step()
+        self.__target_file.close()
+
+    def __flush_step(self) -> None:
+        if self.__current_step is None:
+            return
+        if self.__csv_writer is not None:
+            self.__csv_writer.writerow(self.__current_step)
+        else:
+            self.__target_file.write(json.dumps(self.__current_step) + "\n")
+        self.__target_file.flush()
+        self.__current_step = None
+
+    def __get_traced_memory(self) -> int:
+        if not self.__trace_memory:
+            return 0
+        current_memory, _ = tracemalloc.get_traced_memory()
+        return current_memory
+
+    @staticmethod
+    def __get_csv_columns(trace_memory: bool) -> List[str]:
+        columns = [TIME_STAMP_METRIC]
+        columns.extend(get_phase_time_metric(phase=phase) for phase in PHASES)
+        if trace_memory:
+            columns.extend(
+                get_phase_memory_metric(phase=phase) for phase in PHASES
+            )
+        columns.extend(COUNT_METRICS)
+        return columns
+
+
+def record_occupancy_metrics(metrics_recorder: MetricsRecorder,
+                             occupancy: Grouping,
+                             crowding_policy: CrowdingPolicy
+                             = EXACT_CROWDING_POLICY
+                             ) -> None:
+    """Records group sizes of occupied cells, hot cells are the ones crowded
+    according to crowding_policy (whatever its mode).
+    """
+    metrics_recorder.record(
+        metric=OCCUPIED_CELLS_METRIC,
+        value=occupancy.groups_number
+    )
+    largest_group_size = 0
+    if occupancy.groups_number > 0:
+        largest_group_size = int(occupancy.group_sizes.max())
+    metrics_recorder.record(
+        metric=LARGEST_GROUP_SIZE_METRIC,
+        value=largest_group_size
+    )
+    mean_group_size = 0.0
+    if occupancy.groups_number > 0:
+        mean_group_size = float(occupancy.group_sizes.mean())
+    metrics_recorder.record(
+        metric=MEAN_GROUP_SIZE_METRIC,
+        value=mean_group_size
+    )
+    hot_cells = crowding_policy.get_hot_cells(occupancy=occupancy)
+    metrics_recorder.record(
+        metric=HOT_CELLS_METRIC,
+        value=int(hot_cells.sum())
+    )
+    metrics_recorder.record(
+        metric=HOT_CELL_PEOPLE_METRIC,
+        value=int(occupancy.group_sizes[hot_cells].sum())
+    )
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Iterator, Tuple
+
+import numpy as np
+import scipy.sparse as spp
+
+from src.virus_simulation.graph_dataset import GraphArrays, iterate_prefetched
+
+NODE_ID_DTYPE = np.int64
+
+# graph shared by all batches is sent to each sampling worker only once, when
+# loader starts its workers
+_WORKER_GRAPH: Optional[CSRGraph] = None
+
+
+@dataclass(frozen=True)
+class CSRGraph:
+    """Weighted adjacency in CSR layout - neighbours of i-th person are
+    indices[indptr[i]:indptr[i + 1]].
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    weights: np.ndarray
+
+    @classmethod
+    def from_graph_arrays(cls, graph_arrays: GraphArrays) -> CSRGraph:
+        adjacency_matrix = spp.csr_matrix(
+            (graph_arrays.weights, (graph_arrays.edge_u, graph_arrays.edge_v)),
+            shape=(graph_arrays.people_number, graph_arrays.people_number)
+        )
+        return cls(
+            indptr=adjacency_matrix.indptr.astype(NODE_ID_DTYPE),
+            indices=adjacency_matrix.indices.astype(NODE_ID_DTYPE),
+            weights=adjacency_matrix.data.astype(np.float32)
+        )
+
+    @property
+    def nodes_number(self) -> int:
+        return self.indptr.shape[0] - 1
+
+
+@dataclass(frozen=True)
+class Block:
+    """Bipartite subgraph of one layer. Destination nodes are placed at the
+    beginning of source nodes; edges are given by local indices.
+    """
+    src_nodes: np.ndarray
+    dst_nodes_number: int
+    edge_src: np.ndarray
+    edge_dst: np.ndarray
+    edge_weights: np.ndarray
+
+    @property
+    def dst_nodes(self) -> np.ndarray:
+        return self.src_nodes[:self.dst_nodes_number]
+
+    def to_adjacency_matrix(self) -> spp.csr_matrix:
+        """(dst_nodes, src_nodes) matrix to aggregate features of sources."""
+        return spp.csr_matrix(
+            (self.edge_weights, (self.edge_dst, self.edge_src)),
+            shape=(self.dst_nodes_number, self.src_nodes.shape[0])
+        )
+
+
+@dataclass(frozen=True)
+class MiniBatch:
+    """Seeds with their labels and blocks ordered from input layer (whose
+    source nodes are input_nodes) to output layer (whose destination nodes
+    are seeds).
+    """
+    seeds: np.ndarray
+    labels: np.ndarray
+    blocks: List[Block]
+
+    @property
+    def input_nodes(self) -> np.ndarray:
+        return self.blocks[0].src_nodes
+
+
+def sample_labelled_seeds(labels: np.ndarray,
+                          seeds_per_label: int,
+                          random_generator: np.random.Generator
+                          ) -> Tuple[np.ndarray, np.ndarray]:
+    """Draws (without replacement) up to seeds_per_label people of each label
+    - e.g. sick and healthy ones - in random order.
+    """
+    seeds = np.concatenate([
+        random_generator.permutation(np.flatnonzero(labels == label))[
+            :seeds_per_label
+        ] for label in np.unique(labels)
+    ]).astype(NODE_ID_DTYPE)
+    seeds = random_generator.permutation(seeds)
+    return seeds, labels[seeds]
+
+
+def sample_neighbours(graph: CSRGraph,
+                      nodes: np.ndarray,
+                      fanout: int,
+                      random_generator: np.random.Generator
+                      ) -> Tuple[np.ndarray, np.ndarray]:
+    """Draws (without replacement) up to fanout neighbours of each node.
+    Returns positions of edges in graph and index of node each belongs to.
+    """
+    degrees = graph.indptr[nodes + 1] - graph.indptr[nodes]
+    node_index = np.repeat(np.arange(nodes.shape[0]), degrees)
+    edges = np.arange(node_index.shape[0]) - \
+        np.repeat(np.cumsum(degrees) - degrees, degrees) + \
+        np.repeat(graph.indptr[nodes], degrees)
+    if fanout < 0 or np.all(degrees <= fanout):
+        return edges, node_index
+    # random rank of each edge within neighbourhood of its node
+    order = np.lexsort((random_generator.random(edges.shape[0]), node_index))
+    rank = np.arange(order.shape[0]) - \
+        np.repeat(np.cumsum(degrees) - degrees, degrees)
+    chosen = order[rank < fanout]
+    chosen.sort()
+    return edges[chosen], node_index[chosen]
+
+
+def sample_blocks(graph: CSRGraph,
+                  seeds: np.ndarray,
+                  fanouts: List[int],
+                  random_generator: np.random.Generator
+                  ) -> List[Block]:
+    """Samples fanouts[i] neighbours per node in i-th layer (counting from
+    input), negative fanout takes all neighbours.
+    """
+    blocks = []
+    dst_nodes = seeds.astype(NODE_ID_DTYPE)
+    for fanout in reversed(fanouts):
+        edges, edge_dst = sample_neighbours(
+            graph=graph,
+            nodes=dst_nodes,
+            fanout=fanout,
+            random_generator=random_generator
+        )
+        src_nodes, edge_src = _relabel_nodes(
+            dst_nodes=dst_nodes,
+            neighbours=graph.indices[edges]
+        )
+        blocks.append(Block(
+            src_nodes=src_nodes,
+            dst_nodes_number=dst_nodes.shape[0],
+            edge_src=edge_src,
+            edge_dst=edge_dst.astype(NODE_ID_DTYPE),
+            edge_weights=graph.weights[edges]
+        ))
+        dst_nodes = src_nodes
+    blocks.reverse()
+    return blocks
+
+
+class NeighbourSamplingLoader:
+    """Iterates over mini-batches of labelled seeds (seeds_per_label of each
+    label drawn every epoch, or all given seeds) with blocks of sampled
+    neighbourhoods, sampled by worker processes ahead of training loop.
+    Sampling of each batch is seeded separately, so batches do not depend
+    on number of workers. Workers are started by the first epoch and kept
+    for following ones until close().
+    """
+
+    def __init__(self,
+                 graph: CSRGraph,
+                 labels: np.ndarray,
+                 fanouts: List[int],
+                 batch_size: int,
+                 seeds_per_label: Optional[int] = None,
+                 seeds: Optional[np.ndarray] = None,
+                 workers_number: int = 2,
+                 prefetch_batches: Optional[int] = None,
+                 random_seed: Optional[int] = None):
+        self.__graph = graph
+        self.__labels = labels
+        self.__fanouts = list(fanouts)
+        self.__batch_size = batch_size
+        self.__seeds_per_label = seeds_per_label
+        self.__seeds = seeds
+        self.__workers_number = workers_number
+        self.__prefetch_batches = max(prefetch_batches or 2 * workers_number, 1)
+        self.__seed_sequence = np.random.SeedSequence(random_seed)
+        self.__executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> NeighbourSamplingLoader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    def __iter__(self) -> Iterator[MiniBatch]:
+        # every iteration (epoch) draws fresh seeds and neighbourhoods
+        epoch_seed = self.__seed_sequence.spawn(1)[0]
+        random_generator = np.random.default_rng(epoch_seed)
+        if self.__seeds_per_label is not None:
+            seeds, _ = sample_labelled_seeds(
+                labels=self.__labels,
+                seeds_per_label=self.__seeds_per_label,
+                random_generator=random_generator
+            )
+        elif self.__seeds is not None:
+            seeds = random_generator.permutation(self.__seeds)
+        else:
+            seeds = random_generator.permutation(self.__labels.shape[0])
+        batches = [
+            seeds[start:start + self.__batch_size]
+            for start in range(0, seeds.shape[0], self.__batch_size)
+        ]
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(
+                max_workers=self.__workers_number,
+                initializer=_initialize_worker,
+                initargs=(self.__graph,)
+            )
+        sampled_blocks = iterate_prefetched(
+            executor=self.__executor,
+            function=_sample_batch_blocks,
+            tasks_arguments=zip(
+                batches,
+                [self.__fanouts] * len(batches),
+                epoch_seed.spawn(len(batches))
+            ),
+            prefetch_tasks=self.__prefetch_batches
+        )
+        for batch_nodes, blocks in zip(batches, sampled_blocks):
+            yield MiniBatch(
+                seeds=batch_nodes,
+                labels=self.__labels[batch_nodes],
+                blocks=blocks
+            )
+
+
+def _relabel_nodes(dst_nodes: np.ndarray,
+                   neighbours: np.ndarray
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+    """Orders nodes by first appearance (so destination nodes come first) and
+    maps neighbours to their local indices.
+    """
+    nodes = np.concatenate((dst_nodes, neighbours))
+    unique_nodes, first_appearance, inverse = np.unique(
+        nodes, return_index=True, return_inverse=True
+    )
+    order = np.argsort(first_appearance, kind="stable")
+    local_index = np.empty_like(order)
+    local_index[order] = np.arange(order.shape[0])
+    return unique_nodes[order], \
+        local_index[inverse.reshape(-1)[dst_nodes.shape[0]:]]
+
+
+def _initialize_worker(graph: CSRGraph) -> None:
+    global _WORKER_GRAPH
+    _WORKER_GRAPH = graph
+
+
+def _sample_batch_blocks(seeds: np.ndarray,
+                         fanouts: List[int],
+                         batch_seed: np.random.SeedSequence
+                         ) -> List[Block]:
+    return sample_blocks(
+        graph=_WORKER_GRAPH,
+        seeds=seeds,
+        fanouts=fanouts,
+        random_generator=np.random.default_rng(batch_seed)
+    )
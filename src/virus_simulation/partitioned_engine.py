@@ -0,0 +1,514 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import List, Optional, Tuple, Any
+
+import numpy as np
+
+from src.utils.grouping import group_by_keys, linearize_positions, \
+    generate_pairs_within_groups
+from src.virus_simulation.contacts_aggregation import ContactsAggregator
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.metrics import MetricsRecorder, \
+    DISABLED_METRICS_RECORDER, MOVEMENT_PHASE, MEETINGS_PHASE, \
+    CONTACTS_GENERATED_METRIC, NEW_INFECTIONS_METRIC
+from src.virus_simulation.primitives import Map, Person, Position2D, Contact, \
+    SimulationState, SimulationStateDelta, NOT_SICK
+from src.virus_simulation.trace_replay import DIRECTIONS
+from src.virus_simulation.trace_store import TraceStore
+from src.virus_simulation.transmission import calculate_infection_risk
+import src.config as global_config
+
+
+logging.getLogger().setLevel(global_config.LOGGING_LEVEL)
+
+MOVE_COMMAND = "move"
+MEET_COMMAND = "meet"
+STOP_COMMAND = "stop"
+
+WorkerMeetings = Tuple[np.ndarray, np.ndarray, np.ndarray, int]
+
+
+class SharedPeople:
+    """Positions, health status and owning tile of every person kept in
+    shared memory, so that workers exchange people crossing tile borders
+    just by taking over their entries (and ids).
+    """
+
+    def __init__(self, people_number: int):
+        self.positions_buffer = multiprocessing.RawArray("q", 2 * people_number)
+        self.sick_buffer = multiprocessing.RawArray("b", people_number)
+        self.sick_start_buffer = multiprocessing.RawArray("q", people_number)
+        self.owner_buffer = multiprocessing.RawArray("q", people_number)
+        self.people_number = people_number
+
+    @property
+    def positions(self) -> np.ndarray:
+        return np.frombuffer(
+            self.positions_buffer, dtype=np.int64
+        ).reshape(self.people_number, 2)
+
+    @property
+    def sick(self) -> np.ndarray:
+        return np.frombuffer(self.sick_buffer, dtype=np.bool_)
+
+    @property
+    def sick_start(self) -> np.ndarray:
+        return np.frombuffer(self.sick_start_buffer, dtype=np.int64)
+
+    @property
+    def owner(self) -> np.ndarray:
+        return np.frombuffer(self.owner_buffer, dtype=np.int64)
+
+
+class PartitionedSimulationEngine:
+    """Follows rules of VectorizedSimulationEngine, but splits map into
+    vertical tiles owned by worker processes. Each worker moves people of its
+    tile and generates meetings and transmissions within it (cells never
+    span tiles). Workers keep ids of people they own, so that only people
+    crossing tile borders are exchanged between steps. Results depend on
+    random_seed and number of workers.
+    """
+
+    @classmethod
+    def initialize(cls,
+                   map_size: int,
+                   max_person_step_size: int,
+                   people_number: int,
+                   initial_seek_people: int,
+                   transmission_probability: float,
+                   random_seed: Optional[int] = None,
+                   transmission_only: bool = False,
+                   aggregate_contacts: bool = False,
+                   metrics_recorder: Optional[MetricsRecorder] = None,
+                   trace_steps_capacity: Optional[int] = None,
+                   traces_path: Optional[str] = None,
+                   workers_number: int = 2
+                   ) -> PartitionedSimulationEngine:
+        simulation_map = Map(
+            max_x=map_size,
+            max_y=map_size
+        )
+        seed_sequence = np.random.SeedSequence(random_seed)
+        random_generator = np.random.default_rng(seed_sequence)
+        positions = np.stack([
+            random_generator.integers(0, simulation_map.max_x, people_number),
+            random_generator.integers(0, simulation_map.max_y, people_number)
+        ], axis=1)
+        sick_people = random_generator.choice(
+            people_number, size=initial_seek_people, replace=False
+        )
+        sick = np.zeros(people_number, dtype=np.bool_)
+        sick[sick_people] = True
+        sick_start = np.full(people_number, NOT_SICK, dtype=np.int64)
+        sick_start[sick_people] = 0
+        return cls(
+            simulation_map=simulation_map,
+            positions=positions,
+            sick=sick,
+            sick_start=sick_start,
+            transmission_probability=transmission_probability,
+            max_person_step_size=max_person_step_size,
+            workers_seeds=seed_sequence.spawn(workers_number),
+            transmission_only=transmission_only,
+            aggregate_contacts=aggregate_contacts,
+            metrics_recorder=metrics_recorder,
+            trace_store=TraceStore.initialize(
+                people_number=people_number,
+                max_coordinate=map_size,
+                steps_capacity=trace_steps_capacity,
+                backing_path=traces_path
+            )
+        )
+
+    def __init__(self,
+                 simulation_map: Map,
+                 positions: np.ndarray,
+                 sick: np.ndarray,
+                 sick_start: np.ndarray,
+                 transmission_probability: float,
+                 max_person_step_size: int,
+                 workers_seeds: List[np.random.SeedSequence],
+                 transmission_only: bool = False,
+                 aggregate_contacts: bool = False,
+                 metrics_recorder: Optional[MetricsRecorder] = None,
+                 trace_store: Optional[TraceStore] = None
+                 ):
+        if len(workers_seeds) < 1:
+            raise SimulationError("At least one worker is required.")
+        self.__simulation_map = simulation_map
+        self.__people = SharedPeople(people_number=positions.shape[0])
+        self.__people.positions[:] = positions
+        self.__people.sick[:] = sick
+        self.__people.sick_start[:] = sick_start
+        self.__tile_width = get_tile_width(
+            max_x=simulation_map.max_x,
+            tiles_number=len(workers_seeds)
+        )
+        self.__people.owner[:] = get_tiles(
+            positions=self.__people.positions,
+            tile_width=self.__tile_width,
+            tiles_number=len(workers_seeds)
+        )
+        self.__initially_sick = self.__people.sick.copy()
+        self.__contacts_aggregator = ContactsAggregator(
+            people_number=self.people_number
+        ) if aggregate_contacts else None
+        self.__metrics_recorder = metrics_recorder or DISABLED_METRICS_RECORDER
+        self.__time_stamp: int = -1
+        self.__meetings_x: List[np.ndarray] = []
+        self.__meetings_y: List[np.ndarray] = []
+        self.__meetings_intensity: List[np.ndarray] = []
+        if trace_store is None:
+            trace_store = TraceStore.initialize(
+                people_number=self.people_number,
+                max_coordinate=max(simulation_map.max_x, simulation_map.max_y)
+            )
+        self.__trace_store = trace_store
+        self.__connections: List[Connection] = []
+        self.__workers: List[multiprocessing.Process] = []
+        for worker_index, worker_seed in enumerate(workers_seeds):
+            connection, worker_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_run_worker,
+                kwargs={
+                    "worker_index": worker_index,
+                    "workers_number": len(workers_seeds),
+                    "connection": worker_connection,
+                    "people": self.__people,
+                    "simulation_map": simulation_map,
+                    "tile_width": self.__tile_width,
+                    "transmission_probability": transmission_probability,
+                    "max_person_step_size": max_person_step_size,
+                    "transmission_only": transmission_only,
+                    "worker_seed": worker_seed
+                },
+                name=f"simulation-worker-{worker_index}",
+                daemon=True
+            )
+            worker.start()
+            self.__connections.append(connection)
+            self.__workers.append(worker)
+
+    @property
+    def people_number(self) -> int:
+        return self.__people.people_number
+
+    @property
+    def workers_number(self) -> int:
+        return len(self.__workers)
+
+    @property
+    def time_stamp(self) -> int:
+        return self.__time_stamp
+
+    @property
+    def sick_people_number(self) -> int:
+        return int(self.__people.sick.sum())
+
+    @property
+    def people_owners(self) -> np.ndarray:
+        """Index of worker owning each person (tile of its position)."""
+        return self.__people.owner.copy()
+
+    def take_simulation_step(self) -> None:
+        self.__time_stamp += 1
+        metrics_recorder = self.__metrics_recorder
+        metrics_recorder.start_step(time_stamp=self.__time_stamp)
+        with metrics_recorder.measure(phase=MOVEMENT_PHASE):
+            leaving_people = np.concatenate(
+                self.__dispatch(command=MOVE_COMMAND)
+            )
+            self.__trace_store.append(positions=self.__people.positions)
+            arriving_people = self.__hand_over(leaving_people=leaving_people)
+        with metrics_recorder.measure(phase=MEETINGS_PHASE):
+            workers_meetings: List[WorkerMeetings] = self.__dispatch(
+                command=MEET_COMMAND,
+                payloads=arriving_people
+            )
+        meetings_x = np.concatenate([m[0] for m in workers_meetings])
+        meetings_y = np.concatenate([m[1] for m in workers_meetings])
+        intensity = np.concatenate([m[2] for m in workers_meetings])
+        metrics_recorder.record(
+            metric=CONTACTS_GENERATED_METRIC,
+            value=meetings_x.shape[0]
+        )
+        new_infections = sum(m[3] for m in workers_meetings)
+        metrics_recorder.record(
+            metric=NEW_INFECTIONS_METRIC,
+            value=new_infections
+        )
+        if new_infections > 0:
+            logging.info(f"People recently infected: {new_infections}")
+        if self.__contacts_aggregator is not None:
+            with metrics_recorder.measure(phase=MEETINGS_PHASE):
+                self.__contacts_aggregator.add_contacts(
+                    person_x=meetings_x,
+                    person_y=meetings_y,
+                    intensity=intensity,
+                    time_stamp=self.__time_stamp
+                )
+            meetings_x = meetings_y = np.empty(0, dtype=np.int64)
+            intensity = np.empty(0, dtype=np.float64)
+        self.__meetings_x.append(meetings_x)
+        self.__meetings_y.append(meetings_y)
+        self.__meetings_intensity.append(intensity)
+
+    def get_simulation_state(self) -> SimulationState:
+        people = self.__materialize_people(
+            people_ids=np.arange(self.people_number)
+        )
+        aggregated_contacts = None
+        if self.__contacts_aggregator is not None:
+            aggregated_contacts = \
+                self.__contacts_aggregator.get_aggregated_contacts()
+        return SimulationState(
+            map=self.__simulation_map,
+            people=people,
+            meetings=self.__materialize_meetings(first_time_stamp=0),
+            people_traces=self.__trace_store.get_traces(),
+            aggregated_contacts=aggregated_contacts
+        )
+
+    def get_simulation_state_delta(self,
+                                   since_time_stamp: int
+                                   ) -> SimulationStateDelta:
+        infected_people_ids = np.flatnonzero(
+            self.__people.sick & (self.__people.sick_start >= since_time_stamp)
+        )
+        aggregated_contacts = None
+        if self.__contacts_aggregator is not None:
+            aggregated_contacts = self.__contacts_aggregator \
+                .get_aggregated_contacts() \
+                .updated_since(time_stamp=since_time_stamp)
+        return SimulationStateDelta(
+            map=self.__simulation_map,
+            people_number=self.people_number,
+            first_time_stamp=since_time_stamp,
+            last_time_stamp=self.__time_stamp,
+            infected_people=self.__materialize_people(
+                people_ids=infected_people_ids
+            ),
+            meetings=self.__materialize_meetings(
+                first_time_stamp=since_time_stamp
+            ),
+            people_traces=self.__trace_store.get_traces(
+                first_time_stamp=since_time_stamp
+            ),
+            aggregated_contacts=aggregated_contacts
+        )
+
+    def close(self) -> None:
+        for connection in self.__connections:
+            connection.send((STOP_COMMAND, self.__time_stamp, None))
+        for worker in self.__workers:
+            worker.join()
+        self.__connections, self.__workers = [], []
+
+    def __hand_over(self, leaving_people: np.ndarray) -> List[np.ndarray]:
+        """Assigns people who left tiles of their workers to workers of
+        tiles they entered, returns ids of people arriving to each worker.
+        """
+        tiles = get_tiles(
+            positions=self.__people.positions[leaving_people],
+            tile_width=self.__tile_width,
+            tiles_number=self.workers_number
+        )
+        self.__people.owner[leaving_people] = tiles
+        return [
+            leaving_people[tiles == worker_index]
+            for worker_index in range(self.workers_number)
+        ]
+
+    def __dispatch(self,
+                   command: str,
+                   payloads: Optional[List[Any]] = None
+                   ) -> List[Any]:
+        if payloads is None:
+            payloads = [None] * len(self.__connections)
+        for connection, payload in zip(self.__connections, payloads):
+            connection.send((command, self.__time_stamp, payload))
+        results = [connection.recv() for connection in self.__connections]
+        for result in results:
+            if isinstance(result, BaseException):
+                raise SimulationError(
+                    f"Simulation worker failed while processing {command}."
+                ) from result
+        return results
+
+    def __materialize_people(self, people_ids: np.ndarray) -> List[Person]:
+        positions = self.__people.positions
+        return [
+            self.__materialize_person(
+                person_id=person_id,
+                time_stamp=None,
+                position=positions[person_id]
+            ) for person_id in people_ids.tolist()
+        ]
+
+    def __materialize_person(self,
+                             person_id: int,
+                             time_stamp: Optional[int],
+                             position: np.ndarray
+                             ) -> Person:
+        sick_start = int(self.__people.sick_start[person_id])
+        if time_stamp is None:
+            sick = bool(self.__people.sick[person_id])
+        else:
+            sick = bool(self.__initially_sick[person_id]) or \
+                NOT_SICK < sick_start < time_stamp
+        return Person(
+            person_id=person_id,
+            sick=sick,
+            position=Position2D(x=int(position[0]), y=int(position[1])),
+            sick_start=sick_start if sick else None
+        )
+
+    def __materialize_meetings(self, first_time_stamp: int) -> List[Contact]:
+        meetings = []
+        for time_stamp in range(first_time_stamp, self.__time_stamp + 1):
+            positions = self.__trace_store.get_positions(time_stamp=time_stamp)
+            meetings.extend(
+                Contact(
+                    person_x=self.__materialize_person(
+                        person_id=int(x),
+                        time_stamp=time_stamp,
+                        position=positions[x]
+                    ),
+                    person_y=self.__materialize_person(
+                        person_id=int(y),
+                        time_stamp=time_stamp,
+                        position=positions[y]
+                    ),
+                    intensity=float(i),
+                    time_stamp=time_stamp
+                ) for x, y, i in zip(
+                    self.__meetings_x[time_stamp],
+                    self.__meetings_y[time_stamp],
+                    self.__meetings_intensity[time_stamp]
+                )
+            )
+        return meetings
+
+
+def get_tile_width(max_x: int, tiles_number: int) -> int:
+    # positions span [0, max_x] inclusive
+    return -(-(max_x + 1) // tiles_number)
+
+
+def get_tiles(positions: np.ndarray,
+              tile_width: int,
+              tiles_number: int
+              ) -> np.ndarray:
+    return np.minimum(positions[:, 0] // tile_width, tiles_number - 1)
+
+
+def _run_worker(worker_index: int,
+                workers_number: int,
+                connection: Connection,
+                people: SharedPeople,
+                simulation_map: Map,
+                tile_width: int,
+                transmission_probability: float,
+                max_person_step_size: int,
+                transmission_only: bool,
+                worker_seed: np.random.SeedSequence
+                ) -> None:
+    random_generator = np.random.default_rng(worker_seed)
+    map_bounds = np.array(
+        [simulation_map.max_x, simulation_map.max_y], dtype=np.int64
+    )
+    positions = people.positions
+    # sorted ids of people in tile of worker, so that neither moving nor
+    # meeting scans whole population
+    owned_people = np.flatnonzero(people.owner == worker_index)
+    while True:
+        command, time_stamp, payload = connection.recv()
+        if command == STOP_COMMAND:
+            return
+        try:
+            if command == MOVE_COMMAND:
+                directions = random_generator.integers(
+                    0, DIRECTIONS.shape[0], owned_people.shape[0]
+                )
+                step_sizes = random_generator.integers(
+                    1, max_person_step_size + 1, (owned_people.shape[0], 2)
+                )
+                positions[owned_people] = np.clip(
+                    positions[owned_people] +
+                    DIRECTIONS[directions] * step_sizes,
+                    0,
+                    map_bounds
+                )
+                # only people close to tile borders (by max_person_step_size)
+                # may leave, they are handed over to workers of their tiles
+                leaving = get_tiles(
+                    positions=positions[owned_people],
+                    tile_width=tile_width,
+                    tiles_number=workers_number
+                ) != worker_index
+                connection.send(owned_people[leaving])
+                owned_people = owned_people[~leaving]
+                continue
+            # positions are settled after all workers have moved, so people
+            # arriving from other tiles (payload) can be taken over
+            owned_people = np.sort(np.concatenate((owned_people, payload)))
+            tile_meetings = _meet_within_tile(
+                tile_people=owned_people,
+                people=people,
+                simulation_map=simulation_map,
+                time_stamp=time_stamp,
+                transmission_probability=transmission_probability,
+                transmission_only=transmission_only,
+                random_generator=random_generator
+            )
+            connection.send(tile_meetings)
+        except BaseException as error:
+            connection.send(error)
+
+
+def _meet_within_tile(tile_people: np.ndarray,
+                      people: SharedPeople,
+                      simulation_map: Map,
+                      time_stamp: int,
+                      transmission_probability: float,
+                      transmission_only: bool,
+                      random_generator: np.random.Generator
+                      ) -> WorkerMeetings:
+    sick, sick_start = people.sick, people.sick_start
+    occupancy = group_by_keys(keys=linearize_positions(
+        positions=people.positions[tile_people],
+        max_y=simulation_map.max_y
+    ))
+    tile_sick = sick[tile_people]
+    if transmission_only:
+        endangered_people, infection_probability = calculate_infection_risk(
+            occupancy=occupancy,
+            sick=tile_sick,
+            transmission_probability=transmission_probability
+        )
+        coins = random_generator.random(endangered_people.shape[0])
+        recently_infected = tile_people[
+            endangered_people[coins < infection_probability]
+        ]
+        meetings_x = meetings_y = np.empty(0, dtype=np.int64)
+        intensity = np.empty(0, dtype=np.float64)
+    else:
+        local_x, local_y = generate_pairs_within_groups(grouping=occupancy)
+        intensity = random_generator.random(local_x.shape[0])
+        endangered = tile_sick[local_x] | tile_sick[local_y]
+        coins = random_generator.random(int(endangered.sum()))
+        transmission = np.zeros_like(endangered)
+        transmission[endangered] = \
+            coins < intensity[endangered] * transmission_probability
+        exposed = np.concatenate(
+            (local_x[transmission], local_y[transmission])
+        )
+        recently_infected = tile_people[np.unique(exposed[~tile_sick[exposed]])]
+        # tile_people are sorted, so pairs keep their (x < y) order
+        meetings_x, meetings_y = tile_people[local_x], tile_people[local_y]
+    sick[recently_infected] = True
+    sick_start[recently_infected] = time_stamp
+    return meetings_x, meetings_y, intensity, recently_infected.shape[0]
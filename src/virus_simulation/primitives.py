@@ -2,9 +2,19 @@ from __future__ import annotations
 import random
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Tuple, List, Dict, Optional
+from typing import Any, Tuple, List, Optional
+
+import numpy as np
+
+from src.virus_simulation.contact_index import ContactsSlice
+from src.virus_simulation.contacts_aggregation import AggregatedContacts
+from src.virus_simulation.crowding import GroupContacts
 
 CompactPosition2D = Tuple[int, int]
+# sick_start of people that are not sick, in array representations of people
+NOT_SICK = -1
+# positions of people (ordered by person_id) after each step - (steps, people, 2)
+PeopleTraces = np.ndarray
 
 
 class Direction(Enum):
@@ -49,10 +59,14 @@ class Person:
     position: Position2D
     sick_start: Optional[int] = None
 
-    def get_move_vector(self, max_step_size: int) -> FreeVector2D:
-        direction = random.choice(list(Direction))
-        ox_step_size = random.randint(1, max_step_size)
-        oy_step_size = random.randint(1, max_step_size)
+    def get_move_vector(self,
+                        max_step_size: int,
+                        random_generator: Optional[random.Random] = None
+                        ) -> FreeVector2D:
+        random_generator = random_generator or random
+        direction = random_generator.choice(list(Direction))
+        ox_step_size = random_generator.randint(1, max_step_size)
+        oy_step_size = random_generator.randint(1, max_step_size)
         return FreeVector2D(
             x=direction.value[0] * ox_step_size,
             y=direction.value[1] * oy_step_size,
@@ -114,9 +128,64 @@ class Map:
         return Position2D(x=target_x, y=target_y)
 
 
+@dataclass(frozen=True)
+class ReplayLog:
+    """What movement of people (and their contacts, if they are recorded) can
+    be replayed from - positions before the first step and packed state of
+    random generator at the beginning of each step.
+    """
+    start: np.ndarray
+    random_states: np.ndarray
+    max_person_step_size: int
+    contacts: bool
+
+    @property
+    def steps_number(self) -> int:
+        return self.random_states.shape[0]
+
+
 @dataclass(frozen=True)
 class SimulationState:
     map: Map
     people: List[Person]
     meetings: List[Contact]
-    people_traces: Dict[Person, List[Position2D]]
+    people_traces: PeopleTraces
+    aggregated_contacts: Optional[AggregatedContacts] = None
+    # contacts preceding meetings, spilled to disk to stay within memory budget
+    spilled_meetings: Optional[ContactsSlice] = None
+    replay_log: Optional[ReplayLog] = None
+    # hot cells recorded as single contact of whole group
+    group_contacts: Optional[GroupContacts] = None
+
+
+@dataclass(frozen=True)
+class SimulationStateDelta:
+    map: Map
+    people_number: int
+    first_time_stamp: int
+    last_time_stamp: int
+    infected_people: List[Person]
+    meetings: List[Contact]
+    people_traces: PeopleTraces
+    spilled_meetings: Optional[ContactsSlice] = None
+    # current records of pairs that met within delta
+    aggregated_contacts: Optional[AggregatedContacts] = None
+
+
+@dataclass(frozen=True)
+class SimulationStep:
+    """Compact delta of single step - positions of all people (ordered by
+    person_id) with their moves, contacts of this step and ids of people
+    infected in it.
+    """
+    time_stamp: int
+    positions: np.ndarray
+    moves: np.ndarray
+    contacts_person_x: np.ndarray
+    contacts_person_y: np.ndarray
+    contacts_intensity: np.ndarray
+    infected_people: np.ndarray
+
+    @property
+    def contacts_number(self) -> int:
+        return self.contacts_person_x.shape[0]
@@ -0,0 +1,353 @@
+import argparse
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from src.utils.fs_utils import dump_json_to_file, parse_json
+from src.virus_simulation.binary_snapshots import load_snapshot_arrays, \
+    convert_snapshot_json_to_arrays
+from src.virus_simulation.crowding import GroupContacts
+from src.virus_simulation.execute import STREAMED_JSON_FORMAT, \
+    DIRECTORY_FORMATS, SNAPSHOT_INDEX_SUFFIX
+from src.virus_simulation.json_streaming import load_streamed_sections_arrays
+from src.virus_simulation.primitives import NOT_SICK
+from src.virus_simulation.snapshot_parsing import Snapshot
+import src.config as global_config
+import src.virus_simulation.config as simulation_config
+
+
+logging.getLogger().setLevel(global_config.LOGGING_LEVEL)
+
+EPIDEMIC_CURVE_METRIC = "epidemic_curve"
+ATTACK_RATE_METRIC = "attack_rate"
+CONTACTS_PER_STEP_METRIC = "contacts_per_step"
+DEGREE_DISTRIBUTION_METRIC = "degree_distribution"
+METRICS = [
+    EPIDEMIC_CURVE_METRIC, ATTACK_RATE_METRIC, CONTACTS_PER_STEP_METRIC,
+    DEGREE_DISTRIBUTION_METRIC
+]
+
+PEOPLE_SECTION = simulation_config.GRAPH_VERTICES_KEY
+CONTACTS_SECTION = simulation_config.GRAPH_EDGES_KEY
+AGGREGATED_CONTACTS_SECTION = simulation_config.AGGREGATED_EDGES_KEY
+GROUP_CONTACTS_SECTION = simulation_config.GROUP_EDGES_KEY
+# arrays (fields of SnapshotArrays) read from each section
+SECTION_ARRAYS = {
+    PEOPLE_SECTION: ("person_id", "sick", "sick_start"),
+    CONTACTS_SECTION: ("contact_person_x", "contact_person_y",
+                       "contact_time_stamp"),
+    AGGREGATED_CONTACTS_SECTION: ("aggregated_person_x", "aggregated_person_y"),
+    GROUP_CONTACTS_SECTION: ("group_time_stamp", "group_size", "group_members")
+}
+ANALYZED_SNAPSHOTS_KEY = "snapshots"
+
+
+@dataclass(frozen=True)
+class SnapshotAnalysisSpecs:
+    snapshot_path: str
+    snapshot_entry: Dict[str, Any]
+    people_number: int
+    metrics: Tuple[str, ...]
+
+
+def find_snapshot_indices(snapshots_dir: str,
+                          simulation_names: Optional[List[str]] = None
+                          ) -> List[str]:
+    if simulation_names is not None:
+        return [
+            os.path.join(snapshots_dir, f"{name}{SNAPSHOT_INDEX_SUFFIX}")
+            for name in simulation_names
+        ]
+    return sorted(
+        glob.glob(os.path.join(snapshots_dir, f"*{SNAPSHOT_INDEX_SUFFIX}"))
+    )
+
+
+def analyze_simulations(index_paths: List[str],
+                        metrics: List[str],
+                        workers: Optional[int] = None,
+                        last_snapshot_only: bool = False,
+                        show_progress: bool = True
+                        ) -> List[Dict[str, Any]]:
+    """Computes metrics of snapshots listed in indices of simulations, one
+    snapshot per task of worker processes. Metrics available in index are
+    not read from snapshots at all.
+    """
+    indices = [parse_json(json_path=path) for path in index_paths]
+    analyses_specs = []
+    for index_path, index in zip(index_paths, indices):
+        snapshots = index[simulation_config.INDEXED_SNAPSHOTS_KEY]
+        if last_snapshot_only:
+            snapshots = snapshots[-1:]
+        analyses_specs.extend(
+            SnapshotAnalysisSpecs(
+                snapshot_path=os.path.join(
+                    os.path.dirname(index_path),
+                    snapshot[simulation_config.SNAPSHOT_PATH_KEY]
+                ),
+                snapshot_entry=snapshot,
+                people_number=index[simulation_config.PEOPLE_NUMBER_KEY],
+                metrics=tuple(metrics)
+            ) for snapshot in snapshots
+        )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        snapshots_results = iter(list(tqdm(
+            executor.map(_analyze_snapshot, analyses_specs),
+            total=len(analyses_specs),
+            disable=not show_progress
+        )))
+    simulations_results = []
+    for index in indices:
+        snapshots = index[simulation_config.INDEXED_SNAPSHOTS_KEY]
+        if last_snapshot_only:
+            snapshots = snapshots[-1:]
+        simulations_results.append({
+            simulation_config.SIMULATION_NAME_KEY:
+                index[simulation_config.SIMULATION_NAME_KEY],
+            simulation_config.PEOPLE_NUMBER_KEY:
+                index[simulation_config.PEOPLE_NUMBER_KEY],
+            ANALYZED_SNAPSHOTS_KEY: [
+                next(snapshots_results) for _ in snapshots
+            ]
+        })
+    return simulations_results
+
+
+def get_required_sections(metrics: Tuple[str, ...],
+                          snapshot_entry: Dict[str, Any]
+                          ) -> Set[str]:
+    sections = set()
+    if EPIDEMIC_CURVE_METRIC in metrics:
+        sections.add(PEOPLE_SECTION)
+    if CONTACTS_PER_STEP_METRIC in metrics:
+        sections.add(CONTACTS_SECTION)
+    if DEGREE_DISTRIBUTION_METRIC in metrics:
+        sections.add(
+            AGGREGATED_CONTACTS_SECTION if _has_aggregated_contacts(
+                snapshot_entry=snapshot_entry
+            ) else CONTACTS_SECTION
+        )
+    # contact metrics count pairs of people meeting in groups as well
+    if (CONTACTS_PER_STEP_METRIC in metrics or
+            DEGREE_DISTRIBUTION_METRIC in metrics) and \
+            _has_group_contacts(snapshot_entry=snapshot_entry):
+        sections.add(GROUP_CONTACTS_SECTION)
+    return sections
+
+
+def load_snapshot_sections(snapshot_path: str,
+                           snapshot_format: str,
+                           sections: Set[str],
+                           section_offsets: Optional[Dict[str, int]] = None
+                           ) -> Dict[str, np.ndarray]:
+    """Arrays of given sections only - binary snapshots are memory-mapped
+    and streamed ones are sought or read up to the last needed section.
+    Plain JSON snapshots have to be parsed as a whole.
+    """
+    if len(sections) == 0:
+        return {}
+    array_names = [
+        name for section in sections for name in SECTION_ARRAYS[section]
+    ]
+    if snapshot_format == STREAMED_JSON_FORMAT:
+        arrays = load_streamed_sections_arrays(
+            snapshot_path=snapshot_path,
+            keys=sections,
+            section_offsets=section_offsets
+        )
+        return {name: arrays[name] for name in array_names}
+    if snapshot_format in DIRECTORY_FORMATS:
+        snapshot_arrays = load_snapshot_arrays(snapshot_dir=snapshot_path)
+        replay_log = snapshot_arrays.replay_log
+        if CONTACTS_SECTION in sections and replay_log is not None and \
+                replay_log.contacts:
+            snapshot_arrays = Snapshot(snapshot_arrays=snapshot_arrays).arrays
+    else:
+        snapshot_arrays = convert_snapshot_json_to_arrays(
+            snapshot_json=parse_json(json_path=snapshot_path)
+        )
+    return {name: getattr(snapshot_arrays, name) for name in array_names}
+
+
+def calculate_epidemic_curve(sick_start: np.ndarray, step: int) -> np.ndarray:
+    """Number of people infected in each step (initially sick ones count
+    in step 0).
+    """
+    sick_start = np.asarray(sick_start, dtype=np.int64)
+    return np.bincount(sick_start[sick_start != NOT_SICK], minlength=step + 1)
+
+
+def calculate_contacts_per_step(time_stamp: np.ndarray,
+                                step: int,
+                                group_contacts: Optional[GroupContacts] = None
+                                ) -> np.ndarray:
+    """Number of contacts in each step, group contact counts as contact of
+    each pair of its members.
+    """
+    contacts_per_step = np.bincount(
+        np.asarray(time_stamp, dtype=np.int64), minlength=step + 1
+    )
+    if group_contacts is None or group_contacts.groups_number == 0:
+        return contacts_per_step
+    sizes = group_contacts.sizes.astype(np.int64)
+    return contacts_per_step + np.bincount(
+        group_contacts.time_stamp.astype(np.int64),
+        weights=sizes * (sizes - 1) // 2,
+        minlength=step + 1
+    ).astype(np.int64)
+
+
+def calculate_degree_distribution(person_x: np.ndarray,
+                                  person_y: np.ndarray,
+                                  people_number: int,
+                                  group_contacts: Optional[GroupContacts] = None
+                                  ) -> np.ndarray:
+    """Number of people with each number of distinct contacted people
+    (members of the same group included).
+    """
+    person_x = np.asarray(person_x, dtype=np.int64)
+    person_y = np.asarray(person_y, dtype=np.int64)
+    if group_contacts is not None and group_contacts.groups_number > 0:
+        group_x, group_y, _ = group_contacts.get_pairs()
+        person_x = np.concatenate((person_x, group_x))
+        person_y = np.concatenate((person_y, group_y))
+    pairs = np.unique(
+        np.minimum(person_x, person_y) * people_number +
+        np.maximum(person_x, person_y)
+    )
+    degrees = np.bincount(
+        np.concatenate((pairs // people_number, pairs % people_number)),
+        minlength=people_number
+    )
+    return np.bincount(degrees)
+
+
+def _analyze_snapshot(analysis_specs: SnapshotAnalysisSpecs
+                      ) -> Dict[str, Any]:
+    snapshot_entry = analysis_specs.snapshot_entry
+    step = snapshot_entry[simulation_config.SNAPSHOT_STEP_KEY]
+    arrays = load_snapshot_sections(
+        snapshot_path=analysis_specs.snapshot_path,
+        snapshot_format=snapshot_entry[simulation_config.SNAPSHOT_FORMAT_KEY],
+        sections=get_required_sections(
+            metrics=analysis_specs.metrics,
+            snapshot_entry=snapshot_entry
+        ),
+        section_offsets=snapshot_entry.get(
+            simulation_config.SECTION_OFFSETS_KEY
+        )
+    )
+    group_contacts = None
+    if "group_size" in arrays:
+        group_contacts = GroupContacts(
+            time_stamp=arrays["group_time_stamp"],
+            sizes=arrays["group_size"],
+            members=arrays["group_members"]
+        )
+    results: Dict[str, Any] = {simulation_config.SNAPSHOT_STEP_KEY: step}
+    if EPIDEMIC_CURVE_METRIC in analysis_specs.metrics:
+        results[EPIDEMIC_CURVE_METRIC] = calculate_epidemic_curve(
+            sick_start=arrays["sick_start"],
+            step=step
+        ).tolist()
+    if ATTACK_RATE_METRIC in analysis_specs.metrics:
+        results[ATTACK_RATE_METRIC] = \
+            snapshot_entry[simulation_config.SICK_NUMBER_KEY] / \
+            max(analysis_specs.people_number, 1)
+    if CONTACTS_PER_STEP_METRIC in analysis_specs.metrics:
+        results[CONTACTS_PER_STEP_METRIC] = calculate_contacts_per_step(
+            time_stamp=arrays["contact_time_stamp"],
+            step=step,
+            group_contacts=group_contacts
+        ).tolist()
+    if DEGREE_DISTRIBUTION_METRIC in analysis_specs.metrics:
+        prefix = "aggregated" if _has_aggregated_contacts(
+            snapshot_entry=snapshot_entry
+        ) else "contact"
+        results[DEGREE_DISTRIBUTION_METRIC] = calculate_degree_distribution(
+            person_x=arrays[f"{prefix}_person_x"],
+            person_y=arrays[f"{prefix}_person_y"],
+            people_number=analysis_specs.people_number,
+            group_contacts=group_contacts
+        ).tolist()
+    return results
+
+
+def _has_aggregated_contacts(snapshot_entry: Dict[str, Any]) -> bool:
+    return snapshot_entry[
+        simulation_config.AGGREGATED_CONTACTS_NUMBER_KEY
+    ] > 0
+
+
+def _has_group_contacts(snapshot_entry: Dict[str, Any]) -> bool:
+    # indices written before crowding policies have no group contacts
+    return snapshot_entry.get(
+        simulation_config.GROUP_CONTACTS_NUMBER_KEY, 0
+    ) > 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        "Parallel analytics over snapshots indexed by simulations"
+    )
+    parser.add_argument(
+        "--analysis_name",
+        help="Distinguishable name of analysis.",
+        type=str,
+        required=True
+    )
+    parser.add_argument(
+        "--snapshots_dir",
+        help="Directory of snapshots and their indices.",
+        type=str,
+        default=global_config.VIRUS_SIMULATION_OUTPUT_PATH
+    )
+    parser.add_argument(
+        "--simulation_names",
+        help="Names of simulations to analyze (default: all indexed ones).",
+        type=str,
+        nargs="+",
+        default=None
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Metrics to compute for each snapshot.",
+        type=str,
+        nargs="+",
+        choices=METRICS,
+        default=METRICS
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of worker processes (default: number of CPUs).",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        "--last_snapshot_only",
+        help="Analyze only the final snapshot of each simulation.",
+        action="store_true"
+    )
+
+    args = parser.parse_args()
+
+    simulations_results = analyze_simulations(
+        index_paths=find_snapshot_indices(
+            snapshots_dir=args.snapshots_dir,
+            simulation_names=args.simulation_names
+        ),
+        metrics=args.metrics,
+        workers=args.workers,
+        last_snapshot_only=args.last_snapshot_only
+    )
+    target_path = os.path.join(
+        args.snapshots_dir, f"{args.analysis_name}_analytics.json"
+    )
+    logging.info(f"Persisting analytics under {target_path}")
+    dump_json_to_file(target_path=target_path, content=simulations_results)
@@ -1,25 +1,49 @@
 from __future__ import annotations
 
-from copy import deepcopy
-from typing import Dict, Any, Tuple, List
-
-import numpy as np
+import os
+from dataclasses import replace
+from types import MappingProxyType
+from typing import Dict, Any, Tuple, List, Optional, Mapping, Iterator
 
 from src.utils.fs_utils import parse_json
 import src.virus_simulation.config as simulation_config
-from src.utils.iterables import unzip_list
+from src.virus_simulation.binary_snapshots import SnapshotArrays, \
+    load_snapshot_arrays, convert_snapshot_json_to_arrays, \
+    freeze_snapshot_arrays
+from src.virus_simulation.contact_index import ContactIndex, ContactsSlice
+from src.virus_simulation.conversion import prepare_aggregated_edges, \
+    prepare_group_edges
+from src.virus_simulation.crowding import merge_group_contacts
 from src.virus_simulation.errors import SnapshotParsingError
-from src.virus_simulation.primitives import CompactPosition2D
+from src.virus_simulation.json_streaming import load_streamed_snapshot_arrays, \
+    iterate_streamed_contacts
+from src.virus_simulation.primitives import NOT_SICK
+from src.virus_simulation.trace_encoding import LazyDecodedTraces, PersonTrace
+from src.virus_simulation.trace_replay import TraceReplayer, \
+    LazyReplayedTraces
+
+PeopleRecords = Tuple[Mapping[str, Any], ...]
+ContactsRecords = Tuple[Mapping[str, Any], ...]
 
 
 class Snapshot:
+    """Read-only, memoized view of simulation snapshot.
+
+    Record properties (people, contacts, aggregated_contacts,
+    group_contacts) return tuples of read-only mappings instead of lists of
+    dicts, so callers that modified or appended to them have to use
+    corresponding copy_*() methods instead.
+    """
 
     __REQUIRED_KEYS = [
         simulation_config.MAP_DIMENSIONS_KEY,
-        simulation_config.PEOPLE_TRACES_KEY,
         simulation_config.GRAPH_EDGES_KEY,
         simulation_config.GRAPH_VERTICES_KEY
     ]
+    __TRACES_KEYS = [
+        simulation_config.PEOPLE_TRACES_KEY,
+        simulation_config.ENCODED_PEOPLE_TRACES_KEY
+    ]
 
     @classmethod
     def initialize(cls, snapshot_path: str) -> Snapshot:
@@ -27,38 +51,312 @@ class Snapshot:
         cls.__check_snapshot_consistency(snapshot_json=snapshot_json)
         return cls(snapshot_json=snapshot_json)
 
+    @classmethod
+    def initialize_binary(cls, snapshot_path: str) -> Snapshot:
+        snapshot_arrays = load_snapshot_arrays(snapshot_dir=snapshot_path)
+        return cls(snapshot_arrays=snapshot_arrays)
+
+    @classmethod
+    def initialize_streamed(cls, snapshot_path: str) -> Snapshot:
+        snapshot_arrays = load_streamed_snapshot_arrays(
+            snapshot_path=snapshot_path
+        )
+        return cls(snapshot_arrays=snapshot_arrays)
+
+    @classmethod
+    def iterate_streamed_contacts(cls,
+                                  snapshot_path: str
+                                  ) -> Iterator[Dict[str, Any]]:
+        return iterate_streamed_contacts(snapshot_path=snapshot_path)
+
+    @classmethod
+    def initialize_from_manifest(cls,
+                                 manifest_path: str,
+                                 step: Optional[int] = None
+                                 ) -> Snapshot:
+        manifest = parse_json(json_path=manifest_path)
+        segments = manifest[simulation_config.SNAPSHOT_SEGMENTS_KEY]
+        if step is None:
+            step = segments[-1][simulation_config.SEGMENT_STEPS_KEY][1]
+        people_number = manifest[simulation_config.PEOPLE_NUMBER_KEY]
+        snapshot_json = {
+            simulation_config.MAP_DIMENSIONS_KEY:
+                manifest[simulation_config.MAP_DIMENSIONS_KEY],
+            simulation_config.GRAPH_VERTICES_KEY: [
+                {
+                    simulation_config.PERSON_ID_KEY: person_id,
+                    simulation_config.SICKNESS_STATUS_KEY: False,
+                    simulation_config.SICKNESS_START_KEY: None
+                } for person_id in range(people_number)
+            ],
+            simulation_config.GRAPH_EDGES_KEY: [],
+            simulation_config.PEOPLE_TRACES_KEY: {
+                str(person_id): [] for person_id in range(people_number)
+            }
+        }
+        # latest records of aggregated pairs - each segment holds records of
+        # pairs that met within it
+        aggregated_contacts: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for segment in segments:
+            first_step, _ = segment[simulation_config.SEGMENT_STEPS_KEY]
+            if first_step > step:
+                break
+            segment_path = os.path.join(
+                os.path.dirname(manifest_path),
+                segment[simulation_config.SEGMENT_PATH_KEY]
+            )
+            cls.__replay_segment(
+                snapshot_json=snapshot_json,
+                segment_json=parse_json(json_path=segment_path),
+                step=step,
+                aggregated_contacts=aggregated_contacts
+            )
+        if len(aggregated_contacts) > 0:
+            snapshot_json[simulation_config.AGGREGATED_EDGES_KEY] = [
+                aggregated_contacts[pair] for pair in sorted(aggregated_contacts)
+            ]
+        return cls(snapshot_json=snapshot_json)
+
+    @classmethod
+    def __replay_segment(cls,
+                         snapshot_json: Dict[str, Any],
+                         segment_json: Dict[str, Any],
+                         step: int,
+                         aggregated_contacts: Dict[Tuple[int, int],
+                                                   Dict[str, Any]]
+                         ) -> None:
+        first_step, _ = segment_json[simulation_config.SEGMENT_STEPS_KEY]
+        people = snapshot_json[simulation_config.GRAPH_VERTICES_KEY]
+        for person in segment_json[simulation_config.GRAPH_VERTICES_KEY]:
+            if person[simulation_config.SICKNESS_START_KEY] <= step:
+                people[person[simulation_config.PERSON_ID_KEY]] = person
+        snapshot_json[simulation_config.GRAPH_EDGES_KEY].extend(
+            contact for contact in segment_json[simulation_config.GRAPH_EDGES_KEY]
+            if contact[simulation_config.CONTACT_TIME_STAMP_KEY] <= step
+        )
+        traces = snapshot_json[simulation_config.PEOPLE_TRACES_KEY]
+        segment_traces = segment_json[simulation_config.PEOPLE_TRACES_KEY]
+        for person_id, person_trace in segment_traces.items():
+            traces[person_id].extend(person_trace[:step - first_step + 1])
+        for contact in segment_json.get(
+                simulation_config.AGGREGATED_EDGES_KEY, []):
+            if contact[simulation_config.FIRST_CONTACT_TIME_STAMP_KEY] > step:
+                continue
+            if contact[simulation_config.LAST_CONTACT_TIME_STAMP_KEY] > step:
+                raise SnapshotParsingError(
+                    f"Aggregated contacts cannot be rebuilt at step {step}, "
+                    f"which is not the last step of a segment."
+                )
+            aggregated_contacts[
+                tuple(contact[simulation_config.CONTACT_PAIR_KEY])
+            ] = contact
+
     @classmethod
     def __check_snapshot_consistency(cls, snapshot_json: Dict[str, Any]) -> None:
         if any(k not in snapshot_json for k in Snapshot.__REQUIRED_KEYS):
             raise SnapshotParsingError(
                 f"One of required keys ({Snapshot.__REQUIRED_KEYS}) missing."
             )
+        if all(k not in snapshot_json for k in Snapshot.__TRACES_KEYS):
+            raise SnapshotParsingError(
+                f"None of traces keys ({Snapshot.__TRACES_KEYS}) present."
+            )
 
-    def __init__(self, snapshot_json: Dict[str, Any]):
-        self.__snapshot_json = snapshot_json
+    def __init__(self,
+                 snapshot_json: Optional[Dict[str, Any]] = None,
+                 snapshot_arrays: Optional[SnapshotArrays] = None):
+        if (snapshot_json is None) == (snapshot_arrays is None):
+            raise SnapshotParsingError(
+                "Snapshot requires either JSON content or binary arrays."
+            )
+        if snapshot_arrays is None:
+            snapshot_arrays = convert_snapshot_json_to_arrays(
+                snapshot_json=snapshot_json
+            )
+        self.__snapshot_arrays = freeze_snapshot_arrays(
+            snapshot_arrays=snapshot_arrays
+        )
+        self.__people: Optional[PeopleRecords] = None
+        self.__contacts: Optional[ContactsRecords] = None
+        self.__aggregated_contacts: Optional[ContactsRecords] = None
+        self.__group_contacts: Optional[ContactsRecords] = None
+        self.__traces: Optional[Mapping[int, PersonTrace]] = None
+        self.__pairwise_contacts: Optional[ContactsSlice] = None
+        self.__contact_index: Optional[ContactIndex] = None
+        self.__trace_replayer: Optional[TraceReplayer] = None
+        replay_log = snapshot_arrays.replay_log
+        self.__contacts_replayed = replay_log is None or \
+            not replay_log.contacts
 
     @property
-    def traces(self) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
-        return {
-            int(person_id): self.__prepare_trace_arrays(person_trace=person_trace)
-            for person_id, person_trace in
-            self.__snapshot_json.get(simulation_config.PEOPLE_TRACES_KEY, {}).items()
-        }
+    def arrays(self) -> SnapshotArrays:
+        """Arrays of snapshot, contacts of replay snapshot are replayed on
+        first access.
+        """
+        if not self.__contacts_replayed:
+            person_x, person_y, intensity, time_stamp = \
+                self.trace_replayer.replay_contacts(
+                    max_y=int(self.__snapshot_arrays.map_dimensions[1])
+                )
+            self.__snapshot_arrays = freeze_snapshot_arrays(
+                snapshot_arrays=replace(
+                    self.__snapshot_arrays,
+                    contact_person_x=person_x,
+                    contact_person_y=person_y,
+                    contact_intensity=intensity,
+                    contact_time_stamp=time_stamp
+                )
+            )
+            self.__contacts_replayed = True
+        return self.__snapshot_arrays
 
     @property
-    def people(self) -> List[dict]:
-        return deepcopy(
-            self.__snapshot_json.get(simulation_config.GRAPH_VERTICES_KEY, [])
-        )
+    def trace_replayer(self) -> TraceReplayer:
+        if self.__trace_replayer is None:
+            replay_log = self.__snapshot_arrays.replay_log
+            if replay_log is None:
+                raise SnapshotParsingError("Snapshot cannot be replayed.")
+            self.__trace_replayer = TraceReplayer(
+                replay_log=replay_log,
+                map_dimensions=self.__snapshot_arrays.map_dimensions
+            )
+        return self.__trace_replayer
+
+    @property
+    def traces(self) -> Mapping[int, PersonTrace]:
+        if self.__traces is not None:
+            return self.__traces
+        snapshot_arrays = self.__snapshot_arrays
+        if snapshot_arrays.replay_log is not None:
+            self.__traces = LazyReplayedTraces(
+                trace_replayer=self.trace_replayer,
+                person_id=snapshot_arrays.person_id
+            )
+        elif snapshot_arrays.encoded_traces is not None:
+            self.__traces = LazyDecodedTraces(
+                encoded_traces=snapshot_arrays.encoded_traces,
+                person_id=snapshot_arrays.person_id
+            )
+        else:
+            traces = snapshot_arrays.traces
+            self.__traces = {
+                person_id: (traces[:, index, 0], traces[:, index, 1])
+                for index, person_id in
+                enumerate(snapshot_arrays.person_id.tolist())
+            }
+        return self.__traces
 
     @property
-    def contacts(self) -> List[dict]:
-        return deepcopy(
-            self.__snapshot_json.get(simulation_config.GRAPH_EDGES_KEY, [])
+    def pairwise_contacts(self) -> ContactsSlice:
+        """Contacts with group contacts expanded into pairs of their
+        members.
+        """
+        if self.__pairwise_contacts is None:
+            snapshot_arrays = self.arrays
+            self.__pairwise_contacts = merge_group_contacts(
+                contacts=ContactsSlice(
+                    person_x=snapshot_arrays.contact_person_x,
+                    person_y=snapshot_arrays.contact_person_y,
+                    intensity=snapshot_arrays.contact_intensity,
+                    time_stamp=snapshot_arrays.contact_time_stamp
+                ),
+                group_contacts=snapshot_arrays.group_contacts
+            )
+        return self.__pairwise_contacts
+
+    @property
+    def contact_index(self) -> ContactIndex:
+        """Index of pairwise contacts (group contacts included)."""
+        if self.__contact_index is None:
+            contacts = self.pairwise_contacts
+            self.__contact_index = ContactIndex.initialize(
+                person_x=contacts.person_x,
+                person_y=contacts.person_y,
+                intensity=contacts.intensity,
+                time_stamp=contacts.time_stamp,
+                people_number=self.arrays.people_number
+            )
+        return self.__contact_index
+
+    @property
+    def people(self) -> PeopleRecords:
+        """Records shared between calls - tuple of read-only mappings, use
+        copy_people() to get list of dicts that can be modified.
+        """
+        if self.__people is None:
+            self.__people = tuple(
+                MappingProxyType(person) for person in self.copy_people()
+            )
+        return self.__people
+
+    @property
+    def contacts(self) -> ContactsRecords:
+        """Records shared between calls - tuple of read-only mappings, use
+        copy_contacts() to get list of dicts that can be modified.
+        """
+        if self.__contacts is None:
+            self.__contacts = tuple(
+                MappingProxyType(contact) for contact in self.copy_contacts()
+            )
+        return self.__contacts
+
+    @property
+    def aggregated_contacts(self) -> ContactsRecords:
+        if self.__aggregated_contacts is None:
+            self.__aggregated_contacts = tuple(
+                MappingProxyType(contact)
+                for contact in self.copy_aggregated_contacts()
+            )
+        return self.__aggregated_contacts
+
+    @property
+    def group_contacts(self) -> ContactsRecords:
+        """Contacts of hot cells recorded once per group of people meeting
+        each other.
+        """
+        if self.__group_contacts is None:
+            self.__group_contacts = tuple(
+                MappingProxyType(contact)
+                for contact in self.copy_group_contacts()
+            )
+        return self.__group_contacts
+
+    def copy_people(self) -> List[dict]:
+        snapshot_arrays = self.__snapshot_arrays
+        return [
+            {
+                simulation_config.PERSON_ID_KEY: person_id,
+                simulation_config.SICKNESS_STATUS_KEY: sick,
+                simulation_config.SICKNESS_START_KEY:
+                    None if sick_start == NOT_SICK else sick_start
+            } for person_id, sick, sick_start in zip(
+                snapshot_arrays.person_id.tolist(),
+                snapshot_arrays.sick.tolist(),
+                snapshot_arrays.sick_start.tolist()
+            )
+        ]
+
+    def copy_contacts(self) -> List[dict]:
+        snapshot_arrays = self.arrays
+        return [
+            {
+                simulation_config.CONTACT_PAIR_KEY: (person_x, person_y),
+                simulation_config.CONTACT_DURATION_KEY: intensity,
+                simulation_config.CONTACT_TIME_STAMP_KEY: time_stamp
+            } for person_x, person_y, intensity, time_stamp in zip(
+                snapshot_arrays.contact_person_x.tolist(),
+                snapshot_arrays.contact_person_y.tolist(),
+                snapshot_arrays.contact_intensity.tolist(),
+                snapshot_arrays.contact_time_stamp.tolist()
+            )
+        ]
+
+    def copy_aggregated_contacts(self) -> List[dict]:
+        return prepare_aggregated_edges(
+            aggregated_contacts=self.__snapshot_arrays.aggregated_contacts
         )
 
-    def __prepare_trace_arrays(self,
-                               person_trace: List[CompactPosition2D]
-                               ) -> Tuple[np.ndarray, np.ndarray]:
-        x_coords, y_coords = unzip_list(to_unzip=person_trace)
-        return np.array(x_coords, dtype=np.uint16), np.array(y_coords, dtype=np.uint16)
+    def copy_group_contacts(self) -> List[dict]:
+        return prepare_group_edges(
+            group_contacts=self.__snapshot_arrays.group_contacts
+        )
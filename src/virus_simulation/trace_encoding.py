@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, Mapping, Tuple, List
+
+import numpy as np
+
+RUN_OFFSET_DTYPE = np.int64
+DELTA_DTYPES = [np.int8, np.int16, np.int32]
+RUN_LENGTH_DTYPES = [np.uint8, np.uint16, np.uint32]
+
+PersonTrace = Tuple[np.ndarray, np.ndarray]
+
+
+@dataclass(frozen=True)
+class EncodedTraces:
+    """Traces stored as initial position of each person followed by runs of
+    identical moves (stays are runs of zero moves). Runs of i-th person are
+    run_deltas[run_offsets[i]:run_offsets[i + 1]], each repeated
+    run_lengths times. Deltas and lengths use the smallest integer types that
+    hold them.
+    """
+    steps_number: int
+    start: np.ndarray
+    run_offsets: np.ndarray
+    run_deltas: np.ndarray
+    run_lengths: np.ndarray
+
+    @property
+    def people_number(self) -> int:
+        return self.start.shape[0]
+
+    @property
+    def runs_number(self) -> int:
+        return self.run_lengths.shape[0]
+
+
+def encode_people_traces(traces: np.ndarray) -> EncodedTraces:
+    """Encodes (steps, people, 2) traces, all people at once."""
+    steps_number, people_number = traces.shape[0], traces.shape[1]
+    moves_number = max(steps_number - 1, 0)
+    start = traces[0].copy() if steps_number > 0 \
+        else np.zeros((people_number, 2), dtype=traces.dtype)
+    deltas = np.diff(traces.astype(np.int32), axis=0)
+    deltas = deltas.transpose(1, 0, 2).reshape(-1, 2)
+    if deltas.shape[0] == 0:
+        return EncodedTraces(
+            steps_number=steps_number,
+            start=start,
+            run_offsets=np.zeros(people_number + 1, dtype=RUN_OFFSET_DTYPE),
+            run_deltas=np.empty((0, 2), dtype=DELTA_DTYPES[0]),
+            run_lengths=np.empty(0, dtype=RUN_LENGTH_DTYPES[0])
+        )
+    run_begins = np.ones(deltas.shape[0], dtype=np.bool_)
+    run_begins[1:] = np.any(deltas[1:] != deltas[:-1], axis=1)
+    run_begins[::moves_number] = True
+    run_starts = np.flatnonzero(run_begins)
+    run_lengths = np.diff(np.append(run_starts, deltas.shape[0]))
+    runs_per_person = np.bincount(
+        run_starts // moves_number, minlength=people_number
+    )
+    run_deltas = deltas[run_starts]
+    return EncodedTraces(
+        steps_number=steps_number,
+        start=start,
+        run_offsets=np.concatenate(
+            ([0], np.cumsum(runs_per_person))
+        ).astype(RUN_OFFSET_DTYPE),
+        run_deltas=run_deltas.astype(
+            get_delta_dtype(max_delta=int(np.abs(run_deltas).max()))
+        ),
+        run_lengths=run_lengths.astype(
+            get_run_length_dtype(max_run_length=int(run_lengths.max()))
+        )
+    )
+
+
+def decode_trace(encoded_traces: EncodedTraces, index: int) -> np.ndarray:
+    """Decodes (steps, 2) trace of person placed at given index."""
+    start = encoded_traces.start[index]
+    trace = np.empty((encoded_traces.steps_number, 2), dtype=start.dtype)
+    if encoded_traces.steps_number == 0:
+        return trace
+    first_run = encoded_traces.run_offsets[index]
+    last_run = encoded_traces.run_offsets[index + 1]
+    moves = np.repeat(
+        encoded_traces.run_deltas[first_run:last_run].astype(np.int64),
+        encoded_traces.run_lengths[first_run:last_run].astype(np.int64),
+        axis=0
+    )
+    trace[0] = start
+    trace[1:] = start.astype(np.int64) + np.cumsum(moves, axis=0)
+    return trace
+
+
+class LazyDecodedTraces(Mapping[int, PersonTrace]):
+    """Mapping from person_id to (xs, ys) of trace that is decoded on first
+    access to given person.
+    """
+
+    def __init__(self, encoded_traces: EncodedTraces, person_id: np.ndarray):
+        self.__encoded_traces = encoded_traces
+        self.__indices = {
+            p: index for index, p in enumerate(person_id.tolist())
+        }
+        self.__decoded: Dict[int, PersonTrace] = {}
+
+    def __getitem__(self, person_id: int) -> PersonTrace:
+        if person_id not in self.__decoded:
+            trace = decode_trace(
+                encoded_traces=self.__encoded_traces,
+                index=self.__indices[person_id]
+            )
+            trace.flags.writeable = False
+            self.__decoded[person_id] = trace[:, 0], trace[:, 1]
+        return self.__decoded[person_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.__indices)
+
+    def __len__(self) -> int:
+        return len(self.__indices)
+
+
+def get_delta_dtype(max_delta: int) -> np.dtype:
+    return _get_smallest_dtype(max_value=max_delta, dtypes=DELTA_DTYPES)
+
+
+def get_run_length_dtype(max_run_length: int) -> np.dtype:
+    return _get_smallest_dtype(
+        max_value=max_run_length, dtypes=RUN_LENGTH_DTYPES
+    )
+
+
+def _get_smallest_dtype(max_value: int, dtypes: List[type]) -> np.dtype:
+    for dtype in dtypes:
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(dtypes[-1])
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import collections
+from typing import Dict, Iterator, Mapping, Optional, Tuple, OrderedDict, \
+    Union
+
+import numpy as np
+
+from src.utils.grouping import group_by_keys, linearize_positions, \
+    generate_pairs_within_groups
+from src.virus_simulation.binary_snapshots import TRACE_DTYPE, \
+    PEOPLE_ID_DTYPE, INTENSITY_DTYPE, TIME_STAMP_DTYPE
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.primitives import Direction, ReplayLog
+from src.virus_simulation.trace_encoding import PersonTrace
+
+DIRECTIONS = np.array([d.value for d in Direction], dtype=np.int64)
+RANDOM_STATE_DTYPE = np.uint64
+RANDOM_STATE_WORDS = 6
+REPLAYED_BIT_GENERATOR = "PCG64"
+DEFAULT_SEGMENT_STEPS = 64
+DEFAULT_CACHED_SEGMENTS = 16
+_WORD_BITS = 64
+_WORD_MASK = (1 << _WORD_BITS) - 1
+
+ReplayedContacts = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def move_people(positions: np.ndarray,
+                random_generator: np.random.Generator,
+                max_person_step_size: int,
+                map_bounds: np.ndarray
+                ) -> np.ndarray:
+    """Movement phase of VectorizedSimulationEngine - shared with replay, so
+    that both draw the same random numbers.
+    """
+    people_number = positions.shape[0]
+    directions = random_generator.integers(
+        0, DIRECTIONS.shape[0], people_number
+    )
+    step_sizes = random_generator.integers(
+        1, max_person_step_size + 1, (people_number, 2)
+    )
+    return np.clip(
+        positions + DIRECTIONS[directions] * step_sizes, 0, map_bounds
+    )
+
+
+def pack_random_state(random_generator: np.random.Generator) -> np.ndarray:
+    state = random_generator.bit_generator.state
+    if state["bit_generator"] != REPLAYED_BIT_GENERATOR:
+        raise SimulationError(
+            f"Only {REPLAYED_BIT_GENERATOR} random generator can be replayed."
+        )
+    generator_state = state["state"]["state"]
+    increment = state["state"]["inc"]
+    return np.array(
+        [
+            generator_state >> _WORD_BITS, generator_state & _WORD_MASK,
+            increment >> _WORD_BITS, increment & _WORD_MASK,
+            state["has_uint32"], state["uinteger"]
+        ],
+        dtype=RANDOM_STATE_DTYPE
+    )
+
+
+def unpack_random_state(packed_state: np.ndarray,
+                        random_generator: np.random.Generator
+                        ) -> None:
+    state_high, state_low, increment_high, increment_low, has_uint32, \
+        uinteger = packed_state.tolist()
+    random_generator.bit_generator.state = {
+        "bit_generator": REPLAYED_BIT_GENERATOR,
+        "state": {
+            "state": (state_high << _WORD_BITS) | state_low,
+            "inc": (increment_high << _WORD_BITS) | increment_low
+        },
+        "has_uint32": has_uint32,
+        "uinteger": uinteger
+    }
+
+
+class TraceReplayer:
+    """Regenerates positions of people by re-running movement phase from
+    states of random generator recorded at the beginning of each step.
+    Positions of all people are replayed in segments of segment_steps steps -
+    the most recently used segments are cached and positions at borders of
+    replayed segments are kept, so that any segment can be replayed without
+    replaying the preceding ones again.
+    """
+
+    def __init__(self,
+                 replay_log: ReplayLog,
+                 map_dimensions: np.ndarray,
+                 segment_steps: int = DEFAULT_SEGMENT_STEPS,
+                 max_cached_segments: int = DEFAULT_CACHED_SEGMENTS):
+        self.__replay_log = replay_log
+        self.__map_bounds = np.asarray(map_dimensions, dtype=np.int64)
+        self.__segment_steps = segment_steps
+        self.__max_cached_segments = max(max_cached_segments, 1)
+        self.__random_generator = np.random.Generator(np.random.PCG64())
+        # positions before first step of i-th segment
+        self.__segment_starts: Dict[int, np.ndarray] = {
+            0: replay_log.start.astype(np.int64)
+        }
+        self.__segments: OrderedDict[int, np.ndarray] = \
+            collections.OrderedDict()
+
+    @property
+    def steps_number(self) -> int:
+        return self.__replay_log.steps_number
+
+    @property
+    def people_number(self) -> int:
+        return self.__replay_log.start.shape[0]
+
+    def get_traces(self,
+                   first_time_stamp: int = 0,
+                   last_time_stamp: Optional[int] = None
+                   ) -> np.ndarray:
+        """(steps, people, 2) positions after steps in
+        [first_time_stamp, last_time_stamp).
+        """
+        first_time_stamp, last_time_stamp = self.__clip_steps(
+            first_time_stamp=first_time_stamp,
+            last_time_stamp=last_time_stamp
+        )
+        return self.__gather(
+            first_time_stamp=first_time_stamp,
+            last_time_stamp=last_time_stamp,
+            people=slice(None)
+        )
+
+    def get_person_trace(self, index: int) -> np.ndarray:
+        """(steps, 2) positions of person placed at given index."""
+        return self.__gather(
+            first_time_stamp=0,
+            last_time_stamp=self.steps_number,
+            people=index
+        )
+
+    def replay_contacts(self, max_y: int) -> ReplayedContacts:
+        """Regenerates contacts (person_x, person_y, intensity, time_stamp) of
+        every step - intensities are drawn right after movement.
+        """
+        replay_log = self.__replay_log
+        if not replay_log.contacts:
+            raise SimulationError("Contacts of simulation were not recorded.")
+        positions = self.__segment_starts[0]
+        contacts = []
+        for time_stamp in range(self.steps_number):
+            positions = self.__move(positions=positions, time_stamp=time_stamp)
+            person_x, person_y = generate_pairs_within_groups(
+                grouping=group_by_keys(
+                    keys=linearize_positions(positions=positions, max_y=max_y)
+                )
+            )
+            intensity = self.__random_generator.random(person_x.shape[0])
+            contacts.append((
+                person_x, person_y, intensity,
+                np.full(person_x.shape[0], time_stamp)
+            ))
+        dtypes = (
+            PEOPLE_ID_DTYPE, PEOPLE_ID_DTYPE, INTENSITY_DTYPE, TIME_STAMP_DTYPE
+        )
+        return tuple(
+            np.concatenate(
+                [np.empty(0, dtype=dtype)] + [c[column] for c in contacts]
+            ).astype(dtype)
+            for column, dtype in enumerate(dtypes)
+        )
+
+    def __clip_steps(self,
+                     first_time_stamp: int,
+                     last_time_stamp: Optional[int]
+                     ) -> Tuple[int, int]:
+        if last_time_stamp is None:
+            last_time_stamp = self.steps_number
+        last_time_stamp = min(max(last_time_stamp, 0), self.steps_number)
+        return min(max(first_time_stamp, 0), last_time_stamp), last_time_stamp
+
+    def __gather(self,
+                 first_time_stamp: int,
+                 last_time_stamp: int,
+                 people: Union[int, slice]
+                 ) -> np.ndarray:
+        parts = []
+        time_stamp = first_time_stamp
+        while time_stamp < last_time_stamp:
+            segment_index = time_stamp // self.__segment_steps
+            segment_first = segment_index * self.__segment_steps
+            segment = self.__get_segment(segment_index=segment_index)
+            parts.append(segment[
+                time_stamp - segment_first:last_time_stamp - segment_first,
+                people
+            ])
+            time_stamp = segment_first + segment.shape[0]
+        if len(parts) == 0:
+            shape = (0, self.people_number, 2) if isinstance(people, slice) \
+                else (0, 2)
+            return np.empty(shape, dtype=TRACE_DTYPE)
+        return np.concatenate(parts, axis=0)
+
+    def __get_segment(self, segment_index: int) -> np.ndarray:
+        if segment_index in self.__segments:
+            self.__segments.move_to_end(segment_index)
+            return self.__segments[segment_index]
+        # segments are replayed from the closest known start onwards
+        first_segment = max(
+            index for index in self.__segment_starts if index <= segment_index
+        )
+        for index in range(first_segment, segment_index + 1):
+            segment = self.__replay_segment(segment_index=index)
+        return segment
+
+    def __replay_segment(self, segment_index: int) -> np.ndarray:
+        first_time_stamp = segment_index * self.__segment_steps
+        last_time_stamp = min(
+            first_time_stamp + self.__segment_steps, self.steps_number
+        )
+        positions = self.__segment_starts[segment_index]
+        segment = np.empty(
+            (last_time_stamp - first_time_stamp, self.people_number, 2),
+            dtype=TRACE_DTYPE
+        )
+        for time_stamp in range(first_time_stamp, last_time_stamp):
+            positions = self.__move(positions=positions, time_stamp=time_stamp)
+            segment[time_stamp - first_time_stamp] = positions
+        self.__segment_starts[segment_index + 1] = positions
+        segment.flags.writeable = False
+        self.__segments[segment_index] = segment
+        if len(self.__segments) > self.__max_cached_segments:
+            self.__segments.popitem(last=False)
+        return segment
+
+    def __move(self, positions: np.ndarray, time_stamp: int) -> np.ndarray:
+        unpack_random_state(
+            packed_state=self.__replay_log.random_states[time_stamp],
+            random_generator=self.__random_generator
+        )
+        return move_people(
+            positions=positions,
+            random_generator=self.__random_generator,
+            max_person_step_size=self.__replay_log.max_person_step_size,
+            map_bounds=self.__map_bounds
+        )
+
+
+class LazyReplayedTraces(Mapping[int, PersonTrace]):
+    """Mapping from person_id to (xs, ys) of trace that is replayed on first
+    access to given person.
+    """
+
+    def __init__(self, trace_replayer: TraceReplayer, person_id: np.ndarray):
+        self.__trace_replayer = trace_replayer
+        self.__indices = {
+            p: index for index, p in enumerate(person_id.tolist())
+        }
+        self.__replayed: Dict[int, PersonTrace] = {}
+
+    def __getitem__(self, person_id: int) -> PersonTrace:
+        if person_id not in self.__replayed:
+            trace = self.__trace_replayer.get_person_trace(
+                index=self.__indices[person_id]
+            )
+            trace.flags.writeable = False
+            self.__replayed[person_id] = trace[:, 0], trace[:, 1]
+        return self.__replayed[person_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.__indices)
+
+    def __len__(self) -> int:
+        return len(self.__indices)
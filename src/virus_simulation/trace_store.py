@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+from src.utils.fs_utils import create_parent_dir
+from src.virus_simulation.binary_snapshots import TRACE_DTYPE
+from src.virus_simulation.errors import SimulationError
+
+DEFAULT_STEPS_CAPACITY = 128
+
+
+class TraceStore:
+    """Positions of all people after each step kept in preallocated
+    (steps, people, 2) array, optionally memory-mapped to a raw file, so that
+    long simulations are not bounded by RAM. Capacity is doubled when
+    exhausted. Already written steps are never modified, so views returned
+    by get_traces() stay valid while simulation proceeds (unless steps
+    are dropped).
+    """
+
+    @classmethod
+    def initialize(cls,
+                   people_number: int,
+                   max_coordinate: int,
+                   steps_capacity: Optional[int] = None,
+                   backing_path: Optional[str] = None
+                   ) -> TraceStore:
+        if max_coordinate > np.iinfo(TRACE_DTYPE).max:
+            raise SimulationError(
+                f"Map coordinates up to {max_coordinate} do not fit into "
+                f"{np.dtype(TRACE_DTYPE).name} traces."
+            )
+        return cls(
+            people_number=people_number,
+            steps_capacity=steps_capacity or DEFAULT_STEPS_CAPACITY,
+            backing_path=backing_path
+        )
+
+    def __init__(self,
+                 people_number: int,
+                 steps_capacity: int,
+                 backing_path: Optional[str] = None):
+        self.__people_number = people_number
+        self.__backing_path = backing_path
+        self.__steps_number = 0
+        # steps before first_time_stamp were dropped, positions of t-th step
+        # are kept in row t - first_time_stamp
+        self.__first_time_stamp = 0
+        if backing_path is not None:
+            create_parent_dir(path=backing_path)
+            open(backing_path, "wb").close()
+        self.__positions = self.__allocate(steps_capacity=max(steps_capacity, 1))
+
+    @property
+    def people_number(self) -> int:
+        return self.__people_number
+
+    @property
+    def steps_number(self) -> int:
+        return self.__steps_number
+
+    @property
+    def steps_capacity(self) -> int:
+        return self.__positions.shape[0]
+
+    @property
+    def first_time_stamp(self) -> int:
+        return self.__first_time_stamp
+
+    @property
+    def memory_bytes(self) -> int:
+        """Size of positions kept in RAM (none once memory-mapped)."""
+        if isinstance(self.__positions, np.memmap):
+            return 0
+        return self.__positions.nbytes
+
+    def append(self, positions: np.ndarray) -> None:
+        if self.__stored_steps_number == self.steps_capacity:
+            self.__grow()
+        self.__positions[self.__stored_steps_number] = positions
+        self.__steps_number += 1
+
+    def extend(self, traces: np.ndarray) -> None:
+        stored_steps_number = self.__stored_steps_number
+        while stored_steps_number + traces.shape[0] > self.steps_capacity:
+            self.__grow()
+        self.__positions[
+            stored_steps_number:stored_steps_number + traces.shape[0]
+        ] = traces
+        self.__steps_number += traces.shape[0]
+
+    def drop_steps_before(self, time_stamp: int) -> None:
+        """Forgets positions recorded before given time stamp, so that
+        memory stays bounded when history is not needed. Views returned
+        before are invalidated.
+        """
+        dropped_steps_number = min(
+            time_stamp, self.__steps_number
+        ) - self.__first_time_stamp
+        if dropped_steps_number <= 0:
+            return
+        stored_steps_number = self.__stored_steps_number
+        self.__positions[:stored_steps_number - dropped_steps_number] = \
+            self.__positions[dropped_steps_number:stored_steps_number]
+        self.__first_time_stamp += dropped_steps_number
+
+    def get_positions(self, time_stamp: int) -> np.ndarray:
+        return self.get_traces(first_time_stamp=time_stamp)[0]
+
+    def get_traces(self, first_time_stamp: int = 0) -> np.ndarray:
+        """Read-only (steps, people, 2) view of positions recorded since
+        given time stamp.
+        """
+        if first_time_stamp < self.__first_time_stamp:
+            raise SimulationError(
+                f"Positions before step {self.__first_time_stamp} were "
+                f"dropped."
+            )
+        traces = self.__positions[
+            first_time_stamp - self.__first_time_stamp:
+            self.__stored_steps_number
+        ].view()
+        traces.flags.writeable = False
+        return traces
+
+    def spill(self, backing_path: str) -> None:
+        """Moves positions kept in RAM to memory-mapped file, which backs
+        following steps as well.
+        """
+        if isinstance(self.__positions, np.memmap):
+            return
+        self.__backing_path = backing_path
+        create_parent_dir(path=backing_path)
+        open(backing_path, "wb").close()
+        positions = self.__allocate(steps_capacity=self.steps_capacity)
+        positions[:self.__stored_steps_number] = \
+            self.__positions[:self.__stored_steps_number]
+        self.__positions = positions
+
+    def flush(self) -> None:
+        if isinstance(self.__positions, np.memmap):
+            self.__positions.flush()
+
+    @property
+    def __stored_steps_number(self) -> int:
+        return self.__steps_number - self.__first_time_stamp
+
+    def __grow(self) -> None:
+        self.flush()
+        positions = self.__allocate(steps_capacity=2 * self.steps_capacity)
+        if not isinstance(positions, np.memmap):
+            positions[:self.__stored_steps_number] = \
+                self.__positions[:self.__stored_steps_number]
+        self.__positions = positions
+
+    def __allocate(self, steps_capacity: int) -> np.ndarray:
+        shape = (steps_capacity, self.__people_number, 2)
+        if self.__backing_path is None:
+            return np.zeros(shape, dtype=TRACE_DTYPE)
+        # extending the file keeps already written steps in place
+        with open(self.__backing_path, "r+b") as backing_file:
+            backing_file.truncate(
+                int(np.prod(shape)) * np.dtype(TRACE_DTYPE).itemsize
+            )
+        return np.memmap(
+            self.__backing_path, dtype=TRACE_DTYPE, mode="r+", shape=shape
+        )
@@ -0,0 +1,33 @@
+from typing import Tuple
+
+import numpy as np
+
+from src.utils.grouping import Grouping
+
+# Contact intensity is drawn from U[0, 1), so a single contact with a sick
+# person transmits the virus with probability E[intensity] * p = p / 2.
+MEAN_CONTACT_INTENSITY = 0.5
+
+
+def calculate_infection_risk(occupancy: Grouping,
+                             sick: np.ndarray,
+                             transmission_probability: float
+                             ) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns healthy people sharing a cell with at least one sick person
+    together with probability of being infected by any of them, which is
+    distributed as if each contact with sick person was flipped separately.
+    """
+    if occupancy.order.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    sick_in_order = sick[occupancy.order]
+    sick_per_group = np.add.reduceat(
+        sick_in_order.astype(np.int64), occupancy.group_starts
+    )
+    sick_around = np.repeat(sick_per_group, occupancy.group_sizes)
+    endangered = (sick_around > 0) & ~sick_in_order
+    contact_transmission_probability = \
+        MEAN_CONTACT_INTENSITY * transmission_probability
+    infection_probability = 1.0 - np.power(
+        1.0 - contact_transmission_probability, sick_around[endangered]
+    )
+    return occupancy.order[endangered], infection_probability
@@ -0,0 +1,770 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Iterator, Tuple
+
+import numpy as np
+
+from src.utils.iterables import iterate_buffered
+from src.utils.grouping import Grouping, group_by_keys, linearize_positions
+from src.virus_simulation.checkpointing import EngineCheckpoint, \
+    EngineParameters, RestoredHistory, load_checkpoints_chain, \
+    restore_history, check_engine_parameters, dump_random_generator_state, \
+    restore_random_generator, ARRAY_RANDOM_STATE_KEY
+from src.virus_simulation.contact_index import ContactsSlice
+from src.virus_simulation.crowding import CrowdingPolicy, GroupContacts, \
+    EXACT_CROWDING_POLICY, EXACT_CROWDING, GROUP_CROWDING, \
+    generate_cell_contacts
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.history_spilling import MemoryBudget
+from src.virus_simulation.metrics import MetricsRecorder, \
+    DISABLED_METRICS_RECORDER, MOVEMENT_PHASE, OCCUPANCY_PHASE, MEETINGS_PHASE, \
+    HEALTH_UPDATE_PHASE, CONTACTS_GENERATED_METRIC, NEW_INFECTIONS_METRIC, \
+    GROUP_CONTACTS_METRIC, record_occupancy_metrics
+from src.virus_simulation.primitives import Map, Person, Position2D, Contact, \
+    SimulationState, SimulationStateDelta, SimulationStep, ReplayLog, NOT_SICK
+from src.virus_simulation.contacts_aggregation import AggregatedContacts, \
+    ContactsAggregator
+from src.virus_simulation.trace_replay import move_people, pack_random_state, \
+    RANDOM_STATE_DTYPE, RANDOM_STATE_WORDS
+from src.virus_simulation.trace_store import TraceStore
+from src.virus_simulation.transmission import calculate_infection_risk
+import src.config as global_config
+
+
+logging.getLogger().setLevel(global_config.LOGGING_LEVEL)
+
+
+
+@dataclass(frozen=True)
+class SimulationStateViews:
+    """Read-only views of engine arrays since given step, cheap enough to be
+    captured between steps. Person and Contact records are materialized
+    from them later, e.g. in background snapshot writer thread.
+    """
+    map: Map
+    first_time_stamp: int
+    sick: np.ndarray
+    initially_sick: np.ndarray
+    sick_start: np.ndarray
+    positions: np.ndarray
+    # meetings of consecutive steps since meetings_time_stamp (earlier ones
+    # were spilled)
+    meetings_time_stamp: int
+    meetings_x: Tuple[np.ndarray, ...]
+    meetings_y: Tuple[np.ndarray, ...]
+    meetings_intensity: Tuple[np.ndarray, ...]
+    # positions after each step since first_time_stamp
+    people_traces: np.ndarray
+    aggregated_contacts: Optional[AggregatedContacts] = None
+    spilled_meetings: Optional[ContactsSlice] = None
+    group_contacts: Optional[Tuple[GroupContacts, ...]] = None
+    replay_log: Optional[ReplayLog] = None
+
+    @property
+    def people_number(self) -> int:
+        return self.sick.shape[0]
+
+    def materialize(self) -> SimulationState:
+        group_contacts = None
+        if self.group_contacts is not None:
+            group_contacts = GroupContacts.concatenate(
+                group_contacts=list(self.group_contacts)
+            ).since(time_stamp=self.first_time_stamp)
+        return SimulationState(
+            map=self.map,
+            people=self.materialize_people(
+                people_ids=np.arange(self.people_number)
+            ),
+            meetings=self.materialize_meetings(),
+            people_traces=self.people_traces,
+            aggregated_contacts=self.aggregated_contacts,
+            spilled_meetings=self.spilled_meetings,
+            replay_log=self.replay_log,
+            group_contacts=group_contacts
+        )
+
+    def materialize_people(self, people_ids: np.ndarray) -> List[Person]:
+        return [
+            self.__materialize_person(
+                person_id=person_id,
+                time_stamp=None,
+                position=self.positions[person_id]
+            ) for person_id in people_ids.tolist()
+        ]
+
+    def materialize_meetings(self) -> List[Contact]:
+        meetings = []
+        for step, (meetings_x, meetings_y, intensity) in enumerate(zip(
+                self.meetings_x, self.meetings_y, self.meetings_intensity)):
+            time_stamp = self.meetings_time_stamp + step
+            positions = self.people_traces[time_stamp - self.first_time_stamp]
+            meetings.extend(
+                Contact(
+                    person_x=self.__materialize_person(
+                        person_id=int(x),
+                        time_stamp=time_stamp,
+                        position=positions[x]
+                    ),
+                    person_y=self.__materialize_person(
+                        person_id=int(y),
+                        time_stamp=time_stamp,
+                        position=positions[y]
+                    ),
+                    intensity=float(i),
+                    time_stamp=time_stamp
+                ) for x, y, i in zip(meetings_x, meetings_y, intensity)
+            )
+        return meetings
+
+    def __materialize_person(self,
+                             person_id: int,
+                             time_stamp: Optional[int],
+                             position: np.ndarray
+                             ) -> Person:
+        sick_start = int(self.sick_start[person_id])
+        if time_stamp is None:
+            sick = bool(self.sick[person_id])
+        else:
+            sick = bool(self.initially_sick[person_id]) or \
+                NOT_SICK < sick_start < time_stamp
+        return Person(
+            person_id=person_id,
+            sick=sick,
+            position=Position2D(x=int(position[0]), y=int(position[1])),
+            sick_start=sick_start if sick else None
+        )
+
+
+class VectorizedSimulationEngine:
+
+    @classmethod
+    def initialize(cls,
+                   map_size: int,
+                   max_person_step_size: int,
+                   people_number: int,
+                   initial_seek_people: int,
+                   transmission_probability: float,
+                   random_seed: Optional[int] = None,
+                   transmission_only: bool = False,
+                   aggregate_contacts: bool = False,
+                   metrics_recorder: Optional[MetricsRecorder] = None,
+                   trace_steps_capacity: Optional[int] = None,
+                   traces_path: Optional[str] = None,
+                   memory_budget: Optional[MemoryBudget] = None,
+                   crowding_policy: Optional[CrowdingPolicy] = None
+                   ) -> VectorizedSimulationEngine:
+        simulation_map = Map(
+            max_x=map_size,
+            max_y=map_size
+        )
+        random_generator = np.random.default_rng(random_seed)
+        positions = np.stack([
+            random_generator.integers(0, simulation_map.max_x, people_number),
+            random_generator.integers(0, simulation_map.max_y, people_number)
+        ], axis=1)
+        sick_people = random_generator.choice(
+            people_number, size=initial_seek_people, replace=False
+        )
+        sick = np.zeros(people_number, dtype=np.bool_)
+        sick[sick_people] = True
+        sick_start = np.full(people_number, NOT_SICK, dtype=np.int64)
+        sick_start[sick_people] = 0
+        return cls(
+            simulation_map=simulation_map,
+            positions=positions,
+            sick=sick,
+            sick_start=sick_start,
+            transmission_probability=transmission_probability,
+            max_person_step_size=max_person_step_size,
+            random_generator=random_generator,
+            transmission_only=transmission_only,
+            aggregate_contacts=aggregate_contacts,
+            metrics_recorder=metrics_recorder,
+            trace_store=TraceStore.initialize(
+                people_number=people_number,
+                max_coordinate=map_size,
+                steps_capacity=trace_steps_capacity,
+                backing_path=traces_path
+            ),
+            memory_budget=memory_budget,
+            crowding_policy=crowding_policy
+        )
+
+    @classmethod
+    def restore(cls,
+                checkpoint_path: str,
+                metrics_recorder: Optional[MetricsRecorder] = None,
+                trace_steps_capacity: Optional[int] = None,
+                traces_path: Optional[str] = None,
+                memory_budget: Optional[MemoryBudget] = None
+                ) -> VectorizedSimulationEngine:
+        checkpoints = load_checkpoints_chain(checkpoint_path=checkpoint_path)
+        checkpoint = checkpoints[-1]
+        parameters = checkpoint.engine_parameters
+        check_engine_parameters(
+            engine_parameters=parameters,
+            engine=cls.__name__
+        )
+        history = restore_history(checkpoints=checkpoints)
+        trace_store = TraceStore.initialize(
+            people_number=checkpoint.positions.shape[0],
+            max_coordinate=max(parameters.max_x, parameters.max_y),
+            steps_capacity=trace_steps_capacity,
+            backing_path=traces_path
+        )
+        trace_store.extend(traces=history.traces)
+        simulation_engine = cls(
+            simulation_map=Map(max_x=parameters.max_x, max_y=parameters.max_y),
+            positions=checkpoint.positions,
+            sick=checkpoint.sick,
+            sick_start=checkpoint.sick_start,
+            transmission_probability=parameters.transmission_probability,
+            max_person_step_size=parameters.max_person_step_size,
+            random_generator=restore_random_generator(
+                state=checkpoint.random_state[ARRAY_RANDOM_STATE_KEY]
+            ),
+            transmission_only=parameters.transmission_only,
+            aggregate_contacts=parameters.aggregate_contacts,
+            metrics_recorder=metrics_recorder,
+            trace_store=trace_store,
+            memory_budget=memory_budget,
+            crowding_policy=CrowdingPolicy(
+                mode=parameters.crowding_mode,
+                max_partners=parameters.max_partners
+            )
+        )
+        simulation_engine.__restore_history(
+            checkpoint=checkpoint,
+            history=history
+        )
+        return simulation_engine
+
+    def __init__(self,
+                 simulation_map: Map,
+                 positions: np.ndarray,
+                 sick: np.ndarray,
+                 sick_start: np.ndarray,
+                 transmission_probability: float,
+                 max_person_step_size: int,
+                 random_generator: Optional[np.random.Generator] = None,
+                 transmission_only: bool = False,
+                 aggregate_contacts: bool = False,
+                 metrics_recorder: Optional[MetricsRecorder] = None,
+                 trace_store: Optional[TraceStore] = None,
+                 memory_budget: Optional[MemoryBudget] = None,
+                 crowding_policy: Optional[CrowdingPolicy] = None
+                 ):
+        self.__simulation_map = simulation_map
+        self.__map_bounds = np.array(
+            [simulation_map.max_x, simulation_map.max_y], dtype=np.int64
+        )
+        self.__positions = np.asarray(positions, dtype=np.int64)
+        self.__initial_positions = self.__positions.copy()
+        self.__sick = np.asarray(sick, dtype=np.bool_).copy()
+        self.__initially_sick = self.__sick.copy()
+        self.__sick_start = np.asarray(sick_start, dtype=np.int64).copy()
+        self.__transmission_probability = transmission_probability
+        self.__max_person_step_size = max_person_step_size
+        if random_generator is None:
+            random_generator = np.random.default_rng()
+        self.__random_generator = random_generator
+        self.__transmission_only = transmission_only
+        self.__contacts_aggregator = ContactsAggregator(
+            people_number=self.people_number
+        ) if aggregate_contacts else None
+        self.__metrics_recorder = metrics_recorder or DISABLED_METRICS_RECORDER
+        self.__crowding_policy = crowding_policy or EXACT_CROWDING_POLICY
+        self.__time_stamp: int = -1
+        self.__meetings_x: List[np.ndarray] = []
+        self.__meetings_y: List[np.ndarray] = []
+        self.__meetings_intensity: List[np.ndarray] = []
+        # meetings of steps before spilled_steps were spilled to disk, lists
+        # above hold following ones
+        self.__spilled_steps = 0
+        self.__meetings_bytes = 0
+        self.__memory_budget = memory_budget
+        # group contacts of hot cells (never spilled, as they are compact)
+        self.__group_contacts: List[GroupContacts] = []
+        # states of random generator at the beginning of each step, unknown
+        # for steps taken before restoring from checkpoint
+        self.__random_states: Optional[List[np.ndarray]] = []
+        self.__history_dropped = False
+        self.__last_step_contacts = (
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float64)
+        )
+        self.__last_step_infected = np.empty(0, dtype=np.int64)
+        if trace_store is None:
+            trace_store = TraceStore.initialize(
+                people_number=self.people_number,
+                max_coordinate=max(simulation_map.max_x, simulation_map.max_y)
+            )
+        self.__trace_store = trace_store
+
+    @property
+    def people_number(self) -> int:
+        return self.__positions.shape[0]
+
+    @property
+    def time_stamp(self) -> int:
+        return self.__time_stamp
+
+    @property
+    def sick_people_number(self) -> int:
+        return int(self.__sick.sum())
+
+    def take_simulation_step(self) -> None:
+        self.__time_stamp += 1
+        metrics_recorder = self.__metrics_recorder
+        metrics_recorder.start_step(time_stamp=self.__time_stamp)
+        with metrics_recorder.measure(phase=MOVEMENT_PHASE):
+            self.__update_people_positions()
+        with metrics_recorder.measure(phase=OCCUPANCY_PHASE):
+            occupancy = self.__calculate_occupancy()
+        if metrics_recorder.enabled:
+            record_occupancy_metrics(
+                metrics_recorder=metrics_recorder,
+                occupancy=occupancy,
+                crowding_policy=self.__crowding_policy
+            )
+        if self.__transmission_only:
+            with metrics_recorder.measure(phase=HEALTH_UPDATE_PHASE):
+                self.__update_people_health_status_per_cell(occupancy=occupancy)
+            meetings_x = meetings_y = np.empty(0, dtype=np.int64)
+            intensity = np.empty(0, dtype=np.float64)
+        else:
+            with metrics_recorder.measure(phase=MEETINGS_PHASE):
+                cell_contacts = generate_cell_contacts(
+                    occupancy=occupancy,
+                    crowding_policy=self.__crowding_policy,
+                    random_generator=self.__random_generator
+                )
+                meetings_x = cell_contacts.person_x
+                meetings_y = cell_contacts.person_y
+                intensity = self.__random_generator.random(meetings_x.shape[0])
+            metrics_recorder.record(
+                metric=CONTACTS_GENERATED_METRIC,
+                value=meetings_x.shape[0]
+            )
+            metrics_recorder.record(
+                metric=GROUP_CONTACTS_METRIC,
+                value=cell_contacts.group_cells.groups_number
+            )
+            with metrics_recorder.measure(phase=HEALTH_UPDATE_PHASE):
+                self.__update_people_health_status(
+                    meetings_x=meetings_x,
+                    meetings_y=meetings_y,
+                    intensity=intensity,
+                    group_cells=cell_contacts.group_cells
+                )
+            if cell_contacts.group_cells.groups_number > 0 and \
+                    not self.__history_dropped:
+                self.__group_contacts.append(GroupContacts.from_grouping(
+                    grouping=cell_contacts.group_cells,
+                    time_stamp=self.__time_stamp
+                ))
+        self.__last_step_contacts = (meetings_x, meetings_y, intensity)
+        if self.__contacts_aggregator is not None:
+            with metrics_recorder.measure(phase=MEETINGS_PHASE):
+                self.__contacts_aggregator.add_contacts(
+                    person_x=meetings_x,
+                    person_y=meetings_y,
+                    intensity=intensity,
+                    time_stamp=self.__time_stamp
+                )
+            meetings_x = meetings_y = np.empty(0, dtype=np.int64)
+            intensity = np.empty(0, dtype=np.float64)
+        if not self.__history_dropped:
+            self.__meetings_x.append(meetings_x)
+            self.__meetings_y.append(meetings_y)
+            self.__meetings_intensity.append(intensity)
+            self.__meetings_bytes += \
+                meetings_x.nbytes + meetings_y.nbytes + intensity.nbytes
+        if self.__memory_budget is not None:
+            self.__enforce_memory_budget()
+
+    def iter_steps(self,
+                   steps: int,
+                   drop_history: bool = False,
+                   buffer_steps: int = 0
+                   ) -> Iterator[SimulationStep]:
+        """Takes given number of steps yielding delta of each one. With
+        buffer_steps > 0 steps are taken by background thread up to
+        buffer_steps ahead of consumer, so engine must not be used otherwise
+        until iteration ends. With drop_history history is dropped when
+        iteration starts (not when iter_steps() is called) and cannot be
+        restored afterwards, see drop_history().
+        """
+        return iterate_buffered(
+            items=self.__generate_steps(
+                steps=steps,
+                drop_history=drop_history
+            ),
+            buffer_size=buffer_steps
+        )
+
+    def drop_history(self) -> None:
+        """Stops keeping contacts and traces of past steps, so that memory
+        does not grow with length of simulation (contacts are still
+        aggregated if requested). It cannot be undone - snapshots and
+        checkpoints cannot be taken afterwards.
+        """
+        self.__history_dropped = True
+        self.__meetings_x = []
+        self.__meetings_y = []
+        self.__meetings_intensity = []
+        self.__meetings_bytes = 0
+        self.__random_states = None
+        self.__group_contacts = []
+        self.__trace_store.drop_steps_before(time_stamp=self.__time_stamp)
+
+    def get_replay_log(self) -> ReplayLog:
+        self.__check_history()
+        if self.__random_states is None:
+            raise SimulationError(
+                "Steps taken before restoring simulation cannot be replayed."
+            )
+        return ReplayLog(
+            start=self.__initial_positions,
+            random_states=np.array(
+                self.__random_states, dtype=RANDOM_STATE_DTYPE
+            ).reshape(-1, RANDOM_STATE_WORDS),
+            max_person_step_size=self.__max_person_step_size,
+            contacts=not self.__transmission_only and
+            self.__contacts_aggregator is None and
+            self.__crowding_policy.mode == EXACT_CROWDING
+        )
+
+    def get_simulation_state(self) -> SimulationState:
+        return self.capture_simulation_state().materialize()
+
+    def capture_simulation_state(self) -> SimulationStateViews:
+        """Views of whole history, materialized into SimulationState in
+        O(history) time only when needed.
+        """
+        return self.__capture_views(first_time_stamp=0)
+
+    def get_simulation_state_delta(self,
+                                   since_time_stamp: int
+                                   ) -> SimulationStateDelta:
+        views = self.__capture_views(first_time_stamp=since_time_stamp)
+        infected_people_ids = np.flatnonzero(
+            views.sick & (views.sick_start >= since_time_stamp)
+        )
+        aggregated_contacts = None
+        if views.aggregated_contacts is not None:
+            aggregated_contacts = views.aggregated_contacts.updated_since(
+                time_stamp=since_time_stamp
+            )
+        return SimulationStateDelta(
+            map=self.__simulation_map,
+            people_number=self.people_number,
+            first_time_stamp=since_time_stamp,
+            last_time_stamp=self.__time_stamp,
+            infected_people=views.materialize_people(
+                people_ids=infected_people_ids
+            ),
+            meetings=views.materialize_meetings(),
+            people_traces=views.people_traces,
+            spilled_meetings=views.spilled_meetings,
+            aggregated_contacts=aggregated_contacts
+        )
+
+    def get_checkpoint(self, since_time_stamp: int) -> EngineCheckpoint:
+        self.__check_history()
+        meetings_x, meetings_y, meetings_intensity, meetings_time_stamp = \
+            self.__collect_meetings(first_time_stamp=since_time_stamp)
+        aggregated_contacts = None
+        if self.__contacts_aggregator is not None:
+            aggregated_contacts = \
+                self.__contacts_aggregator.get_aggregated_contacts()
+        return EngineCheckpoint(
+            engine_parameters=EngineParameters(
+                engine=type(self).__name__,
+                max_x=self.__simulation_map.max_x,
+                max_y=self.__simulation_map.max_y,
+                transmission_probability=self.__transmission_probability,
+                max_person_step_size=self.__max_person_step_size,
+                transmission_only=self.__transmission_only,
+                aggregate_contacts=self.__contacts_aggregator is not None,
+                crowding_mode=self.__crowding_policy.mode,
+                max_partners=self.__crowding_policy.max_partners
+            ),
+            random_state={
+                ARRAY_RANDOM_STATE_KEY: dump_random_generator_state(
+                    random_generator=self.__random_generator
+                )
+            },
+            time_stamp=self.__time_stamp,
+            positions=self.__positions,
+            sick=self.__sick,
+            sick_start=self.__sick_start,
+            initially_sick=self.__initially_sick,
+            first_time_stamp=since_time_stamp,
+            meetings_x=meetings_x,
+            meetings_y=meetings_y,
+            meetings_intensity=meetings_intensity,
+            meetings_time_stamp=meetings_time_stamp,
+            traces=np.array(
+                self.__trace_store.get_traces(first_time_stamp=since_time_stamp)
+            ),
+            aggregated_contacts=aggregated_contacts,
+            group_contacts=self.__get_group_contacts(
+                first_time_stamp=since_time_stamp
+            )
+        )
+
+    def __generate_steps(self,
+                         steps: int,
+                         drop_history: bool
+                         ) -> Iterator[SimulationStep]:
+        if drop_history:
+            self.drop_history()
+        for _ in range(steps):
+            previous_positions = self.__positions
+            self.take_simulation_step()
+            meetings_x, meetings_y, intensity = self.__last_step_contacts
+            yield SimulationStep(
+                time_stamp=self.__time_stamp,
+                positions=self.__positions,
+                moves=self.__positions - previous_positions,
+                contacts_person_x=meetings_x,
+                contacts_person_y=meetings_y,
+                contacts_intensity=intensity,
+                infected_people=self.__last_step_infected
+            )
+
+    def __check_history(self) -> None:
+        if self.__history_dropped:
+            raise SimulationError("History of simulation was dropped.")
+
+    def __enforce_memory_budget(self) -> None:
+        spill_meetings = self.__memory_budget.enforce(
+            trace_store=self.__trace_store,
+            contacts_bytes=self.__meetings_bytes
+        )
+        if not spill_meetings:
+            return
+        meetings_x, meetings_y, meetings_intensity, meetings_time_stamp = \
+            self.__collect_meetings(first_time_stamp=self.__spilled_steps)
+        self.__memory_budget.contacts_spill.append(
+            person_x=meetings_x,
+            person_y=meetings_y,
+            intensity=meetings_intensity,
+            time_stamp=meetings_time_stamp
+        )
+        self.__spilled_steps = self.__time_stamp + 1
+        self.__meetings_x = []
+        self.__meetings_y = []
+        self.__meetings_intensity = []
+        self.__meetings_bytes = 0
+
+    def __get_spilled_meetings(self,
+                               first_time_stamp: int
+                               ) -> Optional[ContactsSlice]:
+        if first_time_stamp >= self.__spilled_steps:
+            return None
+        return self.__memory_budget.contacts_spill.get_contacts(
+            first_time_stamp=first_time_stamp
+        )
+
+    def __get_group_contacts(self,
+                             first_time_stamp: int
+                             ) -> Optional[GroupContacts]:
+        if self.__crowding_policy.mode != GROUP_CROWDING:
+            return None
+        return GroupContacts.concatenate(
+            group_contacts=self.__group_contacts
+        ).since(time_stamp=first_time_stamp)
+
+    def __collect_meetings(self,
+                           first_time_stamp: int
+                           ) -> Tuple[np.ndarray, ...]:
+        """Arrays of meetings (spilled ones included) since given step."""
+        steps = range(
+            max(first_time_stamp, self.__spilled_steps), self.__time_stamp + 1
+        )
+        spilled_meetings = self.__get_spilled_meetings(
+            first_time_stamp=first_time_stamp
+        )
+        leading_arrays = ([], [], [], [])
+        if spilled_meetings is not None:
+            leading_arrays = (
+                [spilled_meetings.person_x],
+                [spilled_meetings.person_y],
+                [spilled_meetings.intensity],
+                [spilled_meetings.time_stamp]
+            )
+        offset = self.__spilled_steps
+        return (
+            self.__concatenate_steps(
+                arrays=leading_arrays[0] +
+                [self.__meetings_x[t - offset] for t in steps],
+                dtype=np.int64
+            ),
+            self.__concatenate_steps(
+                arrays=leading_arrays[1] +
+                [self.__meetings_y[t - offset] for t in steps],
+                dtype=np.int64
+            ),
+            self.__concatenate_steps(
+                arrays=leading_arrays[2] +
+                [self.__meetings_intensity[t - offset] for t in steps],
+                dtype=np.float64
+            ),
+            self.__concatenate_steps(
+                arrays=leading_arrays[3] + [
+                    np.full(self.__meetings_x[t - offset].shape[0], t)
+                    for t in steps
+                ],
+                dtype=np.int64
+            )
+        )
+
+    @staticmethod
+    def __concatenate_steps(arrays: List[np.ndarray],
+                            dtype: type
+                            ) -> np.ndarray:
+        return np.concatenate([np.empty(0, dtype=dtype)] + arrays).astype(dtype)
+
+    def __restore_history(self,
+                          checkpoint: EngineCheckpoint,
+                          history: RestoredHistory
+                          ) -> None:
+        self.__time_stamp = checkpoint.time_stamp
+        self.__initially_sick = checkpoint.initially_sick.astype(np.bool_)
+        self.__random_states = None
+        offsets = np.searchsorted(
+            history.meetings_time_stamp, np.arange(self.__time_stamp + 2)
+        ).tolist()
+        steps = list(zip(offsets[:-1], offsets[1:]))
+        self.__meetings_x = [history.meetings_x[b:e] for b, e in steps]
+        self.__meetings_y = [history.meetings_y[b:e] for b, e in steps]
+        self.__meetings_intensity = [
+            history.meetings_intensity[b:e] for b, e in steps
+        ]
+        self.__meetings_bytes = history.meetings_x.nbytes + \
+            history.meetings_y.nbytes + history.meetings_intensity.nbytes
+        self.__group_contacts = [history.group_contacts]
+        if checkpoint.aggregated_contacts is not None:
+            self.__contacts_aggregator = ContactsAggregator.restore(
+                people_number=self.people_number,
+                aggregated_contacts=checkpoint.aggregated_contacts
+            )
+
+    def __update_people_positions(self) -> None:
+        if self.__random_states is not None:
+            self.__random_states.append(
+                pack_random_state(random_generator=self.__random_generator)
+            )
+        self.__positions = move_people(
+            positions=self.__positions,
+            random_generator=self.__random_generator,
+            max_person_step_size=self.__max_person_step_size,
+            map_bounds=self.__map_bounds
+        )
+        self.__trace_store.append(positions=self.__positions)
+        if self.__history_dropped:
+            self.__trace_store.drop_steps_before(time_stamp=self.__time_stamp)
+
+    def __calculate_occupancy(self) -> Grouping:
+        cell_ids = linearize_positions(
+            positions=self.__positions,
+            max_y=self.__simulation_map.max_y
+        )
+        return group_by_keys(keys=cell_ids)
+
+    def __update_people_health_status(self,
+                                      meetings_x: np.ndarray,
+                                      meetings_y: np.ndarray,
+                                      intensity: np.ndarray,
+                                      group_cells: Grouping
+                                      ) -> None:
+        endangered = self.__sick[meetings_x] | self.__sick[meetings_y]
+        coins = self.__random_generator.random(int(endangered.sum()))
+        transmission = np.zeros_like(endangered)
+        transmission[endangered] = \
+            coins < intensity[endangered] * self.__transmission_probability
+        exposed = np.concatenate(
+            (meetings_x[transmission], meetings_y[transmission])
+        )
+        if group_cells.groups_number > 0:
+            # members of group contact meet each other with mean intensity
+            endangered_people, infection_probability = \
+                calculate_infection_risk(
+                    occupancy=group_cells,
+                    sick=self.__sick,
+                    transmission_probability=self.__transmission_probability
+                )
+            group_coins = self.__random_generator.random(
+                endangered_people.shape[0]
+            )
+            exposed = np.concatenate((
+                exposed, endangered_people[group_coins < infection_probability]
+            ))
+        recently_infected = np.unique(exposed[~self.__sick[exposed]])
+        self.__mark_people_sick(recently_infected=recently_infected)
+
+    def __update_people_health_status_per_cell(self,
+                                               occupancy: Grouping
+                                               ) -> None:
+        endangered_people, infection_probability = calculate_infection_risk(
+            occupancy=occupancy,
+            sick=self.__sick,
+            transmission_probability=self.__transmission_probability
+        )
+        coins = self.__random_generator.random(endangered_people.shape[0])
+        self.__mark_people_sick(
+            recently_infected=endangered_people[coins < infection_probability]
+        )
+
+    def __mark_people_sick(self, recently_infected: np.ndarray) -> None:
+        self.__metrics_recorder.record(
+            metric=NEW_INFECTIONS_METRIC,
+            value=recently_infected.shape[0]
+        )
+        if recently_infected.shape[0] > 0:
+            logging.info(
+                f"People recently infected: {recently_infected.shape[0]}"
+            )
+        self.__sick[recently_infected] = True
+        self.__sick_start[recently_infected] = self.__time_stamp
+        self.__last_step_infected = recently_infected.astype(np.int64)
+
+    def __capture_views(self, first_time_stamp: int) -> SimulationStateViews:
+        self.__check_history()
+        meetings_time_stamp = max(first_time_stamp, self.__spilled_steps)
+        meetings_offset = meetings_time_stamp - self.__spilled_steps
+        aggregated_contacts = None
+        if self.__contacts_aggregator is not None:
+            aggregated_contacts = \
+                self.__contacts_aggregator.get_aggregated_contacts()
+        group_contacts = None
+        if self.__crowding_policy.mode == GROUP_CROWDING:
+            group_contacts = tuple(self.__group_contacts)
+        # health arrays are updated in place, while positions are replaced
+        return SimulationStateViews(
+            map=self.__simulation_map,
+            first_time_stamp=first_time_stamp,
+            sick=self.__sick.copy(),
+            initially_sick=self.__initially_sick,
+            sick_start=self.__sick_start.copy(),
+            positions=self.__positions,
+            meetings_time_stamp=meetings_time_stamp,
+            meetings_x=tuple(self.__meetings_x[meetings_offset:]),
+            meetings_y=tuple(self.__meetings_y[meetings_offset:]),
+            meetings_intensity=tuple(
+                self.__meetings_intensity[meetings_offset:]
+            ),
+            people_traces=self.__trace_store.get_traces(
+                first_time_stamp=first_time_stamp
+            ),
+            aggregated_contacts=aggregated_contacts,
+            spilled_meetings=self.__get_spilled_meetings(
+                first_time_stamp=first_time_stamp
+            ),
+            group_contacts=group_contacts
+        )
@@ -0,0 +1,45 @@
+from typing import Type, Union
+
+import numpy as np
+
+from src.virus_simulation.crowding import CrowdingPolicy, GROUP_CROWDING
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+
+Engine = Union[SimulationEngine, VectorizedSimulationEngine]
+
+# crowded enough for run_simulation() to record group contacts
+GROUP_CROWDING_PARAMETERS = {
+    "crowding_policy": CrowdingPolicy(mode=GROUP_CROWDING, max_partners=2)
+}
+
+
+def run_simulation(engine_class: Type[Engine] = VectorizedSimulationEngine,
+                   steps: int = 10,
+                   **parameters
+                   ) -> Engine:
+    """Small, crowded simulation (so that people meet) after given steps."""
+    simulation_engine = engine_class.initialize(**{
+        "map_size": 8,
+        "max_person_step_size": 2,
+        "people_number": 60,
+        "initial_seek_people": 2,
+        "transmission_probability": 0.5,
+        "random_seed": 0,
+        **parameters
+    })
+    for _ in range(steps):
+        simulation_engine.take_simulation_step()
+    return simulation_engine
+
+
+def assert_snapshots_equal(snapshot: Snapshot, expected: Snapshot) -> None:
+    assert snapshot.people == expected.people
+    assert snapshot.contacts == expected.contacts
+    assert snapshot.aggregated_contacts == expected.aggregated_contacts
+    assert snapshot.group_contacts == expected.group_contacts
+    assert snapshot.traces.keys() == expected.traces.keys()
+    for person_id, (xs, ys) in expected.traces.items():
+        assert np.array_equal(snapshot.traces[person_id][0], xs)
+        assert np.array_equal(snapshot.traces[person_id][1], ys)
@@ -0,0 +1,128 @@
+import os
+from typing import Type
+
+import pytest
+
+from src.utils.fs_utils import parse_json
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.execute import execute_simulation, \
+    FullSnapshotWriter, BINARY_FORMAT, get_snapshot_index_path
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+import src.config as global_config
+import src.virus_simulation.config as simulation_config
+from tests.helpers import run_simulation, Engine
+
+STEPS = 6
+SNAPSHOT_STEPS = {1, 3}
+
+
+def _read_output(output_path: str) -> dict:
+    output = {}
+    for directory, _, file_names in os.walk(output_path):
+        for file_name in file_names:
+            file_path = os.path.join(directory, file_name)
+            with open(file_path, "rb") as output_file:
+                output[os.path.relpath(file_path, output_path)] = \
+                    output_file.read()
+    return output
+
+
+@pytest.mark.parametrize("engine_class", [
+    SimulationEngine, VectorizedSimulationEngine
+])
+@pytest.mark.parametrize("parameters", [{}, {"aggregate_contacts": True}])
+def test_async_snapshots_equal_sync_ones(tmp_path,
+                                         monkeypatch,
+                                         engine_class: Type[Engine],
+                                         parameters: dict
+                                         ) -> None:
+    outputs = []
+    for async_snapshots in [False, True]:
+        output_path = os.path.join(tmp_path, str(async_snapshots))
+        monkeypatch.setattr(
+            global_config, "VIRUS_SIMULATION_OUTPUT_PATH", output_path
+        )
+        execute_simulation(
+            simulation_engine=run_simulation(
+                engine_class=engine_class, steps=0, **parameters
+            ),
+            simulation_name="test",
+            steps=STEPS,
+            snapshot_steps=SNAPSHOT_STEPS,
+            snapshot_format=BINARY_FORMAT,
+            show_progress=False,
+            async_snapshots=async_snapshots
+        )
+        outputs.append(_read_output(output_path=output_path))
+
+    assert len(outputs[0]) > 0
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize("async_snapshots", [False, True])
+def test_last_snapshot_step_is_indexed_once(tmp_path,
+                                            monkeypatch,
+                                            async_snapshots: bool
+                                            ) -> None:
+    monkeypatch.setattr(
+        global_config, "VIRUS_SIMULATION_OUTPUT_PATH", str(tmp_path)
+    )
+
+    execute_simulation(
+        simulation_engine=run_simulation(steps=0),
+        simulation_name="test",
+        steps=STEPS,
+        snapshot_steps={2, STEPS - 1},
+        show_progress=False,
+        async_snapshots=async_snapshots
+    )
+
+    index = parse_json(
+        json_path=get_snapshot_index_path(simulation_name="test")
+    )
+    assert [
+        entry[simulation_config.SNAPSHOT_STEP_KEY]
+        for entry in index[simulation_config.INDEXED_SNAPSHOTS_KEY]
+    ] == [2, STEPS - 1]
+
+
+def test_simulation_error_is_not_replaced_by_writer_one(tmp_path,
+                                                        monkeypatch
+                                                        ) -> None:
+    monkeypatch.setattr(
+        global_config, "VIRUS_SIMULATION_OUTPUT_PATH", str(tmp_path)
+    )
+
+    def fail_write(*args, **kwargs) -> None:
+        raise OSError("Disk is full.")
+
+    monkeypatch.setattr(FullSnapshotWriter, "write", fail_write)
+    simulation_engine = run_simulation(steps=0)
+    take_simulation_step = simulation_engine.take_simulation_step
+
+    def fail_step() -> None:
+        if simulation_engine.time_stamp == 2:
+            raise RuntimeError("Step failed.")
+        take_simulation_step()
+
+    monkeypatch.setattr(simulation_engine, "take_simulation_step", fail_step)
+
+    with pytest.raises(RuntimeError, match="Step failed."):
+        execute_simulation(
+            simulation_engine=simulation_engine,
+            simulation_name="test",
+            steps=STEPS,
+            snapshot_steps=SNAPSHOT_STEPS,
+            show_progress=False,
+            async_snapshots=True
+        )
+    with pytest.raises(SimulationError):
+        execute_simulation(
+            simulation_engine=run_simulation(steps=0),
+            simulation_name="test",
+            steps=STEPS,
+            snapshot_steps=SNAPSHOT_STEPS,
+            show_progress=False,
+            async_snapshots=True
+        )
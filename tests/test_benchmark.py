@@ -0,0 +1,115 @@
+import os
+from dataclasses import asdict
+from typing import Dict, Any
+
+import pytest
+
+from src.utils.fs_utils import dump_json_to_file, parse_json
+from src.virus_simulation.benchmark import run_benchmarks, \
+    compare_benchmarks, prepare_configurations_grid, BenchmarkConfiguration, \
+    Regression, BENCHMARK_RESULTS_KEY, BENCHMARK_ENGINE_KEY, \
+    SIMULATION_ENGINE_NAME, VECTORIZED_ENGINE_NAME, \
+    HIGHER_IS_BETTER_METRICS, LOWER_IS_BETTER_METRICS, \
+    STEPS_PER_SECOND_METRIC, PEOPLE_STEPS_PER_SECOND_METRIC, PEAK_RSS_METRIC, \
+    GET_SIMULATION_STATE_METRIC, SNAPSHOT_INITIALIZE_METRIC
+
+CONFIGURATION = BenchmarkConfiguration(
+    people_number=20, map_size=5, max_person_step_size=2, steps=3
+)
+
+
+def _prepare_result(configuration: BenchmarkConfiguration,
+                    **metrics: float
+                    ) -> Dict[str, Any]:
+    result = asdict(configuration)
+    result[BENCHMARK_ENGINE_KEY] = SIMULATION_ENGINE_NAME
+    result.update({
+        metric: 1.0 for metric in
+        HIGHER_IS_BETTER_METRICS + LOWER_IS_BETTER_METRICS
+    })
+    result.update(metrics)
+    return result
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_benchmark_results_cover_configurations_grid(tmp_path,
+                                                     vectorized: bool
+                                                     ) -> None:
+    configurations = prepare_configurations_grid(
+        people_numbers=[10, 20], map_sizes=[5], max_person_step_sizes=[2],
+        steps=[3]
+    )
+    target_path = os.path.join(tmp_path, "benchmark.json")
+
+    results = run_benchmarks(
+        configurations=configurations,
+        target_path=target_path,
+        vectorized=vectorized
+    )
+
+    assert parse_json(json_path=target_path)[BENCHMARK_RESULTS_KEY] == results
+    assert [result["people_number"] for result in results] == [10, 20]
+    for result in results:
+        assert result[BENCHMARK_ENGINE_KEY] == (
+            VECTORIZED_ENGINE_NAME if vectorized else SIMULATION_ENGINE_NAME
+        )
+        assert all(
+            result[metric] > 0 for metric in
+            HIGHER_IS_BETTER_METRICS + LOWER_IS_BETTER_METRICS
+        )
+    # the same results compared against themselves do not regress
+    assert compare_benchmarks(
+        baseline_path=target_path, current_path=target_path
+    ) == []
+
+
+def test_regressions_exceed_threshold_in_worse_direction(tmp_path) -> None:
+    other_configuration = BenchmarkConfiguration(
+        people_number=40, map_size=5, max_person_step_size=2, steps=3
+    )
+    baseline_path = os.path.join(tmp_path, "baseline.json")
+    current_path = os.path.join(tmp_path, "current.json")
+    dump_json_to_file(target_path=baseline_path, content={
+        BENCHMARK_RESULTS_KEY: [
+            _prepare_result(configuration=CONFIGURATION, **{
+                SNAPSHOT_INITIALIZE_METRIC: 0.0
+            }),
+            _prepare_result(configuration=other_configuration)
+        ]
+    })
+    dump_json_to_file(target_path=current_path, content={
+        BENCHMARK_RESULTS_KEY: [
+            _prepare_result(configuration=CONFIGURATION, **{
+                # slower by half and with more memory - both regress
+                STEPS_PER_SECOND_METRIC: 0.5,
+                PEAK_RSS_METRIC: 1.5,
+                # within threshold
+                PEOPLE_STEPS_PER_SECOND_METRIC: 0.95,
+                # improvement
+                GET_SIMULATION_STATE_METRIC: 0.5,
+                # zero baseline is skipped
+                SNAPSHOT_INITIALIZE_METRIC: 10.0
+            })
+        ]
+    })
+
+    regressions = compare_benchmarks(
+        baseline_path=baseline_path, current_path=current_path, threshold=0.1
+    )
+
+    configuration_name = f"{SIMULATION_ENGINE_NAME}_20_5_2_3"
+    assert regressions == [
+        Regression(
+            configuration_name=configuration_name,
+            metric=STEPS_PER_SECOND_METRIC,
+            baseline_value=1.0,
+            current_value=0.5
+        ),
+        Regression(
+            configuration_name=configuration_name,
+            metric=PEAK_RSS_METRIC,
+            baseline_value=1.0,
+            current_value=1.5
+        )
+    ]
+    assert regressions[0].relative_change == -0.5
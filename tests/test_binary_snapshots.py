@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.binary_snapshots import SnapshotArrays, \
+    dump_snapshot_arrays, load_snapshot_arrays, TRACE_DTYPE, TRACES_LAYOUT
+from src.virus_simulation.conversion import convert_simulation_state_to_json, \
+    convert_simulation_state_to_binary
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.errors import SnapshotParsingError
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+from tests.helpers import run_simulation, assert_snapshots_equal, \
+    GROUP_CROWDING_PARAMETERS
+
+
+def _prepare_snapshot_arrays(steps: int, people_number: int) -> SnapshotArrays:
+    random_generator = np.random.default_rng(0)
+    return SnapshotArrays(
+        map_dimensions=np.array([10, 10], dtype=np.int64),
+        person_id=np.arange(people_number, dtype=np.int32),
+        sick=np.zeros(people_number, dtype=np.bool_),
+        sick_start=np.full(people_number, -1, dtype=np.int32),
+        contact_person_x=np.array([0], dtype=np.int32),
+        contact_person_y=np.array([1], dtype=np.int32),
+        contact_intensity=np.array([0.5]),
+        contact_time_stamp=np.array([0], dtype=np.int32),
+        traces=random_generator.integers(
+            0, 10, (steps, people_number, 2)
+        ).astype(TRACE_DTYPE)
+    )
+
+
+def test_binary_snapshot_round_trip(tmp_path) -> None:
+    snapshot_arrays = _prepare_snapshot_arrays(steps=4, people_number=3)
+
+    dump_snapshot_arrays(snapshot_arrays=snapshot_arrays, target_dir=tmp_path)
+    loaded = load_snapshot_arrays(snapshot_dir=tmp_path)
+
+    assert int(loaded.traces_layout) == TRACES_LAYOUT
+    assert np.array_equal(loaded.traces, snapshot_arrays.traces)
+    assert np.array_equal(loaded.contact_person_y, [1])
+
+
+def test_people_major_traces_without_layout_are_transposed(tmp_path) -> None:
+    snapshot_arrays = _prepare_snapshot_arrays(steps=4, people_number=3)
+    dump_snapshot_arrays(snapshot_arrays=snapshot_arrays, target_dir=tmp_path)
+    os.remove(os.path.join(tmp_path, "traces_layout.npy"))
+    np.save(
+        os.path.join(tmp_path, "traces.npy"),
+        snapshot_arrays.traces.transpose(1, 0, 2)
+    )
+
+    loaded = load_snapshot_arrays(snapshot_dir=tmp_path)
+
+    assert np.array_equal(loaded.traces, snapshot_arrays.traces)
+
+
+def test_ambiguous_traces_without_layout_are_rejected(tmp_path) -> None:
+    snapshot_arrays = _prepare_snapshot_arrays(steps=3, people_number=3)
+    dump_snapshot_arrays(snapshot_arrays=snapshot_arrays, target_dir=tmp_path)
+    os.remove(os.path.join(tmp_path, "traces_layout.npy"))
+
+    with pytest.raises(SnapshotParsingError):
+        load_snapshot_arrays(snapshot_dir=tmp_path)
+
+
+@pytest.mark.parametrize("engine_class", [
+    SimulationEngine, VectorizedSimulationEngine
+])
+@pytest.mark.parametrize("encode_traces", [False, True])
+@pytest.mark.parametrize("parameters", [{}, GROUP_CROWDING_PARAMETERS])
+def test_binary_snapshot_equals_json_one(tmp_path,
+                                         engine_class: type,
+                                         encode_traces: bool,
+                                         parameters: dict
+                                         ) -> None:
+    simulation_state = run_simulation(
+        engine_class=engine_class, **parameters
+    ).get_simulation_state()
+    json_path = os.path.join(tmp_path, "snapshot.json")
+    binary_path = os.path.join(tmp_path, "snapshot")
+
+    convert_simulation_state_to_json(
+        simulation_state=simulation_state,
+        target_path=json_path,
+        encode_traces=encode_traces
+    )
+    convert_simulation_state_to_binary(
+        simulation_state=simulation_state,
+        target_path=binary_path,
+        encode_traces=encode_traces
+    )
+
+    assert_snapshots_equal(
+        snapshot=Snapshot.initialize_binary(snapshot_path=binary_path),
+        expected=Snapshot.initialize(snapshot_path=json_path)
+    )
@@ -0,0 +1,92 @@
+import os
+from dataclasses import replace, fields
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.checkpointing import dump_checkpoint, \
+    load_checkpoint, get_checkpoint_path
+from src.virus_simulation.conversion import convert_simulation_state_to_json
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+from tests.helpers import run_simulation, assert_snapshots_equal, \
+    GROUP_CROWDING_PARAMETERS
+
+STEPS = 15
+CHECKPOINT_STEPS = (4, 9)
+
+
+def test_checkpoint_round_trip(tmp_path) -> None:
+    checkpoint = run_simulation(aggregate_contacts=True).get_checkpoint(
+        since_time_stamp=3
+    )
+    checkpoint_path = get_checkpoint_path(
+        checkpoints_dir=tmp_path, simulation_name="test", step=9
+    )
+
+    dump_checkpoint(checkpoint=checkpoint, target_path=checkpoint_path)
+    loaded = load_checkpoint(checkpoint_path=checkpoint_path)
+
+    assert loaded.engine_parameters == checkpoint.engine_parameters
+    assert loaded.random_state == checkpoint.random_state
+    assert loaded.time_stamp == checkpoint.time_stamp
+    assert np.array_equal(loaded.traces, checkpoint.traces)
+    assert np.array_equal(loaded.meetings_x, checkpoint.meetings_x)
+    for aggregated_field in fields(checkpoint.aggregated_contacts):
+        assert np.array_equal(
+            getattr(loaded.aggregated_contacts, aggregated_field.name),
+            getattr(checkpoint.aggregated_contacts, aggregated_field.name)
+        )
+
+
+@pytest.mark.parametrize("engine_class", [
+    SimulationEngine, VectorizedSimulationEngine
+])
+@pytest.mark.parametrize("parameters", [
+    {}, {"aggregate_contacts": True}, {"transmission_only": True},
+    GROUP_CROWDING_PARAMETERS
+])
+def test_resumed_simulation_equals_uninterrupted_one(tmp_path,
+                                                     engine_class: type,
+                                                     parameters: dict
+                                                     ) -> None:
+    simulation_engine = run_simulation(
+        engine_class=engine_class, steps=0, **parameters
+    )
+    previous_checkpoint, first_time_stamp = None, 0
+    for step in range(CHECKPOINT_STEPS[-1] + 1):
+        simulation_engine.take_simulation_step()
+        if step not in CHECKPOINT_STEPS:
+            continue
+        checkpoint_path = get_checkpoint_path(
+            checkpoints_dir=tmp_path, simulation_name="test", step=step
+        )
+        checkpoint = simulation_engine.get_checkpoint(
+            since_time_stamp=first_time_stamp
+        )
+        if previous_checkpoint is not None:
+            checkpoint = replace(
+                checkpoint,
+                previous_checkpoint=os.path.basename(previous_checkpoint)
+            )
+        dump_checkpoint(checkpoint=checkpoint, target_path=checkpoint_path)
+        previous_checkpoint, first_time_stamp = checkpoint_path, step + 1
+
+    resumed_engine = engine_class.restore(checkpoint_path=previous_checkpoint)
+    for _ in range(CHECKPOINT_STEPS[-1] + 1, STEPS):
+        resumed_engine.take_simulation_step()
+
+    uninterrupted_engine = run_simulation(
+        engine_class=engine_class, steps=STEPS, **parameters
+    )
+    snapshots = []
+    for name, engine in (
+            ("resumed", resumed_engine), ("uninterrupted", uninterrupted_engine)):
+        snapshot_path = os.path.join(tmp_path, f"{name}.json")
+        convert_simulation_state_to_json(
+            simulation_state=engine.get_simulation_state(),
+            target_path=snapshot_path
+        )
+        snapshots.append(Snapshot.initialize(snapshot_path=snapshot_path))
+    assert_snapshots_equal(snapshot=snapshots[0], expected=snapshots[1])
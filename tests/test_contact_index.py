@@ -0,0 +1,168 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.contact_index import ContactIndex
+from src.virus_simulation.primitives import Contact
+from tests.helpers import run_simulation
+
+STEPS = 10
+PEOPLE_NUMBER = 60
+TIME_WINDOWS = [
+    (None, None), (None, 4), (4, None), (2, 7), (5, 6), (7, 2), (-3, 2),
+    (8, STEPS + 5), (STEPS, None)
+]
+ContactRecord = Tuple[int, int, float, int]
+
+
+def _prepare_contact_index(meetings: List[Contact]) -> ContactIndex:
+    return ContactIndex.initialize(
+        person_x=np.array(
+            [meeting.person_x.person_id for meeting in meetings], dtype=np.int64
+        ),
+        person_y=np.array(
+            [meeting.person_y.person_id for meeting in meetings], dtype=np.int64
+        ),
+        intensity=np.array([meeting.intensity for meeting in meetings]),
+        time_stamp=np.array(
+            [meeting.time_stamp for meeting in meetings], dtype=np.int64
+        ),
+        people_number=PEOPLE_NUMBER
+    )
+
+
+def _filter_meetings(meetings: List[Contact],
+                     first_time_stamp: Optional[int],
+                     last_time_stamp: Optional[int]
+                     ) -> List[ContactRecord]:
+    first_time_stamp = -np.inf if first_time_stamp is None else first_time_stamp
+    last_time_stamp = np.inf if last_time_stamp is None else last_time_stamp
+    return [
+        (
+            meeting.person_x.person_id,
+            meeting.person_y.person_id,
+            meeting.intensity,
+            meeting.time_stamp
+        ) for meeting in meetings
+        if first_time_stamp <= meeting.time_stamp < last_time_stamp
+    ]
+
+
+@pytest.fixture(scope="module")
+def meetings() -> List[Contact]:
+    meetings = run_simulation(
+        steps=STEPS, people_number=PEOPLE_NUMBER
+    ).get_simulation_state().meetings
+    assert len(meetings) > 0
+    return meetings
+
+
+@pytest.mark.parametrize("first_time_stamp, last_time_stamp", TIME_WINDOWS)
+def test_time_windows_equal_filtered_meetings(meetings: List[Contact],
+                                              first_time_stamp: Optional[int],
+                                              last_time_stamp: Optional[int]
+                                              ) -> None:
+    contact_index = _prepare_contact_index(meetings=meetings)
+
+    contacts = contact_index.get_contacts(
+        first_time_stamp=first_time_stamp,
+        last_time_stamp=last_time_stamp
+    )
+
+    assert list(zip(
+        contacts.person_x.tolist(),
+        contacts.person_y.tolist(),
+        contacts.intensity.tolist(),
+        contacts.time_stamp.tolist()
+    )) == _filter_meetings(
+        meetings=meetings,
+        first_time_stamp=first_time_stamp,
+        last_time_stamp=last_time_stamp
+    )
+
+
+@pytest.mark.parametrize("first_time_stamp, last_time_stamp", TIME_WINDOWS)
+def test_person_contacts_equal_filtered_meetings(meetings: List[Contact],
+                                                 first_time_stamp: Optional[int],
+                                                 last_time_stamp: Optional[int]
+                                                 ) -> None:
+    contact_index = _prepare_contact_index(meetings=meetings)
+    contacts = contact_index.contacts
+
+    for person_id in range(PEOPLE_NUMBER):
+        person_contacts = contact_index.get_person_contacts(
+            person_id=person_id,
+            first_time_stamp=first_time_stamp,
+            last_time_stamp=last_time_stamp
+        )
+
+        expected = [
+            (person_y if person_x == person_id else person_x,
+             intensity,
+             time_stamp)
+            for person_x, person_y, intensity, time_stamp in _filter_meetings(
+                meetings=meetings,
+                first_time_stamp=first_time_stamp,
+                last_time_stamp=last_time_stamp
+            ) if person_id in (person_x, person_y)
+        ]
+        assert list(zip(
+            person_contacts.partner.tolist(),
+            person_contacts.intensity.tolist(),
+            person_contacts.time_stamp.tolist()
+        )) == expected
+        contact_id = person_contacts.contact_id
+        assert np.all(
+            (contacts.person_x[contact_id] == person_id) |
+            (contacts.person_y[contact_id] == person_id)
+        )
+        assert np.array_equal(
+            contacts.time_stamp[contact_id], person_contacts.time_stamp
+        )
+
+
+def test_contacts_before_time_stamp_equal_filtered_meetings(
+        meetings: List[Contact]
+        ) -> None:
+    contact_index = _prepare_contact_index(meetings=meetings)
+
+    contacts = contact_index.get_contacts_before(time_stamp=6, steps=3)
+
+    assert contacts.time_stamp.tolist() == [
+        time_stamp for _, _, _, time_stamp in _filter_meetings(
+            meetings=meetings, first_time_stamp=3, last_time_stamp=6
+        )
+    ]
+
+
+def test_unordered_contacts_are_sorted_by_time_stamp(
+        meetings: List[Contact]
+        ) -> None:
+    shuffled = list(meetings)
+    np.random.default_rng(0).shuffle(shuffled)
+
+    contact_index = _prepare_contact_index(meetings=shuffled)
+
+    contacts = contact_index.contacts
+    assert contact_index.steps_number == STEPS
+    assert np.all(np.diff(contacts.time_stamp) >= 0)
+    assert sorted(zip(
+        contacts.person_x.tolist(),
+        contacts.person_y.tolist(),
+        contacts.intensity.tolist(),
+        contacts.time_stamp.tolist()
+    )) == sorted(_filter_meetings(
+        meetings=meetings, first_time_stamp=None, last_time_stamp=None
+    ))
+    with pytest.raises(ValueError):
+        contacts.person_x[0] = 0
+
+
+def test_unknown_people_have_no_contacts(meetings: List[Contact]) -> None:
+    contact_index = _prepare_contact_index(meetings=meetings)
+
+    for person_id in (-1, PEOPLE_NUMBER):
+        assert contact_index.get_person_contacts(
+            person_id=person_id
+        ).contacts_number == 0
@@ -0,0 +1,78 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+from src.virus_simulation.contacts_aggregation import ContactsAggregator
+
+PEOPLE_NUMBER = 50
+STEPS = 40
+
+
+def test_aggregator_matches_records_accumulated_per_pair() -> None:
+    random_generator = np.random.default_rng(0)
+    contacts_aggregator = ContactsAggregator(people_number=PEOPLE_NUMBER)
+    expected: Dict[Tuple[int, int], list] = {}
+    for time_stamp in range(STEPS):
+        contacts_number = int(random_generator.integers(0, 30))
+        person_x = random_generator.integers(0, PEOPLE_NUMBER, contacts_number)
+        person_y = random_generator.integers(0, PEOPLE_NUMBER, contacts_number)
+        intensity = random_generator.random(contacts_number)
+        contacts_aggregator.add_contacts(
+            person_x=person_x,
+            person_y=person_y,
+            intensity=intensity,
+            time_stamp=time_stamp
+        )
+        for x, y, contact_intensity in zip(
+                person_x.tolist(), person_y.tolist(), intensity.tolist()):
+            record = expected.setdefault(
+                (min(x, y), max(x, y)), [0.0, 0, time_stamp, time_stamp]
+            )
+            record[0] += contact_intensity
+            record[1] += 1
+            record[3] = time_stamp
+
+    aggregated_contacts = contacts_aggregator.get_aggregated_contacts()
+
+    pairs = sorted(expected)
+    assert contacts_aggregator.pairs_number == len(pairs)
+    assert aggregated_contacts.person_x.tolist() == [x for x, _ in pairs]
+    assert aggregated_contacts.person_y.tolist() == [y for _, y in pairs]
+    assert np.allclose(
+        aggregated_contacts.intensity, [expected[p][0] for p in pairs]
+    )
+    assert aggregated_contacts.contacts_count.tolist() == \
+        [expected[p][1] for p in pairs]
+    assert aggregated_contacts.first_time_stamp.tolist() == \
+        [expected[p][2] for p in pairs]
+    assert aggregated_contacts.last_time_stamp.tolist() == \
+        [expected[p][3] for p in pairs]
+
+
+def test_restored_aggregator_continues_aggregation() -> None:
+    contacts_aggregator = ContactsAggregator(people_number=PEOPLE_NUMBER)
+    contacts_aggregator.add_contacts(
+        person_x=np.array([0, 3]),
+        person_y=np.array([1, 2]),
+        intensity=np.array([0.5, 0.25]),
+        time_stamp=0
+    )
+
+    restored = ContactsAggregator.restore(
+        people_number=PEOPLE_NUMBER,
+        aggregated_contacts=contacts_aggregator.get_aggregated_contacts()
+    )
+    restored.add_contacts(
+        person_x=np.array([1, 4]),
+        person_y=np.array([0, 5]),
+        intensity=np.array([0.5, 1.0]),
+        time_stamp=1
+    )
+
+    aggregated_contacts = restored.get_aggregated_contacts()
+    assert aggregated_contacts.person_x.tolist() == [0, 2, 4]
+    assert aggregated_contacts.person_y.tolist() == [1, 3, 5]
+    assert aggregated_contacts.intensity.tolist() == [1.0, 0.25, 1.0]
+    assert aggregated_contacts.contacts_count.tolist() == [2, 1, 1]
+    assert aggregated_contacts.first_time_stamp.tolist() == [0, 0, 1]
+    assert aggregated_contacts.last_time_stamp.tolist() == [1, 0, 1]
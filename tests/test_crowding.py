@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.conversion import convert_simulation_state_to_binary
+from src.virus_simulation.crowding import CrowdingPolicy, SAMPLED_CROWDING
+from src.virus_simulation.graph_building import build_adjacency_matrix, \
+    build_adjacency_matrix_from_contacts, \
+    build_adjacency_matrix_from_aggregated_contacts, \
+    CLIPPED_SUM_AGGREGATION, COUNT_AGGREGATION, LAST_TIME_STAMP_AGGREGATION
+from src.virus_simulation.snapshot_analytics import \
+    calculate_contacts_per_step, calculate_degree_distribution
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.transmission import MEAN_CONTACT_INTENSITY
+from tests.helpers import run_simulation, GROUP_CROWDING_PARAMETERS
+
+STEPS = 10
+MAX_PARTNERS = 3
+
+
+def _prepare_snapshot(tmp_path, name: str, **parameters) -> Snapshot:
+    snapshot_path = os.path.join(tmp_path, name)
+    convert_simulation_state_to_binary(
+        simulation_state=run_simulation(
+            steps=STEPS, **parameters
+        ).get_simulation_state(),
+        target_path=snapshot_path
+    )
+    return Snapshot.initialize_binary(snapshot_path=snapshot_path)
+
+
+def test_pairwise_contacts_include_group_members(tmp_path) -> None:
+    snapshot = _prepare_snapshot(
+        tmp_path=tmp_path, name="snapshot", **GROUP_CROWDING_PARAMETERS
+    )
+    snapshot_arrays = snapshot.arrays
+    group_contacts = snapshot_arrays.group_contacts
+    group_x, group_y, group_time_stamp = group_contacts.get_pairs()
+
+    contacts = snapshot.pairwise_contacts
+
+    assert group_contacts.pairs_number > 0
+    assert contacts.contacts_number == \
+        snapshot_arrays.contacts_number + group_contacts.pairs_number
+    assert np.all(np.diff(contacts.time_stamp) >= 0)
+    assert np.count_nonzero(
+        contacts.intensity == np.float32(MEAN_CONTACT_INTENSITY)
+    ) >= group_contacts.pairs_number
+    person_contacts = snapshot.contact_index.get_person_contacts(
+        person_id=int(group_x[0]),
+        first_time_stamp=int(group_time_stamp[0]),
+        last_time_stamp=int(group_time_stamp[0]) + 1
+    )
+    assert group_y[0] in person_contacts.partner
+
+
+def test_adjacency_matrix_counts_group_contacts(tmp_path) -> None:
+    snapshot = _prepare_snapshot(
+        tmp_path=tmp_path, name="snapshot", **GROUP_CROWDING_PARAMETERS
+    )
+    snapshot_arrays = snapshot.arrays
+    group_x, group_y, group_time_stamp = \
+        snapshot_arrays.group_contacts.get_pairs()
+
+    adjacency_matrix = build_adjacency_matrix(
+        snapshot=snapshot, aggregation=COUNT_AGGREGATION
+    )
+
+    expected = build_adjacency_matrix_from_contacts(
+        person_x=np.concatenate((snapshot_arrays.contact_person_x, group_x)),
+        person_y=np.concatenate((snapshot_arrays.contact_person_y, group_y)),
+        intensity=np.concatenate((
+            snapshot_arrays.contact_intensity,
+            np.full(group_x.shape[0], MEAN_CONTACT_INTENSITY)
+        )),
+        time_stamp=np.concatenate(
+            (snapshot_arrays.contact_time_stamp, group_time_stamp)
+        ),
+        people_number=snapshot_arrays.people_number,
+        aggregation=COUNT_AGGREGATION
+    )
+    assert (adjacency_matrix != expected).nnz == 0
+
+
+@pytest.mark.parametrize("aggregation", [
+    CLIPPED_SUM_AGGREGATION, COUNT_AGGREGATION, LAST_TIME_STAMP_AGGREGATION
+])
+def test_aggregated_adjacency_matrix_counts_group_contacts(tmp_path,
+                                                           aggregation: str
+                                                           ) -> None:
+    snapshot = _prepare_snapshot(
+        tmp_path=tmp_path, name="snapshot", **GROUP_CROWDING_PARAMETERS
+    )
+    aggregated_snapshot = _prepare_snapshot(
+        tmp_path=tmp_path,
+        name="aggregated_snapshot",
+        aggregate_contacts=True,
+        **GROUP_CROWDING_PARAMETERS
+    )
+
+    adjacency_matrix = build_adjacency_matrix_from_aggregated_contacts(
+        snapshot=aggregated_snapshot, aggregation=aggregation
+    )
+
+    expected = build_adjacency_matrix(
+        snapshot=snapshot, aggregation=aggregation
+    )
+    assert np.allclose(adjacency_matrix.toarray(), expected.toarray())
+
+
+def test_contact_metrics_count_group_contacts(tmp_path) -> None:
+    snapshot = _prepare_snapshot(
+        tmp_path=tmp_path, name="snapshot", **GROUP_CROWDING_PARAMETERS
+    )
+    snapshot_arrays = snapshot.arrays
+    contacts = snapshot.pairwise_contacts
+
+    contacts_per_step = calculate_contacts_per_step(
+        time_stamp=snapshot_arrays.contact_time_stamp,
+        step=STEPS - 1,
+        group_contacts=snapshot_arrays.group_contacts
+    )
+    degree_distribution = calculate_degree_distribution(
+        person_x=snapshot_arrays.contact_person_x,
+        person_y=snapshot_arrays.contact_person_y,
+        people_number=snapshot_arrays.people_number,
+        group_contacts=snapshot_arrays.group_contacts
+    )
+
+    assert np.array_equal(
+        contacts_per_step,
+        calculate_contacts_per_step(
+            time_stamp=contacts.time_stamp, step=STEPS - 1
+        )
+    )
+    assert np.array_equal(
+        degree_distribution,
+        calculate_degree_distribution(
+            person_x=contacts.person_x,
+            person_y=contacts.person_y,
+            people_number=snapshot_arrays.people_number
+        )
+    )
+
+
+def test_sampled_crowding_bounds_partners_per_step() -> None:
+    simulation_state = run_simulation(
+        crowding_policy=CrowdingPolicy(
+            mode=SAMPLED_CROWDING, max_partners=MAX_PARTNERS
+        )
+    ).get_simulation_state()
+
+    partners_per_step = {}
+    for contact in simulation_state.meetings:
+        for person in (contact.person_x, contact.person_y):
+            key = (person.person_id, contact.time_stamp)
+            partners_per_step[key] = partners_per_step.get(key, 0) + 1
+
+    assert len(partners_per_step) > 0
+    assert max(partners_per_step.values()) <= MAX_PARTNERS
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from src.utils.fs_utils import parse_json
+from src.virus_simulation.ensemble import execute_ensemble, \
+    prepare_parameters_grid, ENSEMBLE_RUNS_KEY, INFECTED_PER_STEP_KEY
+from src.virus_simulation.execute import BINARY_FORMAT
+import src.config as global_config
+
+SEEDS_NUMBER = 2
+STEPS = 8
+INITIAL_SEEK_PEOPLE = 2
+
+
+def _execute_ensemble(output_path: str, vectorized: bool) -> list:
+    parameters_grid = prepare_parameters_grid(
+        map_sizes=[6, 8],
+        people_numbers=[30, 50],
+        transmission_probabilities=[0.5],
+        max_person_step_sizes=[2],
+        initial_seek_people=[INITIAL_SEEK_PEOPLE]
+    )
+    execute_ensemble(
+        ensemble_name="test",
+        parameters_grid=parameters_grid,
+        seeds_number=SEEDS_NUMBER,
+        steps=STEPS,
+        snapshot_steps=set(),
+        workers=2,
+        vectorized=vectorized,
+        snapshot_format=BINARY_FORMAT
+    )
+    return parse_json(json_path=os.path.join(
+        output_path, "test_ensemble_summary.json"
+    ))[ENSEMBLE_RUNS_KEY]
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_ensemble_runs_are_reproducible_by_seed(tmp_path,
+                                                monkeypatch,
+                                                vectorized: bool
+                                                ) -> None:
+    runs = []
+    for attempt in ["first", "second"]:
+        output_path = os.path.join(tmp_path, attempt)
+        os.makedirs(output_path)
+        monkeypatch.setattr(
+            global_config, "VIRUS_SIMULATION_OUTPUT_PATH", output_path
+        )
+        runs.append(_execute_ensemble(
+            output_path=output_path, vectorized=vectorized
+        ))
+    first_runs, second_runs = runs
+
+    assert first_runs == second_runs
+    assert len(first_runs) == 2 * 2 * SEEDS_NUMBER
+    assert len({run["simulation_name"] for run in first_runs}) == \
+        len(first_runs)
+    assert sorted(
+        (run["map_size"], run["people_number"], run["random_seed"])
+        for run in first_runs
+    ) == [
+        (map_size, people_number, seed)
+        for map_size in [6, 8]
+        for people_number in [30, 50]
+        for seed in range(SEEDS_NUMBER)
+    ]
+    for run in first_runs:
+        infected_per_step = run[INFECTED_PER_STEP_KEY]
+        assert len(infected_per_step) == STEPS
+        assert infected_per_step[0] >= INITIAL_SEEK_PEOPLE
+        assert infected_per_step == sorted(infected_per_step)
+        assert infected_per_step[-1] <= run["people_number"]
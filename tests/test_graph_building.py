@@ -0,0 +1,158 @@
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.conversion import convert_simulation_state_to_binary
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.graph_building import build_adjacency_matrix, \
+    build_time_window_adjacency_matrix, \
+    build_adjacency_matrix_from_aggregated_contacts, build_dgl_graph, \
+    AGGREGATIONS, CLIPPED_SUM_AGGREGATION, COUNT_AGGREGATION, \
+    MAX_AGGREGATION, LAST_TIME_STAMP_AGGREGATION, MAX_CLIPPED_WEIGHT, \
+    EDGE_WEIGHT_KEY
+from src.virus_simulation.snapshot_parsing import Snapshot
+import src.virus_simulation.config as simulation_config
+from tests.helpers import run_simulation
+
+STEPS = 10
+
+
+def _prepare_snapshot(tmp_path, name: str = "snapshot", **parameters) -> Snapshot:
+    snapshot_path = os.path.join(tmp_path, name)
+    convert_simulation_state_to_binary(
+        simulation_state=run_simulation(
+            steps=STEPS, **parameters
+        ).get_simulation_state(),
+        target_path=snapshot_path
+    )
+    return Snapshot.initialize_binary(snapshot_path=snapshot_path)
+
+
+def _aggregate_brute_force(snapshot: Snapshot,
+                           aggregation: str,
+                           first_time_stamp: int = 0,
+                           last_time_stamp: int = STEPS
+                           ) -> Dict[Tuple[int, int], float]:
+    weights = {}
+    for contact in snapshot.contacts:
+        time_stamp = contact[simulation_config.CONTACT_TIME_STAMP_KEY]
+        if not first_time_stamp <= time_stamp < last_time_stamp:
+            continue
+        pair = tuple(sorted(contact[simulation_config.CONTACT_PAIR_KEY]))
+        intensity = contact[simulation_config.CONTACT_DURATION_KEY]
+        weight = weights.get(pair)
+        if aggregation == CLIPPED_SUM_AGGREGATION:
+            weights[pair] = (weight or 0.0) + intensity
+        elif aggregation == COUNT_AGGREGATION:
+            weights[pair] = (weight or 0) + 1
+        elif aggregation == MAX_AGGREGATION:
+            weights[pair] = max(weight or 0.0, intensity)
+        else:
+            weights[pair] = max(-1 if weight is None else weight, time_stamp)
+    if aggregation == CLIPPED_SUM_AGGREGATION:
+        weights = {
+            pair: min(weight, MAX_CLIPPED_WEIGHT)
+            for pair, weight in weights.items()
+        }
+    return weights
+
+
+def _assert_matrix_equals_weights(adjacency_matrix,
+                                  weights: Dict[Tuple[int, int], float]
+                                  ) -> None:
+    expected = np.zeros(adjacency_matrix.shape, dtype=np.float64)
+    for (person_u, person_v), weight in weights.items():
+        expected[person_u, person_v] = expected[person_v, person_u] = weight
+    assert np.allclose(adjacency_matrix.toarray(), expected)
+
+
+@pytest.mark.parametrize("aggregation", AGGREGATIONS)
+def test_adjacency_matrix_aggregates_contacts_of_pairs(tmp_path,
+                                                       aggregation: str
+                                                       ) -> None:
+    snapshot = _prepare_snapshot(tmp_path=tmp_path)
+
+    adjacency_matrix = build_adjacency_matrix(
+        snapshot=snapshot, aggregation=aggregation
+    )
+
+    weights = _aggregate_brute_force(snapshot=snapshot, aggregation=aggregation)
+    assert len(weights) > 0
+    assert (adjacency_matrix != adjacency_matrix.T).nnz == 0
+    _assert_matrix_equals_weights(
+        adjacency_matrix=adjacency_matrix, weights=weights
+    )
+
+
+@pytest.mark.parametrize("first_time_stamp, last_time_stamp", [
+    (None, None), (3, 7), (7, 3)
+])
+def test_time_window_adjacency_matrix_keeps_window_contacts(tmp_path,
+                                                            first_time_stamp,
+                                                            last_time_stamp
+                                                            ) -> None:
+    snapshot = _prepare_snapshot(tmp_path=tmp_path)
+
+    adjacency_matrix = build_time_window_adjacency_matrix(
+        snapshot=snapshot,
+        first_time_stamp=first_time_stamp,
+        last_time_stamp=last_time_stamp,
+        aggregation=COUNT_AGGREGATION
+    )
+
+    _assert_matrix_equals_weights(
+        adjacency_matrix=adjacency_matrix,
+        weights=_aggregate_brute_force(
+            snapshot=snapshot,
+            aggregation=COUNT_AGGREGATION,
+            first_time_stamp=first_time_stamp or 0,
+            last_time_stamp=STEPS if last_time_stamp is None
+            else last_time_stamp
+        )
+    )
+
+
+@pytest.mark.parametrize("aggregation", [
+    CLIPPED_SUM_AGGREGATION, COUNT_AGGREGATION, LAST_TIME_STAMP_AGGREGATION
+])
+def test_aggregated_adjacency_matrix_equals_contacts_one(tmp_path,
+                                                         aggregation: str
+                                                         ) -> None:
+    snapshot = _prepare_snapshot(tmp_path=tmp_path)
+    aggregated_snapshot = _prepare_snapshot(
+        tmp_path=tmp_path, name="aggregated_snapshot", aggregate_contacts=True
+    )
+
+    adjacency_matrix = build_adjacency_matrix_from_aggregated_contacts(
+        snapshot=aggregated_snapshot, aggregation=aggregation
+    )
+
+    expected = build_adjacency_matrix(snapshot=snapshot, aggregation=aggregation)
+    assert np.allclose(adjacency_matrix.toarray(), expected.toarray())
+
+
+def test_unsupported_aggregations_are_rejected(tmp_path) -> None:
+    snapshot = _prepare_snapshot(tmp_path=tmp_path, aggregate_contacts=True)
+
+    with pytest.raises(SimulationError):
+        build_adjacency_matrix(snapshot=snapshot, aggregation="unknown")
+    with pytest.raises(SimulationError):
+        build_adjacency_matrix_from_aggregated_contacts(
+            snapshot=snapshot, aggregation=MAX_AGGREGATION
+        )
+
+
+def test_dgl_graph_has_adjacency_matrix_edges(tmp_path) -> None:
+    pytest.importorskip("dgl")
+    snapshot = _prepare_snapshot(tmp_path=tmp_path)
+
+    graph = build_dgl_graph(snapshot=snapshot)
+
+    adjacency_matrix = build_adjacency_matrix(snapshot=snapshot)
+    assert graph.number_of_nodes() == snapshot.arrays.people_number
+    assert graph.number_of_edges() == adjacency_matrix.nnz
+    assert np.isclose(
+        graph.edata[EDGE_WEIGHT_KEY].numpy().sum(), adjacency_matrix.sum()
+    )
@@ -0,0 +1,91 @@
+import os
+from dataclasses import fields
+
+import numpy as np
+
+from src.virus_simulation.conversion import convert_simulation_state_to_json, \
+    convert_simulation_state_to_binary
+from src.virus_simulation.graph_dataset import GraphArrays, GraphCache, \
+    GraphBuildParameters, SnapshotGraphDataset, GRAPH_CACHE_EXTENSION, \
+    load_snapshot, prepare_graph_arrays
+from src.virus_simulation.snapshot_parsing import Snapshot
+from tests.helpers import run_simulation
+
+
+def _assert_graph_arrays_equal(graph_arrays: GraphArrays,
+                               expected: GraphArrays
+                               ) -> None:
+    for graph_field in fields(GraphArrays):
+        array = getattr(graph_arrays, graph_field.name)
+        expected_array = getattr(expected, graph_field.name)
+        assert array.dtype == expected_array.dtype
+        assert np.array_equal(array, expected_array)
+
+
+def test_cached_graphs_equal_prepared_ones(tmp_path) -> None:
+    simulation_state = run_simulation().get_simulation_state()
+    snapshot_paths = [
+        os.path.join(tmp_path, "snapshot.json"),
+        os.path.join(tmp_path, "snapshot")
+    ]
+    convert_simulation_state_to_json(
+        simulation_state=simulation_state, target_path=snapshot_paths[0]
+    )
+    convert_simulation_state_to_binary(
+        simulation_state=simulation_state, target_path=snapshot_paths[1]
+    )
+    build_parameters = GraphBuildParameters(first_time_stamp=2)
+    cache = GraphCache(cache_dir=os.path.join(tmp_path, "cache"))
+    dataset = SnapshotGraphDataset(
+        snapshot_paths=snapshot_paths,
+        build_parameters=build_parameters,
+        cache=cache
+    )
+
+    prepared = [dataset[index] for index in range(len(dataset))]
+    cached = [dataset[index] for index in range(len(dataset))]
+
+    # json and binary snapshots differ in content hash, so each has own entry
+    assert len([
+        name for name in os.listdir(cache.cache_dir)
+        if name.endswith(GRAPH_CACHE_EXTENSION)
+    ]) == len(snapshot_paths)
+    expected = prepare_graph_arrays(
+        snapshot=load_snapshot(snapshot_path=snapshot_paths[0]),
+        build_parameters=build_parameters
+    )
+    for graph_arrays in prepared + cached:
+        _assert_graph_arrays_equal(graph_arrays=graph_arrays, expected=expected)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path) -> None:
+    graph_arrays = prepare_graph_arrays(
+        snapshot=_prepare_binary_snapshot(tmp_path=tmp_path),
+        build_parameters=GraphBuildParameters()
+    )
+    cache = GraphCache(cache_dir=os.path.join(tmp_path, "cache"))
+    cache.put(key="first", graph_arrays=graph_arrays)
+    entry_bytes = os.path.getsize(
+        os.path.join(cache.cache_dir, f"first{GRAPH_CACHE_EXTENSION}")
+    )
+    os.utime(
+        os.path.join(cache.cache_dir, f"first{GRAPH_CACHE_EXTENSION}"),
+        (0, 0)
+    )
+    cache = GraphCache(cache_dir=cache.cache_dir, max_bytes=entry_bytes)
+
+    cache.put(key="second", graph_arrays=graph_arrays)
+
+    assert cache.get(key="first") is None
+    _assert_graph_arrays_equal(
+        graph_arrays=cache.get(key="second"), expected=graph_arrays
+    )
+
+
+def _prepare_binary_snapshot(tmp_path) -> Snapshot:
+    snapshot_path = os.path.join(tmp_path, "snapshot")
+    convert_simulation_state_to_binary(
+        simulation_state=run_simulation().get_simulation_state(),
+        target_path=snapshot_path
+    )
+    return load_snapshot(snapshot_path=snapshot_path)
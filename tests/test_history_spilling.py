@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from src.virus_simulation.conversion import convert_simulation_state_to_json, \
+    convert_simulation_state_to_binary
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.history_spilling import MemoryBudget
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+from tests.helpers import run_simulation, assert_snapshots_equal
+
+
+@pytest.mark.parametrize("engine_class", [
+    SimulationEngine, VectorizedSimulationEngine
+])
+def test_spilled_history_gives_the_same_snapshots(tmp_path,
+                                                  engine_class: type
+                                                  ) -> None:
+    spilled_state = run_simulation(
+        engine_class=engine_class,
+        memory_budget=MemoryBudget(
+            max_bytes=0, spill_dir=os.path.join(tmp_path, "spill")
+        )
+    ).get_simulation_state()
+    simulation_state = run_simulation(
+        engine_class=engine_class
+    ).get_simulation_state()
+    assert spilled_state.spilled_meetings is not None
+    assert spilled_state.spilled_meetings.contacts_number > 0
+
+    convert_simulation_state_to_json(
+        simulation_state=simulation_state,
+        target_path=os.path.join(tmp_path, "snapshot.json")
+    )
+    convert_simulation_state_to_json(
+        simulation_state=spilled_state,
+        target_path=os.path.join(tmp_path, "spilled_snapshot.json")
+    )
+    convert_simulation_state_to_binary(
+        simulation_state=spilled_state,
+        target_path=os.path.join(tmp_path, "spilled_snapshot")
+    )
+
+    expected = Snapshot.initialize(
+        snapshot_path=os.path.join(tmp_path, "snapshot.json")
+    )
+    assert_snapshots_equal(
+        snapshot=Snapshot.initialize(
+            snapshot_path=os.path.join(tmp_path, "spilled_snapshot.json")
+        ),
+        expected=expected
+    )
+    assert_snapshots_equal(
+        snapshot=Snapshot.initialize_binary(
+            snapshot_path=os.path.join(tmp_path, "spilled_snapshot")
+        ),
+        expected=expected
+    )
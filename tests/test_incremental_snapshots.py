@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from src.virus_simulation.conversion import convert_simulation_state_to_json, \
+    convert_simulation_state_delta_to_json, dump_snapshot_manifest
+from src.virus_simulation.errors import SnapshotParsingError
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+import src.virus_simulation.config as simulation_config
+
+SEGMENT_ENDS = (4, 9)
+
+
+def test_manifest_rebuilds_aggregated_contacts(tmp_path) -> None:
+    simulation_engine = VectorizedSimulationEngine.initialize(
+        map_size=6,
+        max_person_step_size=2,
+        people_number=100,
+        initial_seek_people=2,
+        transmission_probability=0.5,
+        aggregate_contacts=True,
+        random_seed=0
+    )
+    segments, first_time_stamp = [], 0
+    for step in range(SEGMENT_ENDS[-1] + 1):
+        simulation_engine.take_simulation_step()
+        if step not in SEGMENT_ENDS:
+            continue
+        segment_name = f"segment_{step}.json"
+        convert_simulation_state_delta_to_json(
+            simulation_state_delta=simulation_engine.get_simulation_state_delta(
+                since_time_stamp=first_time_stamp
+            ),
+            target_path=os.path.join(tmp_path, segment_name)
+        )
+        segments.append({
+            simulation_config.SEGMENT_STEPS_KEY: (first_time_stamp, step),
+            simulation_config.SEGMENT_PATH_KEY: segment_name
+        })
+        first_time_stamp = step + 1
+    simulation_state = simulation_engine.get_simulation_state()
+    dump_snapshot_manifest(
+        simulation_map=simulation_state.map,
+        people_number=len(simulation_state.people),
+        segments=segments,
+        target_path=os.path.join(tmp_path, "manifest.json")
+    )
+    convert_simulation_state_to_json(
+        simulation_state=simulation_state,
+        target_path=os.path.join(tmp_path, "snapshot.json")
+    )
+
+    rebuilt = Snapshot.initialize_from_manifest(
+        manifest_path=os.path.join(tmp_path, "manifest.json")
+    )
+
+    snapshot = Snapshot.initialize(
+        snapshot_path=os.path.join(tmp_path, "snapshot.json")
+    )
+    assert len(snapshot.aggregated_contacts) > 0
+    assert rebuilt.aggregated_contacts == snapshot.aggregated_contacts
+    assert rebuilt.people == snapshot.people
+    with pytest.raises(SnapshotParsingError):
+        Snapshot.initialize_from_manifest(
+            manifest_path=os.path.join(tmp_path, "manifest.json"),
+            step=SEGMENT_ENDS[-1] - 1
+        )
@@ -0,0 +1,76 @@
+from typing import Type
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.errors import SimulationError
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+from tests.helpers import run_simulation, Engine
+
+STEPS = 10
+INITIAL_SEEK_PEOPLE = 2
+
+
+@pytest.mark.parametrize("engine_class", [
+    SimulationEngine, VectorizedSimulationEngine
+])
+@pytest.mark.parametrize("buffer_steps", [0, 3])
+def test_steps_equal_taken_simulation_steps(engine_class: Type[Engine],
+                                            buffer_steps: int
+                                            ) -> None:
+    simulation_steps = list(run_simulation(
+        engine_class=engine_class, steps=0
+    ).iter_steps(steps=STEPS, buffer_steps=buffer_steps))
+
+    simulation_state = run_simulation(
+        engine_class=engine_class, steps=STEPS
+    ).get_simulation_state()
+    assert [step.time_stamp for step in simulation_steps] == list(range(STEPS))
+    traces = simulation_state.people_traces.astype(np.int64)
+    previous_positions = traces[0] - simulation_steps[0].moves
+    for step in simulation_steps:
+        positions = traces[step.time_stamp]
+        assert np.array_equal(step.positions, positions)
+        assert np.array_equal(step.moves, positions - previous_positions)
+        previous_positions = positions
+        meetings = [
+            (
+                meeting.person_x.person_id,
+                meeting.person_y.person_id,
+                meeting.intensity
+            ) for meeting in simulation_state.meetings
+            if meeting.time_stamp == step.time_stamp
+        ]
+        assert list(zip(
+            step.contacts_person_x.tolist(),
+            step.contacts_person_y.tolist(),
+            step.contacts_intensity.tolist()
+        )) == meetings
+    infected_people = np.concatenate(
+        [step.infected_people for step in simulation_steps]
+    )
+    assert len(set(infected_people.tolist())) == infected_people.shape[0]
+    assert infected_people.shape[0] == sum(
+        person.sick for person in simulation_state.people
+    ) - INITIAL_SEEK_PEOPLE
+    for person_id in infected_people.tolist():
+        assert simulation_state.people[person_id].sick
+
+
+@pytest.mark.parametrize("engine_class", [
+    SimulationEngine, VectorizedSimulationEngine
+])
+def test_history_is_dropped_when_iteration_starts(engine_class: Type[Engine]
+                                                  ) -> None:
+    simulation_engine = run_simulation(engine_class=engine_class, steps=2)
+
+    simulation_steps = simulation_engine.iter_steps(
+        steps=STEPS, drop_history=True
+    )
+
+    # not started iteration keeps history
+    assert simulation_engine.get_simulation_state().people_traces.shape[0] == 2
+    assert len(list(simulation_steps)) == STEPS
+    with pytest.raises(SimulationError):
+        simulation_engine.get_simulation_state()
@@ -0,0 +1,69 @@
+import threading
+import time
+from functools import reduce
+from typing import Iterator, List
+
+import pytest
+
+from src.utils.iterables import create_dictionary_of_lists, \
+    append_to_dictionary_of_lists, iterate_buffered
+
+
+def test_dictionary_of_lists_matches_appending_records() -> None:
+    dictionary_specs = [
+        ((index % 3, index % 2), (index, str(index))) for index in range(20)
+    ]
+
+    dictionary = create_dictionary_of_lists(dictionary_specs=dictionary_specs)
+
+    expected = reduce(append_to_dictionary_of_lists, dictionary_specs, {})
+    assert dictionary == expected
+    assert list(dictionary) == list(expected)
+
+
+def test_dictionary_of_lists_of_no_records_is_empty() -> None:
+    assert create_dictionary_of_lists(dictionary_specs=[]) == {}
+
+
+@pytest.mark.parametrize("buffer_size", [0, 1, 4])
+def test_buffered_items_keep_order(buffer_size: int) -> None:
+    assert list(iterate_buffered(
+        items=iter(range(20)), buffer_size=buffer_size
+    )) == list(range(20))
+
+
+@pytest.mark.parametrize("buffer_size", [0, 1, 4])
+def test_producer_error_is_raised_in_consumer(buffer_size: int) -> None:
+    def produce() -> Iterator[int]:
+        yield 0
+        yield 1
+        raise RuntimeError("Producer failed.")
+
+    consumed = []
+    with pytest.raises(RuntimeError, match="Producer failed."):
+        for item in iterate_buffered(items=produce(), buffer_size=buffer_size):
+            consumed.append(item)
+
+    assert consumed == [0, 1]
+
+
+def test_producer_stops_after_consumer_closes_iteration() -> None:
+    produced: List[int] = []
+
+    def produce() -> Iterator[int]:
+        for item in range(1000):
+            produced.append(item)
+            yield item
+
+    buffered = iterate_buffered(items=produce(), buffer_size=2)
+    assert [next(buffered), next(buffered)] == [0, 1]
+    buffered.close()
+    produced_number = len(produced)
+    time.sleep(0.3)
+
+    # consumed items, full buffer and item blocked on put at most
+    assert produced_number <= 5
+    assert len(produced) == produced_number
+    assert not any(
+        thread.name == "buffered-producer" for thread in threading.enumerate()
+    )
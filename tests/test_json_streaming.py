@@ -0,0 +1,72 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pytest
+
+from src.utils.fs_utils import COMPRESSIONS, open_text_file, parse_json
+from src.virus_simulation.conversion import convert_simulation_state_to_json
+from src.virus_simulation.json_streaming import \
+    stream_simulation_state_to_json, load_streamed_sections_arrays
+from src.virus_simulation.snapshot_parsing import Snapshot
+import src.virus_simulation.config as simulation_config
+from tests.helpers import run_simulation, assert_snapshots_equal, \
+    GROUP_CROWDING_PARAMETERS
+
+
+@pytest.mark.parametrize("compression", [None] + COMPRESSIONS)
+@pytest.mark.parametrize("encode_traces", [False, True])
+@pytest.mark.parametrize("parameters", [
+    {"aggregate_contacts": True}, GROUP_CROWDING_PARAMETERS
+])
+def test_streamed_snapshot_equals_json_one(tmp_path,
+                                           compression: Optional[str],
+                                           encode_traces: bool,
+                                           parameters: dict
+                                           ) -> None:
+    simulation_state = run_simulation(**parameters).get_simulation_state()
+    json_path = os.path.join(tmp_path, "snapshot.json")
+    streamed_path = os.path.join(tmp_path, "streamed_snapshot.json")
+
+    convert_simulation_state_to_json(
+        simulation_state=simulation_state,
+        target_path=json_path,
+        encode_traces=encode_traces
+    )
+    stream_simulation_state_to_json(
+        simulation_state=simulation_state,
+        target_path=streamed_path,
+        compression=compression,
+        encode_traces=encode_traces
+    )
+
+    with open_text_file(streamed_path) as streamed_file:
+        assert json.load(streamed_file) == parse_json(json_path=json_path)
+    assert_snapshots_equal(
+        snapshot=Snapshot.initialize_streamed(snapshot_path=streamed_path),
+        expected=Snapshot.initialize(snapshot_path=json_path)
+    )
+
+
+def test_sections_are_sought_at_recorded_offsets(tmp_path) -> None:
+    simulation_state = run_simulation().get_simulation_state()
+    streamed_path = os.path.join(tmp_path, "streamed_snapshot.json")
+    section_offsets = stream_simulation_state_to_json(
+        simulation_state=simulation_state,
+        target_path=streamed_path
+    )
+
+    arrays = load_streamed_sections_arrays(
+        snapshot_path=streamed_path,
+        keys=[simulation_config.GRAPH_EDGES_KEY],
+        section_offsets=section_offsets
+    )
+
+    snapshot = Snapshot.initialize_streamed(snapshot_path=streamed_path)
+    assert np.array_equal(
+        arrays["contact_person_x"], snapshot.arrays.contact_person_x
+    )
+    assert np.array_equal(
+        arrays["contact_time_stamp"], snapshot.arrays.contact_time_stamp
+    )
@@ -0,0 +1,64 @@
+import csv
+import json
+import os
+import tracemalloc
+from typing import List, Dict
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.metrics import StreamMetricsRecorder, \
+    CONTACTS_GENERATED_METRIC, NEW_INFECTIONS_METRIC, TIME_STAMP_METRIC, \
+    MOVEMENT_PHASE, get_phase_time_metric, get_phase_memory_metric
+from tests.helpers import run_simulation
+
+STEPS = 10
+INITIAL_SEEK_PEOPLE = 2
+
+
+def _read_metrics(metrics_path: str) -> List[Dict[str, float]]:
+    with open(metrics_path, newline="") as metrics_file:
+        if metrics_path.endswith(".csv"):
+            return [
+                {name: float(value) for name, value in row.items() if value}
+                for row in csv.DictReader(metrics_file)
+            ]
+        return [json.loads(line) for line in metrics_file]
+
+
+@pytest.mark.parametrize("file_name", ["metrics.jsonl", "metrics.csv"])
+@pytest.mark.parametrize("trace_memory", [False, True])
+def test_metrics_stream_round_trip(tmp_path,
+                                   file_name: str,
+                                   trace_memory: bool
+                                   ) -> None:
+    metrics_path = os.path.join(tmp_path, file_name)
+    metrics_recorder = StreamMetricsRecorder(
+        target_path=metrics_path, trace_memory=trace_memory
+    )
+    simulation_state = run_simulation(
+        steps=STEPS,
+        initial_seek_people=INITIAL_SEEK_PEOPLE,
+        metrics_recorder=metrics_recorder
+    ).get_simulation_state()
+    metrics_recorder.close()
+    if trace_memory:
+        tracemalloc.stop()
+
+    records = _read_metrics(metrics_path=metrics_path)
+
+    assert [r[TIME_STAMP_METRIC] for r in records] == list(range(STEPS))
+    assert all(get_phase_time_metric(phase=MOVEMENT_PHASE) in r for r in records)
+    assert all(
+        (get_phase_memory_metric(phase=MOVEMENT_PHASE) in r) == trace_memory
+        for r in records
+    )
+    contacts_per_step = np.bincount(
+        [contact.time_stamp for contact in simulation_state.meetings],
+        minlength=STEPS
+    )
+    assert [r[CONTACTS_GENERATED_METRIC] for r in records] == \
+        contacts_per_step.tolist()
+    assert sum(r[NEW_INFECTIONS_METRIC] for r in records) == \
+        sum(person.sick for person in simulation_state.people) - \
+        INITIAL_SEEK_PEOPLE
@@ -0,0 +1,167 @@
+from typing import List
+
+import numpy as np
+import pytest
+import scipy.sparse as spp
+
+from src.virus_simulation.neighbour_sampling import CSRGraph, Block, \
+    NeighbourSamplingLoader, sample_neighbours, sample_blocks, _relabel_nodes
+
+NODES_NUMBER = 50
+FANOUTS = [3, 2]
+
+
+@pytest.fixture(scope="module")
+def adjacency_matrix() -> spp.csr_matrix:
+    adjacency_matrix = spp.random(
+        NODES_NUMBER, NODES_NUMBER, density=0.2, format="csr", random_state=0
+    )
+    return (adjacency_matrix + adjacency_matrix.T).tocsr()
+
+
+@pytest.fixture(scope="module")
+def graph(adjacency_matrix: spp.csr_matrix) -> CSRGraph:
+    return CSRGraph(
+        indptr=adjacency_matrix.indptr.astype(np.int64),
+        indices=adjacency_matrix.indices.astype(np.int64),
+        weights=adjacency_matrix.data.astype(np.float32)
+    )
+
+
+def _assert_blocks_equal(blocks: List[Block], expected: List[Block]) -> None:
+    assert len(blocks) == len(expected)
+    for block, expected_block in zip(blocks, expected):
+        assert block.dst_nodes_number == expected_block.dst_nodes_number
+        for name in ["src_nodes", "edge_src", "edge_dst", "edge_weights"]:
+            assert np.array_equal(
+                getattr(block, name), getattr(expected_block, name)
+            )
+
+
+@pytest.mark.parametrize("fanout", [-1, 0, 1, 3, NODES_NUMBER])
+def test_sampled_neighbours_are_bounded_by_fanout(graph: CSRGraph,
+                                                  fanout: int
+                                                  ) -> None:
+    nodes = np.array([0, 7, 7, 13, 42], dtype=np.int64)
+
+    edges, node_index = sample_neighbours(
+        graph=graph,
+        nodes=nodes,
+        fanout=fanout,
+        random_generator=np.random.default_rng(0)
+    )
+
+    degrees = graph.indptr[nodes + 1] - graph.indptr[nodes]
+    expected_counts = degrees if fanout < 0 else np.minimum(degrees, fanout)
+    assert np.array_equal(
+        np.bincount(node_index, minlength=nodes.shape[0]), expected_counts
+    )
+    # edges belong to neighbourhoods of their nodes, each drawn once per node
+    assert np.all(graph.indptr[nodes[node_index]] <= edges)
+    assert np.all(edges < graph.indptr[nodes[node_index] + 1])
+    assert len(set(zip(node_index.tolist(), edges.tolist()))) == edges.shape[0]
+
+
+def test_sampled_neighbours_are_deterministic_per_seed(graph: CSRGraph) -> None:
+    nodes = np.arange(NODES_NUMBER, dtype=np.int64)
+
+    samples = [
+        sample_neighbours(
+            graph=graph,
+            nodes=nodes,
+            fanout=2,
+            random_generator=np.random.default_rng(seed)
+        ) for seed in [0, 0, 1]
+    ]
+
+    assert np.array_equal(samples[0][0], samples[1][0])
+    assert np.array_equal(samples[0][1], samples[1][1])
+    assert not np.array_equal(samples[0][0], samples[2][0])
+
+
+def test_relabelled_nodes_start_with_destination_ones() -> None:
+    dst_nodes = np.array([5, 2, 9], dtype=np.int64)
+    neighbours = np.array([7, 2, 5, 11, 7, 3], dtype=np.int64)
+
+    src_nodes, local_index = _relabel_nodes(
+        dst_nodes=dst_nodes, neighbours=neighbours
+    )
+
+    assert src_nodes.tolist() == [5, 2, 9, 7, 11, 3]
+    assert np.array_equal(src_nodes[local_index], neighbours)
+
+
+def test_blocks_map_local_indices_to_graph_edges(graph: CSRGraph,
+                                                 adjacency_matrix: spp.csr_matrix
+                                                 ) -> None:
+    seeds = np.array([3, 17, 29], dtype=np.int64)
+
+    blocks = sample_blocks(
+        graph=graph,
+        seeds=seeds,
+        fanouts=FANOUTS,
+        random_generator=np.random.default_rng(0)
+    )
+
+    assert len(blocks) == len(FANOUTS)
+    assert np.array_equal(blocks[-1].dst_nodes, seeds)
+    for block, next_block in zip(blocks, blocks[1:]):
+        assert np.array_equal(block.dst_nodes, next_block.src_nodes)
+    for block, fanout in zip(blocks, FANOUTS):
+        assert np.array_equal(
+            block.src_nodes[:block.dst_nodes_number], block.dst_nodes
+        )
+        assert len(set(block.src_nodes.tolist())) == block.src_nodes.shape[0]
+        assert np.all(
+            np.bincount(block.edge_dst, minlength=block.dst_nodes_number)
+            <= fanout
+        )
+        src, dst = block.src_nodes[block.edge_src], block.dst_nodes[block.edge_dst]
+        assert np.allclose(
+            np.asarray(adjacency_matrix[dst, src]).reshape(-1),
+            block.edge_weights
+        )
+        assert block.to_adjacency_matrix().shape == \
+            (block.dst_nodes_number, block.src_nodes.shape[0])
+
+    _assert_blocks_equal(
+        blocks=sample_blocks(
+            graph=graph,
+            seeds=seeds,
+            fanouts=FANOUTS,
+            random_generator=np.random.default_rng(0)
+        ),
+        expected=blocks
+    )
+
+
+def test_loader_batches_do_not_depend_on_workers(graph: CSRGraph) -> None:
+    labels = np.random.default_rng(0).integers(0, 2, NODES_NUMBER)
+    epochs = []
+    for workers_number in [1, 3]:
+        with NeighbourSamplingLoader(
+                graph=graph,
+                labels=labels,
+                fanouts=FANOUTS,
+                batch_size=4,
+                seeds_per_label=6,
+                workers_number=workers_number,
+                random_seed=0
+        ) as loader:
+            # the first epoch is abandoned, workers are kept for the next ones
+            next(iter(loader))
+            epochs.append([list(loader), list(loader)])
+
+    for epoch, expected_epoch in zip(epochs[1], epochs[0]):
+        assert len(epoch) == 3
+        for batch, expected_batch in zip(epoch, expected_epoch):
+            assert np.array_equal(batch.seeds, expected_batch.seeds)
+            assert np.array_equal(batch.labels, labels[batch.seeds])
+            _assert_blocks_equal(
+                blocks=batch.blocks, expected=expected_batch.blocks
+            )
+    first_epoch, second_epoch = epochs[0]
+    assert not all(
+        np.array_equal(batch.seeds, other_batch.seeds)
+        for batch, other_batch in zip(first_epoch, second_epoch)
+    )
@@ -0,0 +1,138 @@
+import itertools
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.conversion import convert_simulation_state_to_json, \
+    convert_simulation_state_to_binary
+from src.virus_simulation.partitioned_engine import \
+    PartitionedSimulationEngine, get_tile_width, get_tiles
+from src.virus_simulation.snapshot_parsing import Snapshot
+from tests.helpers import assert_snapshots_equal
+
+MAP_SIZE = 12
+MAX_PERSON_STEP_SIZE = 2
+STEPS = 12
+WORKERS_NUMBER = 3
+
+
+def _initialize_engine(**parameters) -> PartitionedSimulationEngine:
+    return PartitionedSimulationEngine.initialize(**{
+        "map_size": MAP_SIZE,
+        "max_person_step_size": MAX_PERSON_STEP_SIZE,
+        "people_number": 150,
+        "initial_seek_people": 3,
+        "transmission_probability": 0.5,
+        "random_seed": 0,
+        "workers_number": WORKERS_NUMBER,
+        **parameters
+    })
+
+
+def test_partitioned_engine_keeps_invariants_after_each_step() -> None:
+    simulation_engine = _initialize_engine()
+    tile_width = get_tile_width(max_x=MAP_SIZE, tiles_number=WORKERS_NUMBER)
+    sick_people_numbers = []
+    try:
+        for _ in range(STEPS):
+            simulation_engine.take_simulation_step()
+            sick_people_numbers.append(simulation_engine.sick_people_number)
+            positions = simulation_engine.get_simulation_state() \
+                .people_traces[simulation_engine.time_stamp]
+            assert np.array_equal(
+                simulation_engine.people_owners,
+                get_tiles(
+                    positions=positions,
+                    tile_width=tile_width,
+                    tiles_number=WORKERS_NUMBER
+                )
+            )
+        simulation_state = simulation_engine.get_simulation_state()
+    finally:
+        simulation_engine.close()
+
+    assert sick_people_numbers == sorted(sick_people_numbers)
+    assert sick_people_numbers[-1] > sick_people_numbers[0]
+    assert sick_people_numbers[-1] == sum(
+        person.sick for person in simulation_state.people
+    )
+    for time_stamp in range(STEPS):
+        positions = simulation_state.people_traces[time_stamp].tolist()
+        contacts = [
+            (contact.person_x.person_id, contact.person_y.person_id)
+            for contact in simulation_state.meetings
+            if contact.time_stamp == time_stamp
+        ]
+        # every pair of people sharing cell meets exactly once
+        cells = {}
+        for person_id, position in enumerate(positions):
+            cells.setdefault(tuple(position), []).append(person_id)
+        expected = [
+            pair for cell_people in cells.values()
+            for pair in itertools.combinations(cell_people, 2)
+        ]
+        assert len(contacts) == len(set(contacts))
+        assert sorted(contacts) == sorted(expected)
+
+
+@pytest.mark.parametrize("parameters", [{}, {"aggregate_contacts": True}])
+def test_partitioned_state_snapshot_round_trip(tmp_path,
+                                               parameters: dict
+                                               ) -> None:
+    simulation_engine = _initialize_engine(**parameters)
+    try:
+        for _ in range(STEPS):
+            simulation_engine.take_simulation_step()
+        simulation_state = simulation_engine.get_simulation_state()
+    finally:
+        simulation_engine.close()
+    json_path = os.path.join(tmp_path, "snapshot.json")
+    binary_path = os.path.join(tmp_path, "snapshot")
+
+    convert_simulation_state_to_json(
+        simulation_state=simulation_state, target_path=json_path
+    )
+    convert_simulation_state_to_binary(
+        simulation_state=simulation_state, target_path=binary_path
+    )
+    snapshot = Snapshot.initialize(snapshot_path=json_path)
+
+    assert_snapshots_equal(
+        snapshot=Snapshot.initialize_binary(snapshot_path=binary_path),
+        expected=snapshot
+    )
+    snapshot_arrays = snapshot.arrays
+    assert np.array_equal(
+        snapshot_arrays.sick,
+        [person.sick for person in simulation_state.people]
+    )
+    assert snapshot_arrays.contacts_number == len(simulation_state.meetings)
+    for person_id, (xs, ys) in snapshot.traces.items():
+        assert np.array_equal(
+            xs, simulation_state.people_traces[:, int(person_id), 0]
+        )
+        assert np.array_equal(
+            ys, simulation_state.people_traces[:, int(person_id), 1]
+        )
+
+
+def test_cli_rejects_vectorized_partitioned_simulation() -> None:
+    completed = subprocess.run(
+        [
+            sys.executable, "-m", "src.virus_simulation.execute",
+            "--simulation_name", "test",
+            "--map_size", str(MAP_SIZE),
+            "--people_number", "10",
+            "--vectorized",
+            "--workers_number", str(WORKERS_NUMBER)
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True
+    )
+
+    assert completed.returncode == 2
+    assert "--workers_number" in completed.stderr
@@ -0,0 +1,99 @@
+import os
+from typing import Optional
+
+import pytest
+
+from src.utils.fs_utils import parse_json
+from src.virus_simulation.execute import FullSnapshotWriter, JSON_FORMAT, \
+    BINARY_FORMAT, STREAMED_JSON_FORMAT, REPLAY_FORMAT, get_snapshot_index_path
+from src.virus_simulation.graph_dataset import load_snapshot
+from src.virus_simulation.snapshot_analytics import analyze_simulations, \
+    calculate_epidemic_curve, calculate_contacts_per_step, \
+    calculate_degree_distribution, METRICS, ANALYZED_SNAPSHOTS_KEY, \
+    EPIDEMIC_CURVE_METRIC, ATTACK_RATE_METRIC, CONTACTS_PER_STEP_METRIC, \
+    DEGREE_DISTRIBUTION_METRIC
+import src.config as global_config
+import src.virus_simulation.config as simulation_config
+from tests.helpers import run_simulation, GROUP_CROWDING_PARAMETERS
+
+SNAPSHOT_STEPS = (4, 9)
+
+
+@pytest.mark.parametrize("snapshot_format, compression", [
+    (JSON_FORMAT, None),
+    (BINARY_FORMAT, None),
+    (STREAMED_JSON_FORMAT, "gzip"),
+    (REPLAY_FORMAT, None)
+])
+@pytest.mark.parametrize("parameters", [
+    {}, {"aggregate_contacts": True}, GROUP_CROWDING_PARAMETERS
+])
+def test_indexed_analytics_equal_snapshot_metrics(tmp_path,
+                                                  monkeypatch,
+                                                  snapshot_format: str,
+                                                  compression: Optional[str],
+                                                  parameters: dict
+                                                  ) -> None:
+    monkeypatch.setattr(
+        global_config, "VIRUS_SIMULATION_OUTPUT_PATH", str(tmp_path)
+    )
+    snapshot_writer = FullSnapshotWriter(
+        simulation_name="test",
+        snapshot_format=snapshot_format,
+        compression=compression
+    )
+    simulation_engine = run_simulation(steps=0, **parameters)
+    for step in range(SNAPSHOT_STEPS[-1] + 1):
+        simulation_engine.take_simulation_step()
+        if step in SNAPSHOT_STEPS:
+            snapshot_writer.persist(simulation_engine=simulation_engine, step=step)
+    index_path = get_snapshot_index_path(simulation_name="test")
+
+    results = analyze_simulations(
+        index_paths=[index_path],
+        metrics=METRICS,
+        workers=1,
+        show_progress=False
+    )
+
+    index = parse_json(json_path=index_path)
+    people_number = index[simulation_config.PEOPLE_NUMBER_KEY]
+    entries = index[simulation_config.INDEXED_SNAPSHOTS_KEY]
+    analyzed_snapshots = results[0][ANALYZED_SNAPSHOTS_KEY]
+    assert [e[simulation_config.SNAPSHOT_STEP_KEY] for e in entries] == \
+        list(SNAPSHOT_STEPS)
+    for step, entry, analyzed in zip(SNAPSHOT_STEPS, entries, analyzed_snapshots):
+        snapshot = load_snapshot(snapshot_path=os.path.join(
+            tmp_path, entry[simulation_config.SNAPSHOT_PATH_KEY]
+        ))
+        snapshot_arrays = snapshot.arrays
+        assert entry[simulation_config.SICK_NUMBER_KEY] == \
+            int(snapshot_arrays.sick.sum())
+        assert entry[simulation_config.CONTACTS_NUMBER_KEY] == \
+            snapshot_arrays.contacts_number
+        assert entry[simulation_config.GROUP_CONTACTS_NUMBER_KEY] == \
+            snapshot_arrays.group_contacts.groups_number
+        contacts = snapshot.pairwise_contacts
+        if snapshot_arrays.aggregated_contacts.pairs_number > 0:
+            degree_contacts = (
+                snapshot_arrays.aggregated_person_x,
+                snapshot_arrays.aggregated_person_y
+            )
+        else:
+            degree_contacts = (contacts.person_x, contacts.person_y)
+        assert analyzed == {
+            simulation_config.SNAPSHOT_STEP_KEY: step,
+            EPIDEMIC_CURVE_METRIC: calculate_epidemic_curve(
+                sick_start=snapshot_arrays.sick_start, step=step
+            ).tolist(),
+            ATTACK_RATE_METRIC:
+                int(snapshot_arrays.sick.sum()) / people_number,
+            CONTACTS_PER_STEP_METRIC: calculate_contacts_per_step(
+                time_stamp=contacts.time_stamp, step=step
+            ).tolist(),
+            DEGREE_DISTRIBUTION_METRIC: calculate_degree_distribution(
+                person_x=degree_contacts[0],
+                person_y=degree_contacts[1],
+                people_number=people_number
+            ).tolist()
+        }
@@ -0,0 +1,49 @@
+import pytest
+
+from src.virus_simulation.snapshot_parsing import Snapshot
+import src.virus_simulation.config as simulation_config
+
+SNAPSHOT_JSON = {
+    simulation_config.MAP_DIMENSIONS_KEY: [10, 10],
+    simulation_config.GRAPH_VERTICES_KEY: [
+        {
+            simulation_config.PERSON_ID_KEY: 0,
+            simulation_config.SICKNESS_STATUS_KEY: True,
+            simulation_config.SICKNESS_START_KEY: 0
+        },
+        {
+            simulation_config.PERSON_ID_KEY: 1,
+            simulation_config.SICKNESS_STATUS_KEY: False,
+            simulation_config.SICKNESS_START_KEY: None
+        }
+    ],
+    simulation_config.GRAPH_EDGES_KEY: [
+        {
+            simulation_config.CONTACT_PAIR_KEY: [0, 1],
+            simulation_config.CONTACT_DURATION_KEY: 0.5,
+            simulation_config.CONTACT_TIME_STAMP_KEY: 0
+        }
+    ],
+    simulation_config.PEOPLE_TRACES_KEY: {"0": [[1, 1]], "1": [[1, 1]]}
+}
+
+
+def test_records_are_shared_and_read_only() -> None:
+    snapshot = Snapshot(snapshot_json=SNAPSHOT_JSON)
+
+    assert isinstance(snapshot.people, tuple)
+    assert snapshot.people is snapshot.people
+    assert snapshot.contacts[0][simulation_config.CONTACT_PAIR_KEY] == (0, 1)
+    with pytest.raises(TypeError):
+        snapshot.people[0][simulation_config.SICKNESS_STATUS_KEY] = False
+
+
+def test_copied_records_are_mutable_lists() -> None:
+    snapshot = Snapshot(snapshot_json=SNAPSHOT_JSON)
+
+    people = snapshot.copy_people()
+    people[1][simulation_config.SICKNESS_STATUS_KEY] = True
+
+    assert isinstance(people, list)
+    assert isinstance(snapshot.copy_contacts(), list)
+    assert snapshot.people[1][simulation_config.SICKNESS_STATUS_KEY] is False
@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.binary_snapshots import TRACE_DTYPE
+from src.virus_simulation.conversion import convert_simulation_state_to_json
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.trace_encoding import EncodedTraces, \
+    encode_people_traces, decode_trace
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+
+
+def _decode_people_traces(encoded_traces: EncodedTraces) -> np.ndarray:
+    traces = [
+        decode_trace(encoded_traces=encoded_traces, index=index)
+        for index in range(encoded_traces.people_number)
+    ]
+    if len(traces) == 0:
+        return np.empty((encoded_traces.steps_number, 0, 2), dtype=TRACE_DTYPE)
+    return np.stack(traces, axis=1)
+
+
+def _random_walk(steps: int, people_number: int) -> np.ndarray:
+    random_generator = np.random.default_rng(0)
+    moves = random_generator.integers(-2, 3, (steps, people_number, 2))
+    return np.clip(50 + np.cumsum(moves, axis=0), 0, 100).astype(TRACE_DTYPE)
+
+
+@pytest.mark.parametrize("steps, people_number", [
+    (0, 3), (1, 3), (5, 0), (0, 0), (1, 1), (30, 7)
+])
+def test_decoded_traces_equal_encoded_ones(steps: int,
+                                           people_number: int
+                                           ) -> None:
+    traces = _random_walk(steps=steps, people_number=people_number)
+
+    encoded_traces = encode_people_traces(traces=traces)
+
+    assert np.array_equal(_decode_people_traces(encoded_traces), traces)
+
+
+@pytest.mark.parametrize("jump, delta_dtype", [
+    (100, np.int8), (1000, np.int16), (40000, np.int32)
+])
+def test_deltas_are_widened_to_fit_moves(jump: int,
+                                         delta_dtype: type
+                                         ) -> None:
+    traces = np.zeros((3, 2, 2), dtype=TRACE_DTYPE)
+    traces[1:, 1, 0] = jump
+
+    encoded_traces = encode_people_traces(traces=traces)
+
+    assert encoded_traces.run_deltas.dtype == delta_dtype
+    assert np.array_equal(_decode_people_traces(encoded_traces), traces)
+
+
+def test_long_runs_are_widened_to_fit_lengths() -> None:
+    traces = np.zeros((300, 2, 2), dtype=TRACE_DTYPE)
+    traces[:, 0, 1] = np.arange(300)
+
+    encoded_traces = encode_people_traces(traces=traces)
+
+    assert encoded_traces.runs_number == 2
+    assert encoded_traces.run_lengths.dtype == np.uint16
+    assert np.array_equal(_decode_people_traces(encoded_traces), traces)
+
+
+def test_encoded_traces_json_round_trip(tmp_path) -> None:
+    simulation_engine = VectorizedSimulationEngine.initialize(
+        map_size=8,
+        max_person_step_size=2,
+        people_number=20,
+        initial_seek_people=2,
+        transmission_probability=0.5,
+        random_seed=0
+    )
+    for _ in range(20):
+        simulation_engine.take_simulation_step()
+    simulation_state = simulation_engine.get_simulation_state()
+    snapshot_path = os.path.join(tmp_path, "snapshot.json")
+
+    convert_simulation_state_to_json(
+        simulation_state=simulation_state,
+        target_path=snapshot_path,
+        encode_traces=True
+    )
+
+    traces = simulation_state.people_traces
+    snapshot = Snapshot.initialize(snapshot_path=snapshot_path)
+    assert len(snapshot.traces) == traces.shape[1]
+    for person_id, (xs, ys) in snapshot.traces.items():
+        assert np.array_equal(xs, traces[:, person_id, 0])
+        assert np.array_equal(ys, traces[:, person_id, 1])
@@ -0,0 +1,62 @@
+import os
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.conversion import convert_simulation_state_to_binary, \
+    convert_simulation_state_to_replay
+from src.virus_simulation.snapshot_parsing import Snapshot
+from src.virus_simulation.trace_replay import TraceReplayer
+from tests.helpers import run_simulation, assert_snapshots_equal, \
+    GROUP_CROWDING_PARAMETERS
+
+
+@pytest.mark.parametrize("parameters", [
+    {}, {"aggregate_contacts": True}, {"transmission_only": True},
+    GROUP_CROWDING_PARAMETERS
+])
+def test_replay_snapshot_equals_binary_one(tmp_path, parameters: dict) -> None:
+    simulation_engine = run_simulation(**parameters)
+    simulation_state = simulation_engine.get_simulation_state()
+    binary_path = os.path.join(tmp_path, "binary_snapshot")
+    replay_path = os.path.join(tmp_path, "replay_snapshot")
+
+    convert_simulation_state_to_binary(
+        simulation_state=simulation_state,
+        target_path=binary_path
+    )
+    convert_simulation_state_to_replay(
+        simulation_state=replace(
+            simulation_state, replay_log=simulation_engine.get_replay_log()
+        ),
+        target_path=replay_path
+    )
+
+    replay_snapshot = Snapshot.initialize_binary(snapshot_path=replay_path)
+    binary_snapshot = Snapshot.initialize_binary(snapshot_path=binary_path)
+    assert replay_snapshot.arrays.traces.size == 0
+    assert_snapshots_equal(snapshot=replay_snapshot, expected=binary_snapshot)
+    for name in ("contact_person_x", "contact_intensity", "contact_time_stamp"):
+        assert np.array_equal(
+            getattr(replay_snapshot.arrays, name),
+            getattr(binary_snapshot.arrays, name)
+        )
+
+
+def test_replayed_segments_equal_traces() -> None:
+    simulation_engine = run_simulation(steps=11)
+    traces = simulation_engine.get_simulation_state().people_traces
+    trace_replayer = TraceReplayer(
+        replay_log=simulation_engine.get_replay_log(),
+        map_dimensions=np.array([8, 8]),
+        segment_steps=4,
+        max_cached_segments=1
+    )
+
+    assert np.array_equal(
+        trace_replayer.get_traces(first_time_stamp=3, last_time_stamp=9),
+        traces[3:9]
+    )
+    assert np.array_equal(trace_replayer.get_person_trace(index=5), traces[:, 5])
+    assert np.array_equal(trace_replayer.get_traces(), traces)
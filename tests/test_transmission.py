@@ -0,0 +1,69 @@
+from typing import Tuple, Type
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.transmission import MEAN_CONTACT_INTENSITY
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+from tests.helpers import run_simulation, Engine
+
+SEEDS = range(300)
+# 2 x 2 cells crowded with people, so that most of them are endangered
+MAP_SIZE = 1
+PEOPLE_NUMBER = 40
+TRANSMISSION_PROBABILITY = 0.5
+# allowed deviation of infected from expected ones, in standard deviations
+DEVIATIONS_TOLERANCE = 4
+
+
+@pytest.mark.parametrize("engine_class", [
+    SimulationEngine, VectorizedSimulationEngine
+])
+@pytest.mark.parametrize("transmission_only", [False, True])
+def test_infections_follow_per_cell_risk(engine_class: Type[Engine],
+                                         transmission_only: bool
+                                         ) -> None:
+    """Both full-contact and transmission-only modes infect healthy person
+    sharing cell with k sick ones with probability 1 - (1 - p / 2) ** k.
+    """
+    infected, risks = zip(*(
+        _simulate_step(
+            engine_class=engine_class,
+            transmission_only=transmission_only,
+            seed=seed
+        ) for seed in SEEDS
+    ))
+    risks = np.concatenate(risks)
+
+    expected = risks.sum()
+    deviation = np.sqrt((risks * (1 - risks)).sum())
+    assert abs(sum(infected) - expected) < DEVIATIONS_TOLERANCE * deviation
+
+
+def _simulate_step(engine_class: Type[Engine],
+                   transmission_only: bool,
+                   seed: int
+                   ) -> Tuple[int, np.ndarray]:
+    """Number of people infected in first step and infection risks of people
+    healthy before it.
+    """
+    simulation_engine = run_simulation(
+        engine_class=engine_class,
+        steps=0,
+        map_size=MAP_SIZE,
+        people_number=PEOPLE_NUMBER,
+        transmission_probability=TRANSMISSION_PROBABILITY,
+        transmission_only=transmission_only,
+        random_seed=seed
+    )
+    step, = simulation_engine.iter_steps(steps=1)
+    sick = np.array([
+        person.sick for person in simulation_engine.get_simulation_state().people
+    ])
+    sick[step.infected_people] = False
+    cell_ids = step.positions[:, 0] * (MAP_SIZE + 1) + step.positions[:, 1]
+    sick_in_cell = np.bincount(cell_ids[sick], minlength=(MAP_SIZE + 1) ** 2)
+    risks = 1 - (1 - TRANSMISSION_PROBABILITY * MEAN_CONTACT_INTENSITY) ** \
+        sick_in_cell[cell_ids]
+    return step.infected_people.shape[0], risks[~sick]
@@ -0,0 +1,103 @@
+from dataclasses import fields
+from typing import Tuple, Type, Union
+
+import numpy as np
+import pytest
+
+from src.virus_simulation.crowding import CrowdingPolicy, GROUP_CROWDING
+from src.virus_simulation.engine import SimulationEngine
+from src.virus_simulation.primitives import SimulationState
+from src.virus_simulation.vectorized_engine import VectorizedSimulationEngine
+from tests.helpers import run_simulation, Engine, GROUP_CROWDING_PARAMETERS
+
+SEEDS = range(40)
+MAP_SIZE = 12
+PEOPLE_NUMBER = 100
+STEPS = 15
+# relative difference of means allowed between engines, as they draw
+# different random numbers for the same seed
+INFECTED_TOLERANCE = 0.15
+CONTACTS_TOLERANCE = 0.05
+
+
+def test_engines_agree_on_mean_infected_and_contacts() -> None:
+    infected, contacts = _simulate_seeds(engine_class=SimulationEngine)
+    vectorized_infected, vectorized_contacts = _simulate_seeds(
+        engine_class=VectorizedSimulationEngine
+    )
+
+    assert np.isclose(
+        vectorized_infected, infected, rtol=INFECTED_TOLERANCE
+    )
+    assert np.isclose(
+        vectorized_contacts, contacts, rtol=CONTACTS_TOLERANCE
+    )
+
+
+@pytest.mark.parametrize("engine_class", [
+    SimulationEngine, VectorizedSimulationEngine
+])
+@pytest.mark.parametrize("parameters", [
+    {}, {"transmission_only": True}, GROUP_CROWDING_PARAMETERS
+])
+def test_sick_people_number_counts_sick_people(engine_class: Type[Engine],
+                                               parameters: dict
+                                               ) -> None:
+    simulation_engine = run_simulation(engine_class=engine_class, **parameters)
+
+    assert simulation_engine.sick_people_number == sum(
+        person.sick for person in simulation_engine.get_simulation_state().people
+    )
+    assert simulation_engine.sick_people_number > 2
+
+
+def test_captured_state_is_not_affected_by_following_steps() -> None:
+    simulation_engine = run_simulation(
+        aggregate_contacts=True,
+        crowding_policy=CrowdingPolicy(mode=GROUP_CROWDING, max_partners=2)
+    )
+    expected = simulation_engine.get_simulation_state()
+    views = simulation_engine.capture_simulation_state()
+    for _ in range(5):
+        simulation_engine.take_simulation_step()
+
+    _assert_states_equal(state=views.materialize(), expected=expected)
+
+
+def _assert_states_equal(state: SimulationState,
+                         expected: SimulationState
+                         ) -> None:
+    assert state.people == expected.people
+    assert state.meetings == expected.meetings
+    assert np.array_equal(state.people_traces, expected.people_traces)
+    for name in ["aggregated_contacts", "group_contacts"]:
+        record, expected_record = \
+            getattr(state, name), getattr(expected, name)
+        for field in fields(expected_record):
+            assert np.array_equal(
+                getattr(record, field.name),
+                getattr(expected_record, field.name)
+            )
+
+
+def _simulate_seeds(engine_class: Type[Union[
+                        SimulationEngine, VectorizedSimulationEngine
+                    ]]
+                    ) -> Tuple[float, float]:
+    """Mean number of infected people and of contacts after STEPS steps."""
+    infected, contacts = [], []
+    for seed in SEEDS:
+        simulation_engine = engine_class.initialize(
+            map_size=MAP_SIZE,
+            max_person_step_size=2,
+            people_number=PEOPLE_NUMBER,
+            initial_seek_people=2,
+            transmission_probability=0.5,
+            random_seed=seed
+        )
+        for _ in range(STEPS):
+            simulation_engine.take_simulation_step()
+        simulation_state = simulation_engine.get_simulation_state()
+        infected.append(sum(person.sick for person in simulation_state.people))
+        contacts.append(len(simulation_state.meetings))
+    return float(np.mean(infected)), float(np.mean(contacts))